@@ -0,0 +1,82 @@
+"""Performance benchmarks.
+
+Each module can be run as a script, e.g.:
+
+    python -m benchmark.translation
+
+"""
+
+from collections import OrderedDict
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from plover import __version__, system
+from plover.config import DEFAULT_SYSTEM_NAME
+from plover.registry import registry
+
+
+def setup(system_name=DEFAULT_SYSTEM_NAME):
+    '''Setup registry and system (like the test suite does).'''
+    registry.update()
+    system.setup(system_name)
+
+
+def parse_args(description, **defaults):
+    '''Parse common benchmark arguments.
+
+    Each keyword argument is an option with its default value,
+    the option type is the type of the default value (int or str).
+    '''
+    parser = argparse.ArgumentParser(description=description)
+    for name, default in sorted(defaults.items()):
+        parser.add_argument('--' + name.replace('_', '-'), type=type(default),
+                            default=default,
+                            metavar='N' if isinstance(default, int) else 'VALUE',
+                            help='(default: %(default)s)')
+    return parser.parse_args()
+
+
+def timed(fn, *args, **kwargs):
+    '''Call fn and return its result and the elapsed time (in seconds).'''
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+# Reported results, by name.
+_results = OrderedDict()
+
+
+def report(name, value, unit=''):
+    _results[name] = {'value': value, 'unit': unit}
+    print('%-40s %12.3f %s' % (name, value, unit))
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(path, benchmark, args):
+    '''Save reported results (and context) to <path>, in JSON format.'''
+    results = OrderedDict((
+        ('benchmark', benchmark),
+        ('time', time.strftime('%Y-%m-%dT%H:%M:%S')),
+        ('plover', __version__),
+        ('commit', _git_commit()),
+        ('python', sys.version.split()[0]),
+        ('platform', platform.platform()),
+        ('parameters', vars(args)),
+        ('results', _results),
+    ))
+    with open(path, 'w', encoding='utf-8') as fp:
+        json.dump(results, fp, indent=2)
+        fp.write('\n')
@@ -0,0 +1,165 @@
+"""End-to-end engine benchmarks: a headless engine, driven by a fake
+machine, replaying a stroke stream against a large synthetic dictionary,
+with output captured.
+
+Use `--output results.json` to save the results (and context: commit,
+Python version, ...) in JSON format, so they can be compared between
+commits.
+"""
+
+import bisect
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+from plover import latency, system
+from plover.config import Config, DictionaryConfig
+from plover.engine import StenoEngine
+from plover.machine.base import StenotypeBase
+from plover.registry import registry
+
+from plover_build_utils.generate_dictionary import generate_dictionary, save_json
+from plover_build_utils.testing import CaptureOutput, steno_to_stroke
+
+from benchmark import parse_args, report, save_results, setup, timed
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
+
+
+class Machine(StenotypeBase):
+
+    instance = None
+
+    def __init__(self, options):
+        super().__init__()
+
+    @classmethod
+    def get_keys(cls):
+        return system.KEYS
+
+    def start_capture(self):
+        Machine.instance = self
+        self._initializing()
+        self._ready()
+
+    def stop_capture(self):
+        Machine.instance = None
+        self._stopped()
+
+
+class Engine(StenoEngine):
+    '''Headless engine: everything is done synchronously.'''
+
+    def _in_engine_thread(self):
+        return True
+
+    def quit(self, code=0):
+        self._same_thread_hook(self._quit, code)
+
+
+def make_stroke(rnd, keys, key_order):
+    count = min(int(rnd.expovariate(0.4)) + 1, 8)
+    return tuple(sorted(rnd.sample(keys, count), key=key_order.__getitem__))
+
+
+def make_stream(dictionary, count, seed=0):
+    '''Return a stream of strokes (list of keys) using <dictionary>.
+
+    Outlines are picked following a Zipf distribution,
+    with some undo strokes and misstrokes.
+    '''
+    rnd = random.Random(seed)
+    outlines = list(dictionary)
+    rnd.shuffle(outlines)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(outlines) + 1)))
+    keys = [k for k in system.KEYS if k != system.NUMBER_KEY]
+    undo = steno_to_stroke(system.UNDO_STROKE_STENO).steno_keys
+    stream = []
+    while len(stream) < count:
+        n = rnd.random()
+        if n < 0.03:
+            stream.append(undo)
+        elif n < 0.05:
+            stream.append(list(make_stroke(rnd, keys, system.KEY_ORDER)))
+        else:
+            index = bisect.bisect(cum_weights, rnd.random() * cum_weights[-1])
+            for steno in outlines[min(index, len(outlines) - 1)].split('/'):
+                stream.append(steno_to_stroke(steno).steno_keys)
+    return stream[:count]
+
+
+def peak_rss():
+    '''Return the peak resident set size (in MiB), or None if unavailable.'''
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # In bytes on macOS, kilobytes elsewhere.
+    return rss / (1024 * 1024 if sys.platform.startswith('darwin') else 1024)
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(int(len(sorted_values) * p / 100), len(sorted_values) - 1)]
+
+
+def main():
+    args = parse_args(__doc__, entries=100000, strokes=20000,
+                      seed=0, output='')
+    setup()
+    registry.register_plugin('machine', 'Benchmark', Machine)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        dictionary_path = os.path.join(tmpdir, 'dictionary.json')
+        dictionary = dict(generate_dictionary(args.entries, args.seed))
+        save_json(dictionary.items(), dictionary_path)
+        stream = make_stream(dictionary, args.strokes, args.seed)
+        del dictionary
+        config = Config()
+        config.target_file = os.path.join(tmpdir, 'plover.cfg')
+        config['machine_type'] = 'Benchmark'
+        config['system_keymap'] = [(k, k) for k in system.KEYS]
+        config['dictionaries'] = [DictionaryConfig(dictionary_path)]
+        output = CaptureOutput()
+        engine = Engine(config, output)
+        _, elapsed = timed(engine.start)
+        report('load time', elapsed * 1e3, 'ms')
+        engine.output = True
+        notify = Machine.instance._notify
+        # Warm-up.
+        for keys in stream[:1000]:
+            notify(keys)
+        engine.clear_translator_state()
+        latency.reset()
+        durations = []
+        for keys in stream:
+            _, elapsed = timed(notify, keys)
+            durations.append(elapsed)
+        total = sum(durations)
+        durations.sort()
+        report('strokes per second', len(durations) / total)
+        report('stroke latency (mean)', total / len(durations) * 1e6, 'us')
+        report('stroke latency (p50)', percentile(durations, 50) * 1e6, 'us')
+        report('stroke latency (p99)', percentile(durations, 99) * 1e6, 'us')
+        report('stroke latency (max)', durations[-1] * 1e6, 'us')
+        for probe, stats in sorted(latency.get_stats().items()):
+            if probe in ('translate', 'format', 'output'):
+                report('%s latency (p99)' % probe, stats.p99 * 1e6, 'us')
+        report('output size', len(output.text) / 1024, 'KiB')
+        rss = peak_rss()
+        if rss is not None:
+            report('peak RSS', rss, 'MiB')
+        engine.quit()
+    finally:
+        shutil.rmtree(tmpdir)
+    if args.output:
+        save_results(args.output, 'engine', args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Startup benchmarks: time to first stroke.
+
+Each run is done in a fresh interpreter: import Plover, discover plugins,
+start a headless engine (with the default system, but no dictionaries),
+and process a first stroke (until its output).
+"""
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmark import parse_args, report
+
+
+CHILD = '''
+from time import perf_counter
+start = perf_counter()
+import sys
+from benchmark.first_stroke import first_stroke
+first_stroke(start, sys.argv[1])
+'''
+
+
+def first_stroke(start, config_dir):
+    '''Child process: print timings (since <start>) as JSON.'''
+    from time import perf_counter
+    import os
+    from plover import registry as registry_module, system
+    # Don't use (or update) caches in the user configuration directory.
+    registry_module.CONFIG_DIR = config_dir
+    system.CONFIG_DIR = config_dir
+    from plover.config import Config, DEFAULT_SYSTEM_NAME
+    from plover.registry import registry
+    from plover_build_utils.testing import CaptureOutput
+    from benchmark.engine import Engine, Machine
+    timings = {'imports': perf_counter() - start}
+    registry.update()
+    timings['registry update'] = perf_counter() - start
+    # Needed by the benchmark machine keymap.
+    system.setup(DEFAULT_SYSTEM_NAME)
+    registry.register_plugin('machine', 'Benchmark', Machine)
+    config = Config()
+    config.target_file = os.path.join(config_dir, 'plover.cfg')
+    config['machine_type'] = 'Benchmark'
+    config['system_keymap'] = [(k, k) for k in system.KEYS]
+    config['dictionaries'] = []
+    output = CaptureOutput()
+    engine = Engine(config, output)
+    engine.start()
+    engine.output = True
+    timings['engine start'] = perf_counter() - start
+    Machine.instance._notify(['S-'])
+    assert output.text
+    timings['first stroke'] = perf_counter() - start
+    print(json.dumps(timings))
+
+
+def main():
+    args = parse_args(__doc__, runs=10)
+    config_dir = tempfile.mkdtemp()
+    try:
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [os.getcwd()] + [p for p in (env.get('PYTHONPATH'),) if p])
+        all_timings = []
+        # Note: the first run populates the caches.
+        for run in range(args.runs + 1):
+            output = subprocess.check_output(
+                [sys.executable, '-c', CHILD, config_dir],
+                env=env, universal_newlines=True)
+            all_timings.append(json.loads(output.strip().split('\n')[-1]))
+        for name in ('imports', 'registry update',
+                     'engine start', 'first stroke'):
+            report('%s (first run)' % name, all_timings[0][name] * 1e3, 'ms')
+            report('%s (median)' % name, statistics.median(
+                t[name] for t in all_timings[1:]) * 1e3, 'ms')
+    finally:
+        shutil.rmtree(config_dir)
+
+
+if __name__ == '__main__':
+    main()
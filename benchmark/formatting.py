@@ -0,0 +1,154 @@
+"""Formatting benchmarks: throughput on dictionary text."""
+
+import random
+import tracemalloc
+
+from plover import formatting
+from plover.dictionary.base import load_dictionary
+from plover.formatting import Formatter, RetroFormatter
+from plover.steno_dictionary import StenoDictionary
+from plover.translation import Translation
+
+from plover_build_utils.testing import steno_to_stroke
+
+from benchmark import parse_args, report, setup, timed
+
+
+WORDS = '''
+the of and to a in is you that it he was for on are as with his they I
+at be this have from or one had by word but not what all were we when
+your can said there use an each which she do how their if will up other
+about out many then them these so some her would make like him into time
+has look two more write go see number no way could people my than first
+water been call who oil its now find long down day did get come made may
+part over new sound take only little work know place year live me back
+give most very after thing our just name good sentence man think say
+great where help through much before line right too mean old any same
+tell boy follow came want show also around form three small set put end
+does another well large must big even such because turn here why ask
+went men read need land different home us move try kind hand picture
+'''.split()
+
+AFFIXES = '''
+{^ing} {^ed} {^s} {^er} {^ly} {^ment} {^ness} {re^} {un^} {^}
+'''.split()
+
+PUNCTUATION = '''
+{.} {,} {?} {!} {:} {;} {-|} {>} {<} {*-|} {^.^} {^-^} {&a} {&b} {&c}
+'''.split()
+
+
+def make_translations(count, seed=0, dictionary=''):
+    rnd = random.Random(seed)
+    if dictionary:
+        values = list(load_dictionary(dictionary).values())
+        english = [rnd.choice(values) for _ in range(count)]
+    else:
+        commands = list(load_dictionary('asset:plover:assets/commands.json').values())
+        english = []
+        for _ in range(count):
+            n = rnd.random()
+            if n < 0.70:
+                english.append(rnd.choice(WORDS))
+            elif n < 0.85:
+                english.append(rnd.choice(AFFIXES))
+            elif n < 0.97:
+                english.append(rnd.choice(PUNCTUATION))
+            else:
+                english.append(rnd.choice(commands))
+    stroke = steno_to_stroke('S')
+    return [Translation([stroke], e) for e in english]
+
+
+def run(formatter, translations):
+    # Like the translator, provide previous translations as context.
+    fmt = formatter.format
+    for n, t in enumerate(translations):
+        fmt((), (t,), translations[max(0, n - 10):n] or None)
+
+
+def run_diff(old, new):
+    for a, b in zip(old, new):
+        a == b
+
+
+def run_retro(translations, count, size):
+    for _ in range(count):
+        retro_formatter = RetroFormatter(translations)
+        retro_formatter.last_words(count=1)
+        retro_formatter.last_words(count=size // 4)
+        retro_formatter.last_text(size)
+
+
+def main():
+    args = parse_args(__doc__, translations=100000, dictionary='')
+    setup()
+    translations = make_translations(args.translations,
+                                     dictionary=args.dictionary)
+    formatter = Formatter()
+    formatter.set_output(None)
+    # Warm-up.
+    run(formatter, translations[:1000])
+    compile_translation = formatting._compile_translation
+    for name in ('uncached', 'cached'):
+        if name == 'uncached':
+            formatting._compile_translation = compile_translation.__wrapped__
+        else:
+            formatting._compile_translation = compile_translation
+            compile_translation.cache_clear()
+        _, elapsed = timed(run, formatter, translations)
+        report('%s: translations per second' % name,
+               len(translations) / elapsed)
+        report('%s: time per translation' % name,
+               elapsed / len(translations) * 1e6, 'us')
+    info = compile_translation.cache_info()
+    report('compiled translations cache hit rate',
+           100 * info.hits / (info.hits + info.misses), '%')
+    # Ahead of time compilation.
+    dictionary = StenoDictionary()
+    for n, t in enumerate(translations):
+        dictionary[(str(n),)] = t.english
+    _, elapsed = timed(formatting.precompile_translations, [dictionary])
+    report('precompile time per entry', elapsed / len(dictionary) * 1e6, 'us')
+    compile_translation.cache_clear()
+    _, elapsed = timed(run, formatter, translations)
+    report('precompiled: translations per second', len(translations) / elapsed)
+    report('precompiled: time per translation',
+           elapsed / len(translations) * 1e6, 'us')
+    formatting.precompile_translations(())
+    # Allocations: all actions are retained by the translations.
+    translations = make_translations(args.translations,
+                                     dictionary=args.dictionary)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    run(formatter, translations)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    report('retained blocks per translation',
+           sum(s.count_diff for s in stats) / len(translations))
+    report('retained bytes per translation',
+           sum(s.size_diff for s in stats) / len(translations), 'B')
+    # Diffing: compare equal (but distinct) actions.
+    old = [a for t in translations for a in t.formatting]
+    translations = make_translations(args.translations,
+                                     dictionary=args.dictionary)
+    run(formatter, translations)
+    new = [a for t in translations for a in t.formatting]
+    assert old == new
+    _, elapsed = timed(run_diff, old, new)
+    report('actions comparison', elapsed / len(old) * 1e9, 'ns')
+    # Retro formatting queries, on normal text, and on a long attached run.
+    attached = make_translations(1000, dictionary='asset:plover:assets/commands.json')
+    for t in attached:
+        t.english = '{^}' + t.english.strip('{}^') + '{^}'
+    run(formatter, attached)
+    for name, history in (('text', translations[-1000:]), ('attached', attached)):
+        for size in (10, 100, 1000):
+            _, elapsed = timed(run_retro, history, 1000, size)
+            report('retro queries (%s, %u chars)' % (name, size),
+                   elapsed / 1000 * 1e6, 'us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Orthography benchmarks: adding suffixes to words from the wordlist."""
+
+import random
+
+from plover import orthography, system
+
+from benchmark import parse_args, report, setup, timed
+
+
+SUFFIXES = '''
+ing ed s ly er able ist ment ness ful y en ry cy
+'''.split()
+
+# Used if the wordlist is empty.
+WORDS = '''
+artistic statute frequent establish speech cherry die metallurgy beauty
+write free narrate defer test run stop create happy carry panic
+'''.split()
+
+
+def make_calls(count, seed=0):
+    rnd = random.Random(seed)
+    # Favor common words, like when writing.
+    words = sorted(system.ORTHOGRAPHY_WORDS, key=system.ORTHOGRAPHY_WORDS.get)[:10000]
+    if not words:
+        words = WORDS
+    return [(rnd.choice(words), rnd.choice(SUFFIXES)) for _ in range(count)]
+
+
+def run(add_suffix, calls):
+    for word, suffix in calls:
+        add_suffix(word, suffix)
+
+
+def main():
+    args = parse_args(__doc__, calls=20000)
+    setup()
+    calls = make_calls(args.calls)
+    report('wordlist size', len(system.ORTHOGRAPHY_WORDS))
+    # No memoization.
+    _, elapsed = timed(run, orthography._add_suffix, calls)
+    report('uncached: calls per second', len(calls) / elapsed)
+    # Memoization, from a cold cache.
+    orthography._cached_add_suffix.cache_clear()
+    _, elapsed = timed(run, orthography.add_suffix, calls)
+    report('cached: calls per second', len(calls) / elapsed)
+    info = orthography._cached_add_suffix.cache_info()
+    report('cache hit rate', 100 * info.hits / (info.hits + info.misses), '%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""System benchmarks: setup, switching and orthography wordlist loading."""
+
+import os
+import random
+import shutil
+import tempfile
+
+from plover import system
+from plover.config import DEFAULT_SYSTEM_NAME
+from plover.registry import registry
+
+from benchmark import parse_args, report, timed
+
+
+def make_wordlist(path, count, seed=0):
+    rnd = random.Random(seed)
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz')
+                          for _ in range(rnd.randint(2, 12))))
+    with open(path, 'w', encoding='utf-8') as fp:
+        for rank, word in enumerate(words):
+            fp.write('%s %u\n' % (word, rank))
+
+
+def first_lookup():
+    return 'test' in system.ORTHOGRAPHY_WORDS
+
+
+def main():
+    args = parse_args(__doc__, words=150000)
+    registry.update()
+    mod = registry.get_plugin('system', DEFAULT_SYSTEM_NAME).obj
+    config_dir = tempfile.mkdtemp()
+    try:
+        # Use a synthetic wordlist (from the configuration directory).
+        system.CONFIG_DIR = config_dir
+        make_wordlist(os.path.join(config_dir, mod.ORTHOGRAPHY_WORDLIST),
+                      args.words)
+        _, elapsed = timed(system._read_wordlist,
+                           system._wordlist_path(mod.ORTHOGRAPHY_WORDLIST))
+        report('parse wordlist', elapsed * 1e3, 'ms')
+        for name in ('no cache', 'cache'):
+            # Don't reuse the system data from the previous setup.
+            system._systems.clear()
+            _, elapsed = timed(system.setup, DEFAULT_SYSTEM_NAME)
+            report('setup (%s)' % name, elapsed * 1e3, 'ms')
+            _, elapsed = timed(first_lookup)
+            report('first wordlist lookup (%s)' % name, elapsed * 1e3, 'ms')
+        # Setting up an already setup system again (e.g. when switching back).
+        _, elapsed = timed(system.setup, DEFAULT_SYSTEM_NAME)
+        _, lookup_elapsed = timed(first_lookup)
+        report('setup again', (elapsed + lookup_elapsed) * 1e3, 'ms')
+    finally:
+        shutil.rmtree(config_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Translator benchmarks: throughput and allocations per stroke."""
+
+import random
+import tracemalloc
+
+from plover import system
+from plover.registry import registry
+from plover.steno_dictionary import StenoDictionary
+from plover.translation import Translation, Translator
+
+from plover_build_utils.testing import steno_to_stroke
+
+from benchmark import parse_args, report, setup, timed
+
+
+STROKES = '''
+KAT TKOG PWEURD HROPBG SKWRUPL TP-PL KW-BG STPH -G -S -D
+PHOEUPB TKEUBGS TPHAEURL HRAOEUBG TEFT PWOBGS SPOERT
+'''.split()
+
+
+def make_dictionary(seed=0):
+    rnd = random.Random(seed)
+    d = StenoDictionary()
+    for steno in STROKES:
+        d[steno] = steno.lower()
+    # Multi-strokes entries, so there are corrections.
+    for n in range(2000):
+        outline = '/'.join(rnd.choice(STROKES) for _ in range(rnd.randint(2, 4)))
+        d[outline] = outline.lower()
+    return d
+
+
+def make_strokes(count, seed=0):
+    rnd = random.Random(seed)
+    pool = [steno_to_stroke(steno) for steno in STROKES]
+    return [rnd.choice(pool) for _ in range(count)]
+
+
+def run(translator, strokes):
+    translate = translator.translate
+    for s in strokes:
+        translate(s)
+
+
+def run_long_window(translator, strokes, count):
+    # Lookup a stroke with a full (10 strokes) window, and no match.
+    state = translator.get_state()
+    state.translations = [Translation([s], None) for s in strokes[:9]]
+    find_translation = translator._find_translation
+    stroke = strokes[9]
+    for _ in range(count):
+        find_translation(stroke, suffixes=system.SUFFIX_KEYS)
+
+
+def main():
+    args = parse_args(__doc__, strokes=20000, undo_levels=100)
+    setup()
+    strokes = make_strokes(args.strokes)
+    translator = Translator()
+    dictionary = translator.get_dictionary()
+    dictionary.set_dicts([make_dictionary()])
+    translator.set_min_undo_length(args.undo_levels)
+    # Warm-up.
+    run(translator, strokes[:1000])
+    translator.clear_state()
+    _, elapsed = timed(run, translator, strokes)
+    report('strokes per second', len(strokes) / elapsed)
+    report('time per stroke', elapsed / len(strokes) * 1e6, 'us')
+    # The cost of a stroke should not depend on the undo levels.
+    for undo_levels in (10, 1000, 10000):
+        translator.clear_state()
+        translator.set_min_undo_length(undo_levels)
+        _, elapsed = timed(run, translator, strokes)
+        report('time per stroke (%u undo levels)' % undo_levels,
+               elapsed / len(strokes) * 1e6, 'us')
+    translator.set_min_undo_length(args.undo_levels)
+    translator.clear_state()
+    count = len(strokes)
+    _, elapsed = timed(run_long_window, translator, strokes, count)
+    report('find translation (10 strokes window)', elapsed / count * 1e6, 'us')
+    # Allocations: keep the whole history so all translations are retained.
+    translator.clear_state()
+    translator.set_min_undo_length(len(strokes))
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    run(translator, strokes)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(s.count_diff for s in stats)
+    size = sum(s.size_diff for s in stats)
+    report('retained blocks per stroke', blocks / len(strokes))
+    report('retained bytes per stroke', size / len(strokes), 'B')
+    report('peak traced memory', peak / 1024, 'KiB')
+    # Compare lookup strategies.
+    translator = Translator()
+    translator.set_dictionary(dictionary)
+    translator.set_min_undo_length(args.undo_levels)
+    for plugin in registry.list_plugins('lookup_strategy'):
+        translator.clear_state()
+        translator.set_lookup_strategy(plugin.name)
+        run(translator, strokes)
+    for name, stats in sorted(translator.get_lookup_stats().items()):
+        print('lookup strategy %s: %s' % (name, stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Engine running on an asyncio event loop.
+
+`AsyncStenoEngine` replaces the engine thread blocking on its queue
+with an event loop: queued engine calls (strokes, configuration
+changes, ...) are processed by batches from a loop callback, and the
+loop can also run coroutines (e.g. from extensions).
+
+Hook callbacks can be coroutine functions: they are then scheduled
+on the engine loop, instead of being run synchronously.
+
+The synchronous `StenoEngine` API is still available (and can be used
+from any thread), the asynchronous variants of the lookup methods can
+be awaited from any event loop (they're run in that loop's executor,
+and don't need the engine loop to be running).
+"""
+
+from time import perf_counter
+import asyncio
+import functools
+import threading
+
+from plover import log
+from plover.engine import StenoEngine
+
+
+# Maximum time (in seconds) given to pending
+# coroutines to finish when the engine quits.
+QUIT_TIMEOUT = 1.0
+
+
+class AsyncStenoEngine(StenoEngine):
+
+    def __init__(self, config, keyboard_emulation):
+        super().__init__(config, keyboard_emulation)
+        self.loop = asyncio.new_event_loop()
+        self._loop_thread_id = None
+        # Futures of the coroutines scheduled with `create_task`.
+        self._tasks = set()
+
+    def _in_engine_thread(self):
+        return threading.get_ident() == self._loop_thread_id
+
+    def _wakeup(self):
+        batch = self._get_batch(block=False)
+        if batch and self._process_batch(batch):
+            self.loop.stop()
+
+    def _schedule_wakeup(self):
+        try:
+            self.loop.call_soon_threadsafe(self._wakeup)
+        except RuntimeError:
+            # The loop is closed: the engine has quit.
+            pass
+
+    def _same_thread_hook(self, func, *args, **kwargs):
+        if self._in_engine_thread():
+            func(*args, **kwargs)
+        else:
+            self._queue.put((func, args, kwargs, perf_counter()))
+            self._schedule_wakeup()
+
+    def quit(self, code=0):
+        super().quit(code)
+        self._schedule_wakeup()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self._loop_thread_id = threading.get_ident()
+        # Process calls queued before the loop was started.
+        self.loop.call_soon(self._wakeup)
+        try:
+            self.loop.run_forever()
+            # Give pending coroutines a chance to finish.
+            tasks = [asyncio.wrap_future(future, loop=self.loop)
+                     for future in list(self._tasks)]
+            if tasks:
+                done, pending = self.loop.run_until_complete(
+                    asyncio.wait(tasks, timeout=QUIT_TIMEOUT))
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    # Let the cancelled coroutines handle their cancellation.
+                    self.loop.run_until_complete(asyncio.sleep(0))
+        finally:
+            self._loop_thread_id = None
+            self.loop.close()
+
+    def create_task(self, coro):
+        '''Schedule <coro> on the engine loop (can be called from any thread).
+
+        Return a `concurrent.futures.Future`.
+        '''
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        self._tasks.add(future)
+        future.add_done_callback(self._tasks.discard)
+        return future
+
+    async def _run_hook(self, hook, callback, coro):
+        try:
+            await coro
+        except Exception:
+            log.error('hook %r callback %r failed',
+                      hook, callback,
+                      exc_info=True)
+
+    def _call_hook_callback(self, hook, callback, args, kwargs):
+        result = callback(*args, **kwargs)
+        if asyncio.iscoroutine(result):
+            self.create_task(self._run_hook(hook, callback, result))
+
+    async def _call(self, func, *args, **kwargs):
+        # Lookups don't need the engine (see `StenoEngine.lookup`): run
+        # <func> in the default executor of the calling loop, so a slow
+        # search blocks neither that loop, nor the engine loop.
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def lookup_async(self, translation):
+        return await self._call(self.lookup, translation)
+
+    async def raw_lookup_async(self, translation):
+        return await self._call(self.raw_lookup, translation)
+
+    async def reverse_lookup_async(self, translation):
+        return await self._call(self.reverse_lookup, translation)
+
+    async def casereverse_lookup_async(self, translation):
+        return await self._call(self.casereverse_lookup, translation)
+
+    async def get_suggestions_async(self, translation, **kwargs):
+        return await self._call(self.get_suggestions, translation, **kwargs)
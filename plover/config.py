@@ -32,6 +32,8 @@ OUTPUT_CONFIG_SECTION = 'Output Configuration'
 DEFAULT_UNDO_LEVELS = 100
 MINIMUM_UNDO_LEVELS = 1
 
+DEFAULT_LOOKUP_STRATEGY = 'greedy'
+
 DEFAULT_SEARCH_LIMIT = 5
 MINIMUM_SEARCH_LIMIT = 1
 
@@ -336,11 +338,16 @@ class Config:
         choice_option('space_placement', ('Before Output', 'After Output'), OUTPUT_CONFIG_SECTION),
         boolean_option('start_attached', False, OUTPUT_CONFIG_SECTION),
         boolean_option('start_capitalized', False, OUTPUT_CONFIG_SECTION),
+        boolean_option('batch_output', False, OUTPUT_CONFIG_SECTION),
         int_option('undo_levels', DEFAULT_UNDO_LEVELS, MINIMUM_UNDO_LEVELS, None, OUTPUT_CONFIG_SECTION),
+        plugin_option('lookup_strategy', 'lookup_strategy', DEFAULT_LOOKUP_STRATEGY, OUTPUT_CONFIG_SECTION),
+        boolean_option('precompile_translations', False, OUTPUT_CONFIG_SECTION),
         # Logging.
         path_option('log_file_name', expand_path('strokes.log'), LOGGING_CONFIG_SECTION, 'log_file'),
         boolean_option('enable_stroke_logging', False, LOGGING_CONFIG_SECTION),
         boolean_option('enable_translation_logging', False, LOGGING_CONFIG_SECTION),
+        path_option('journal_file_name', expand_path('journal.jsonl'), LOGGING_CONFIG_SECTION, 'journal_file'),
+        boolean_option('enable_journal', False, LOGGING_CONFIG_SECTION),
         # GUI.
         boolean_option('start_minimized', False, 'Startup', 'Start Minimized'),
         boolean_option('show_stroke_display', False, 'Stroke Display', 'show'),
@@ -351,6 +358,7 @@ class Config:
         boolean_option('classic_dictionaries_display_order', False, 'GUI'),
         # Plugins.
         enabled_extensions_option(),
+        boolean_option('async_hooks', False, 'Plugins'),
         # Machine.
         boolean_option('auto_start', False, MACHINE_CONFIG_SECTION),
         plugin_option('machine_type', 'machine', 'Keyboard', MACHINE_CONFIG_SECTION),
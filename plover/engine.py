@@ -1,15 +1,17 @@
 
 from collections import namedtuple, OrderedDict
 from functools import wraps
-from queue import Queue
+from queue import Empty, Queue
+from time import perf_counter
 import os
 import shutil
 import threading
 
-from plover import log, system
+from plover import formatting, hooks, latency, log, profiling, system
 from plover.dictionary.loading_manager import DictionaryLoadingManager
 from plover.exception import DictionaryLoaderException
 from plover.formatting import Formatter
+from plover.journal import Journal
 from plover.misc import shorten_path
 from plover.registry import registry
 from plover.resource import ASSET_SCHEME, resource_filename
@@ -95,6 +97,9 @@ class StenoEngine:
         self._config = config
         self._is_running = False
         self._queue = Queue()
+        # Number of items drained per wake-up, and time spent in the queue.
+        self._queue_depth = latency.Histogram()
+        self._queue_wait = latency.Histogram()
         self._lock = threading.RLock()
         self._machine = None
         self._machine_state = None
@@ -104,13 +109,18 @@ class StenoEngine:
         self._formatter.add_listener(self._on_translated)
         self._translator = Translator()
         self._translator.add_listener(log.translation)
-        self._translator.add_listener(self._formatter.format)
+        self._translator.add_listener(self._format_translations)
         self._dictionaries = self._translator.get_dictionary()
         self._dictionaries_manager = DictionaryLoadingManager()
         self._running_state = self._translator.get_state()
         self._keyboard_emulation = keyboard_emulation
         self._hooks = { hook: [] for hook in self.HOOKS }
+        self._hook_dispatcher = None
+        # Timings, by (hook, callback).
+        self._hook_times = {}
         self._running_extensions = {}
+        self._profiler = None
+        self._journal = None
 
     def __enter__(self):
         self._lock.__enter__()
@@ -126,17 +136,52 @@ class StenoEngine:
         if self._in_engine_thread():
             func(*args, **kwargs)
         else:
-            self._queue.put((func, args, kwargs))
+            self._queue.put((func, args, kwargs, perf_counter()))
 
-    def run(self):
-        while True:
-            func, args, kwargs = self._queue.get()
-            try:
-                with self._lock:
+    def _get_batch(self, block=True):
+        # Wait for an item (if <block>), then drain all pending ones.
+        batch = []
+        try:
+            batch.append(self._queue.get(block))
+            get_nowait = self._queue.get_nowait
+            while True:
+                batch.append(get_nowait())
+        except Empty:
+            pass
+        return batch
+
+    def _process_batch(self, batch):
+        # Process the whole batch under one lock acquisition, and only
+        # send output once done with it: output is batched for the
+        # duration, even if the `batch_output` option is disabled.
+        # Return True when quitting.
+        self._queue_depth.record(len(batch))
+        quitting = False
+        with self._lock:
+            batch_output = len(batch) > 1
+            if batch_output:
+                self._formatter.set_batch_output(True)
+            for func, args, kwargs, queued_time in batch:
+                self._queue_wait.record(perf_counter() - queued_time)
+                try:
                     if func(*args, **kwargs):
+                        quitting = True
                         break
+                except Exception:
+                    log.error('engine %s failed', func.__name__[1:], exc_info=True)
+            try:
+                # Note: `_quit` already flushed the output.
+                if not quitting:
+                    self._formatter.flush_output()
+                if batch_output:
+                    self._formatter.set_batch_output(self._config['batch_output'])
             except Exception:
-                log.error('engine %s failed', func.__name__[1:], exc_info=True)
+                log.error('engine output flush failed', exc_info=True)
+        return quitting
+
+    def run(self):
+        while not self._process_batch(self._get_batch()):
+            pass
 
     def _stop(self):
         self._stop_extensions(self._running_extensions.keys())
@@ -147,6 +192,8 @@ class StenoEngine:
     def _start(self):
         self._set_output(self._config['auto_start'])
         self._update(full=True)
+        if profiling.startup_options is not None:
+            self.start_profiling(**profiling.startup_options)
 
     def _set_dictionaries(self, dictionaries):
         def dictionaries_changed(l1, l2):
@@ -161,8 +208,19 @@ class StenoEngine:
             return
         self._dictionaries = StenoDictionaryCollection(dictionaries)
         self._translator.set_dictionary(self._dictionaries)
+        self._precompile_translations()
         self._trigger_hook('dictionaries_loaded', self._dictionaries)
 
+    def _precompile_translations(self):
+        if not self._config['precompile_translations']:
+            formatting.precompile_translations(())
+            return
+        malformed = formatting.precompile_translations(self._dictionaries.dicts)
+        for d, strokes, translation, error in malformed:
+            log.warning('%s: malformed translation for %s: %r (%s)',
+                        shorten_path(d.path), '/'.join(strokes),
+                        translation, error)
+
     def _update(self, config_update=None, full=False, reset_machine=False):
         original_config = self._config.as_dict()
         # Update configuration.
@@ -184,11 +242,16 @@ class StenoEngine:
         log.set_stroke_filename(config['log_file_name'])
         log.enable_stroke_logging(config['enable_stroke_logging'])
         log.enable_translation_logging(config['enable_translation_logging'])
+        self._set_journal(config['journal_file_name']
+                          if config['enable_journal'] else None)
         # Update output.
         self._formatter.set_space_placement(config['space_placement'])
         self._formatter.start_attached = config['start_attached']
         self._formatter.start_capitalized = config['start_capitalized']
+        self._formatter.set_batch_output(config['batch_output'])
+        self._set_async_hooks(config['async_hooks'])
         self._translator.set_min_undo_length(config['undo_levels'])
+        self._translator.set_lookup_strategy(config['lookup_strategy'])
         # Update system.
         system_name = config['system_name']
         if system.NAME != system_name:
@@ -263,6 +326,8 @@ class StenoEngine:
             d.enabled = config_dictionaries[d.path].enabled
             dictionaries.append(d)
         self._set_dictionaries(dictionaries)
+        if 'precompile_translations' in config_update:
+            self._precompile_translations()
 
     def _start_extensions(self, extension_list):
         for extension_name in extension_list:
@@ -283,9 +348,22 @@ class StenoEngine:
             del extension
 
     def _quit(self, code):
+        self._formatter.flush_output()
         self._stop()
+        if self._profiler is not None:
+            self.stop_profiling()
+        latency.log_stats()
+        self._log_queue_stats()
         self.code = code
+        # Deliver the hooks still pending from this thread,
+        # so `quit` is the last one, and not followed by any.
+        dispatcher = self._hook_dispatcher
+        if dispatcher is not None:
+            self._hook_dispatcher = None
+            for hook, args, kwargs in dispatcher.cancel():
+                self._call_hook(hook, args, kwargs)
         self._trigger_hook('quit')
+        self._set_journal(None)
         return True
 
     def _toggle_output(self):
@@ -294,6 +372,8 @@ class StenoEngine:
     def _set_output(self, enabled):
         if enabled == self._is_running:
             return
+        # Don't lose pending output.
+        self._formatter.flush_output()
         self._is_running = enabled
         if enabled:
             self._translator.set_state(self._running_state)
@@ -307,7 +387,7 @@ class StenoEngine:
         self._same_thread_hook(self._on_machine_state_changed, machine_state)
 
     def _machine_stroke_callback(self, steno_keys):
-        self._same_thread_hook(self._on_stroked, steno_keys)
+        self._same_thread_hook(self._on_stroked, steno_keys, perf_counter())
 
     @with_lock
     def _on_machine_state_changed(self, machine_state):
@@ -346,11 +426,28 @@ class StenoEngine:
             command_fn(self, command_args[1] if len(command_args) == 2 else '')
         return False
 
-    def _on_stroked(self, steno_keys):
+    def _on_stroked(self, steno_keys, notify_time=None):
+        profiler = self._profiler
+        if profiler is None:
+            self._process_stroke(steno_keys, notify_time)
+            return
+        profiler.profile_stroke(self._process_stroke, steno_keys, notify_time)
+        if profiler.done and profiler is self._profiler:
+            self.stop_profiling()
+
+    def _process_stroke(self, steno_keys, notify_time=None):
+        start = perf_counter()
+        if notify_time is None:
+            notify_time = start
+        else:
+            latency.record('queue', start - notify_time)
         stroke = Stroke(steno_keys)
         log.stroke(stroke)
+        if self._journal is not None:
+            self._journal.log_stroke(stroke)
         self._translator.translate(stroke)
         self._trigger_hook('stroked', stroke)
+        latency.record_since('stroke', notify_time)
 
     def _on_translated(self, old, new):
         if not self._is_running:
@@ -360,19 +457,31 @@ class StenoEngine:
     def send_backspaces(self, b):
         if not self._is_running:
             return
+        start = perf_counter()
         self._keyboard_emulation.send_backspaces(b)
+        latency.record_since('send_backspaces', start)
+        if self._journal is not None:
+            self._journal.log_output('backspaces', b)
         self._trigger_hook('send_backspaces', b)
 
     def send_string(self, s):
         if not self._is_running:
             return
+        start = perf_counter()
         self._keyboard_emulation.send_string(s)
+        latency.record_since('send_string', start)
+        if self._journal is not None:
+            self._journal.log_output('string', s)
         self._trigger_hook('send_string', s)
 
     def send_key_combination(self, c):
         if not self._is_running:
             return
+        start = perf_counter()
         self._keyboard_emulation.send_key_combination(c)
+        latency.record_since('send_key_combination', start)
+        if self._journal is not None:
+            self._journal.log_output('key_combination', c)
         self._trigger_hook('send_key_combination', c)
 
     def send_engine_command(self, command):
@@ -437,7 +546,7 @@ class StenoEngine:
         # We need to go through the queue, even when already called
         # from the engine thread so _quit's return code does break
         # the thread out of its main loop.
-        self._queue.put((self._quit, (code,), {}))
+        self._queue.put((self._quit, (code,), {}, perf_counter()))
 
     def restart(self):
         self.quit(-1)
@@ -445,22 +554,22 @@ class StenoEngine:
     def join(self):
         return self.code
 
-    @with_lock
+    # Note: lookups don't need the engine lock, they're done on a snapshot
+    # of the dictionaries, and only serialized with changes to the
+    # dictionaries themselves (see `StenoDictionaryCollectionSnapshot`).
+
     def lookup(self, translation):
-        return self._dictionaries.lookup('/'.join(translation))
+        return self._dictionaries.snapshot.lookup('/'.join(translation))
 
-    @with_lock
     def raw_lookup(self, translation):
-        return self._dictionaries.raw_lookup('/'.join(translation))
+        return self._dictionaries.snapshot.raw_lookup('/'.join(translation))
 
-    @with_lock
     def reverse_lookup(self, translation):
-        matches = self._dictionaries.reverse_lookup(translation)
+        matches = self._dictionaries.snapshot.reverse_lookup(translation)
         return [] if matches is None else matches
 
-    @with_lock
     def casereverse_lookup(self, translation):
-        matches = self._dictionaries.casereverse_lookup(translation)
+        matches = self._dictionaries.snapshot.casereverse_lookup(translation)
         return set() if matches is None else matches
 
     @with_lock
@@ -471,9 +580,58 @@ class StenoEngine:
     def remove_dictionary_filter(self, dictionary_filter):
         self._dictionaries.remove_filter(dictionary_filter)
 
+    def get_latency_stats(self):
+        '''Return per-stroke latency statistics, see `plover.latency`.'''
+        return latency.get_stats()
+
+    def log_latency_stats(self):
+        latency.log_stats()
+
+    @property
+    @with_lock
+    def is_profiling(self):
+        return self._profiler is not None
+
+    @with_lock
+    def start_profiling(self, mode='cprofile', strokes=None, seconds=None):
+        '''Start profiling strokes processing, see `plover.profiling`.'''
+        if self._profiler is not None:
+            self.stop_profiling()
+        self._profiler = profiling.Profiler(mode, strokes, seconds)
+        log.info('%s profiling started', mode)
+
     @with_lock
+    def stop_profiling(self):
+        '''Stop profiling, return the path of the saved profile.'''
+        profiler = self._profiler
+        if profiler is None:
+            return None
+        self._profiler = None
+        return profiler.stop()
+
+    def get_queue_stats(self):
+        '''Return engine queue statistics.
+
+        `depth`: number of items processed per wake-up of the engine thread.
+        `wait`: time spent by items in the queue (in seconds).
+        '''
+        return {
+            'depth': self._queue_depth.stats(),
+            'wait': self._queue_wait.stats(),
+        }
+
+    def _log_queue_stats(self):
+        depth = self._queue_depth.stats()
+        if not depth.count:
+            return
+        wait = self._queue_wait.stats()
+        log.info('engine queue: %u batches, depth mean=%.1f max=%u, '
+                 'wait mean=%.3fms p99=%.3fms max=%.3fms',
+                 depth.count, depth.mean, depth.max,
+                 wait.mean * 1e3, wait.p99 * 1e3, wait.max * 1e3)
+
     def get_suggestions(self, translation, **kwargs):
-        return Suggestions(self._dictionaries).find(translation, **kwargs)
+        return Suggestions(self._dictionaries.snapshot).find(translation, **kwargs)
 
     @property
     @with_lock
@@ -490,6 +648,7 @@ class StenoEngine:
         if undo:
             state = self._translator.get_state()
             self._formatter.format(state.translations, (), None)
+            self._formatter.flush_output()
         self._translator.clear_state()
 
     @property
@@ -519,13 +678,76 @@ class StenoEngine:
     # Hooks.
 
     def _trigger_hook(self, hook, *args, **kwargs):
-        for callback in self._hooks[hook]:
+        dispatcher = self._hook_dispatcher
+        if dispatcher is None or hook in hooks.SYNC_HOOKS:
+            self._call_hook(hook, args, kwargs)
+        else:
+            dispatcher.dispatch(hook, args, kwargs)
+
+    def _call_hook(self, hook, args, kwargs):
+        # Note: iterate on a copy, as hooks can
+        # be delivered from the dispatcher thread.
+        for callback in tuple(self._hooks[hook]):
+            start = perf_counter()
             try:
-                callback(*args, **kwargs)
+                self._call_hook_callback(hook, callback, args, kwargs)
             except Exception:
                 log.error('hook %r callback %r failed',
                           hook, callback,
                           exc_info=True)
+            self._record_hook_time(hook, callback, perf_counter() - start)
+
+    def _call_hook_callback(self, hook, callback, args, kwargs):
+        callback(*args, **kwargs)
+
+    def _record_hook_time(self, hook, callback, duration):
+        histogram = self._hook_times.get((hook, callback))
+        if histogram is None:
+            # Don't keep a reference to disconnected callbacks
+            # (they may be disconnected while being called).
+            if callback not in self._hooks[hook]:
+                return
+            histogram = self._hook_times[(hook, callback)] = latency.Histogram()
+        if duration > hooks.HOOK_TIME_BUDGET and \
+           histogram.max <= hooks.HOOK_TIME_BUDGET:
+            log.warning('hook %r callback %r took %.1fms (budget: %.1fms)',
+                        hook, callback, duration * 1e3,
+                        hooks.HOOK_TIME_BUDGET * 1e3)
+        histogram.record(duration)
+
+    def _set_async_hooks(self, enabled):
+        if enabled == (self._hook_dispatcher is not None):
+            return
+        if enabled:
+            self._hook_dispatcher = hooks.HookDispatcher(self._call_hook)
+        else:
+            dispatcher = self._hook_dispatcher
+            self._hook_dispatcher = None
+            dispatcher.stop()
+
+    def _set_journal(self, filename):
+        journal = self._journal
+        if journal is not None:
+            if journal.filename == filename:
+                return
+            self._journal = None
+            journal.close()
+        if filename is not None:
+            log.info('setting journal: %s', filename)
+            self._journal = Journal(filename)
+
+    def _format_translations(self, undo, do, prev):
+        # Note: translations must be journaled before the resulting output.
+        if self._journal is not None:
+            self._journal.log_translations(undo, do)
+        self._formatter.format(undo, do, prev)
+
+    def get_hook_stats(self):
+        '''Return timing statistics (`LatencyStats`) by (hook, callback).'''
+        return {
+            key: histogram.stats()
+            for key, histogram in list(self._hook_times.items())
+        }
 
     @with_lock
     def hook_connect(self, hook, callback):
@@ -534,3 +756,5 @@ class StenoEngine:
     @with_lock
     def hook_disconnect(self, hook, callback):
         self._hooks[hook].remove(callback)
+        if callback not in self._hooks[hook]:
+            self._hook_times.pop((hook, callback), None)
@@ -9,9 +9,12 @@ This module defines and implements plover's custom dictionary language.
 
 from os.path import commonprefix
 from collections import namedtuple
+from functools import lru_cache
+from time import perf_counter
 import re
 import string
 
+from plover import latency
 from plover.orthography import add_suffix
 from plover.registry import registry
 
@@ -49,6 +52,8 @@ MODE_RESET_SPACE = 'RESET_SPACE'
 MODE_SET_SPACE = 'SET_SPACE:'
 MODE_SNAKE = 'SNAKE'
 MODE_TITLE = 'TITLE'
+MODE_COMMANDS = (MODE_CAMEL, MODE_CAPS, MODE_LOWER, MODE_RESET,
+                 MODE_RESET_CASE, MODE_RESET_SPACE, MODE_SNAKE, MODE_TITLE)
 
 META_ESCAPE = '\\'
 RE_META_ESCAPE = '\\\\'
@@ -85,6 +90,12 @@ META_RE = re.compile(r"""(?:%s%s|%s%s|[^%s%s])+ # One or more of anything
 #             """, re.VERBOSE)
 
 
+# Maximum number of compiled translations to keep in cache.
+TRANSLATION_CACHE_SIZE = 4096
+
+# Translations compiled ahead of time, see `precompile_translations`.
+_precompiled_translations = {}
+
 WORD_RX = re.compile(r'(?:\d+(?:[.,]\d+)+|[\'\w]+[-\w\']*|[^\w\s]+)\s*', re.UNICODE)
 
 
@@ -103,6 +114,12 @@ class RetroFormatter:
 
     def __init__(self, previous_translations):
         self.previous_translations = previous_translations
+        self._reset_fragments()
+
+    def _reset_fragments(self):
+        # Text fragments found so far (last first), see `iter_last_fragments`.
+        self._fragments = []
+        self._fragments_source = None
 
     def iter_last_actions(self):
         """Iterate over past actions (last first)."""
@@ -115,9 +132,29 @@ class RetroFormatter:
 
         A text fragment is a series of non-whitespace characters
         followed by zero or more trailing whitespace characters.
+
+        Fragments are only computed once, and as far back as needed:
+        previous translations must not change after the first call.
         """
+        fragments = self._fragments
+        index = 0
+        while True:
+            if index == len(fragments):
+                if self._fragments_source is None:
+                    self._fragments_source = self._iter_last_fragments()
+                fragment = next(self._fragments_source, None)
+                if fragment is None:
+                    return
+                # Note: the source may have been advanced by another
+                # iterator, so append, and yield what's next in the list.
+                fragments.append(fragment)
+            yield fragments[index]
+            index += 1
+
+    def _iter_last_fragments(self):
         replace = 0
         next_action = None
+        # The current (first) fragment, not complete yet.
         current_fragment = ''
         for action in self.iter_last_actions():
             part = '' if action.text is None else action.text
@@ -134,8 +171,21 @@ class RetroFormatter:
                     replace -= len(part)
                     part = ''
             if part:
-                # Find out new complete fragments.
-                fragments = self.FRAGMENT_RX.findall(part + current_fragment)
+                # Find out new complete fragments: only the new text
+                # is split, the current fragment is joined as needed.
+                fragments = self.FRAGMENT_RX.findall(part)
+                if len(fragments) == 1 and fragments[0].isspace():
+                    current_fragment = part + current_fragment
+                    replace += len(action.prev_replace)
+                    next_action = action
+                    continue
+                stripped = current_fragment.lstrip()
+                if stripped and (stripped != current_fragment or part[-1].isspace()):
+                    # The current fragment is complete.
+                    yield stripped
+                    fragments[-1] += current_fragment[:-len(stripped)]
+                else:
+                    fragments[-1] += current_fragment
                 for f in reversed(fragments[1:]):
                     yield f
                 current_fragment = fragments[0]
@@ -149,9 +199,10 @@ class RetroFormatter:
         """Return the last <count> text fragments."""
         fragment_list = []
         for fragment in self.iter_last_fragments():
-            fragment_list.insert(0, fragment)
+            fragment_list.append(fragment)
             if len(fragment_list) == count:
                 break
+        fragment_list.reverse()
         return fragment_list
 
     def iter_last_words(self, strip=False, rx=WORD_RX):
@@ -174,21 +225,25 @@ class RetroFormatter:
         """Return the last <count> words."""
         word_list = []
         for w in self.iter_last_words(strip=strip, rx=rx):
-            word_list.insert(0, w)
+            word_list.append(w)
             if len(word_list) == count:
                 break
+        word_list.reverse()
         return word_list
 
     def last_text(self, size):
         """Return the last <size> characters."""
-        text = ''
         if not size:
-            return text
+            return ''
+        text_list = []
+        length = 0
         for fragment in self.iter_last_fragments():
-            text = fragment + text
-            if len(text) >= size:
+            text_list.append(fragment)
+            length += len(fragment)
+            if length >= size:
                 break
-        return text[-size:]
+        text_list.reverse()
+        return ''.join(text_list)[-size:]
 
 
 class _Context(RetroFormatter):
@@ -218,6 +273,7 @@ class _Context(RetroFormatter):
         assert action is not None
         self.translated_actions.append(action)
         self.last_action = action
+        self._reset_fragments()
 
     def iter_last_actions(self):
         """Custom iterator with support for newly translated actions."""
@@ -254,6 +310,7 @@ class Formatter:
                    'send_engine_command'])
 
     def __init__(self):
+        self._batched_output = None
         self.set_output(None)
         self.spaces_after = False
         self.last_output_spaces_after = False
@@ -283,6 +340,29 @@ class Formatter:
         output_type = self.output_type
         fields = output_type._fields
         self._output = output_type(*[getattr(output, f, noop) for f in fields])
+        if self._batched_output is not None:
+            self._batched_output.flush()
+            self._batched_output = _BatchedOutput(self._output)
+
+    def set_batch_output(self, enabled):
+        """Set whether output is batched.
+
+        When enabled, consecutive backspaces and strings are merged into
+        a minimal edit, only sent on `flush_output` (or before a key
+        combination or command, so output is never reordered).
+        """
+        if enabled == (self._batched_output is not None):
+            return
+        if enabled:
+            self._batched_output = _BatchedOutput(self._output)
+        else:
+            self._batched_output.flush()
+            self._batched_output = None
+
+    def flush_output(self):
+        """Send pending batched output, if any."""
+        if self._batched_output is not None:
+            self._batched_output.flush()
 
     def set_space_placement(self, s):
         # Set whether spaces will be inserted
@@ -308,6 +388,8 @@ class Formatter:
         """
         assert undo or do
 
+        start = perf_counter()
+
         if do:
             last_action = None
             if prev:
@@ -363,10 +445,13 @@ class Formatter:
         else:
             last_action = None
 
-        OutputHelper(self._output, self.last_output_spaces_after,
+        output = self._output if self._batched_output is None else self._batched_output
+        OutputHelper(output, self.last_output_spaces_after,
                      self.spaces_after).render(last_action, old, new)
         self.last_output_spaces_after = self.spaces_after
 
+        latency.record_since('format', start)
+
 
 class TextFormatter:
     """Format a series of action into text."""
@@ -430,6 +515,46 @@ class TextFormatter:
         self.appended_text = trailing_space
 
 
+class _BatchedOutput:
+    """Batch text output, see `Formatter.set_batch_output`."""
+
+    def __init__(self, output):
+        self.output = output
+        self.backspaces = 0
+        self.string = ''
+
+    def send_backspaces(self, b):
+        # Erase pending text first.
+        if b > len(self.string):
+            self.backspaces += b - len(self.string)
+            self.string = ''
+        else:
+            self.string = self.string[:len(self.string) - b]
+
+    def send_string(self, s):
+        self.string += s
+
+    def send_key_combination(self, c):
+        self.flush()
+        self.output.send_key_combination(c)
+
+    def send_engine_command(self, c):
+        self.flush()
+        self.output.send_engine_command(c)
+
+    def flush(self):
+        if not (self.backspaces or self.string):
+            return
+        start = perf_counter()
+        if self.backspaces:
+            self.output.send_backspaces(self.backspaces)
+            self.backspaces = 0
+        if self.string:
+            self.output.send_string(self.string)
+            self.string = ''
+        latency.record_since('output', start)
+
+
 class OutputHelper:
     """A helper class for minimizing the amount of change on output.
 
@@ -453,6 +578,7 @@ class OutputHelper:
         # 2
         # >>> len(unicodedata.normalize('NFC', u"C\u0327"))
         # 1
+        start = perf_counter()
         if len(self.before.replaced_text) > len(self.after.replaced_text):
             assert self.before.replaced_text.endswith(self.after.replaced_text)
             replaced_text = self.before.replaced_text
@@ -470,6 +596,9 @@ class OutputHelper:
             self.output.send_string(appended)
         self.before.reset(self.after.trailing_space)
         self.after.reset(self.after.trailing_space)
+        # When batching, the actual output is timed on flush.
+        if not isinstance(self.output, _BatchedOutput):
+            latency.record_since('output', start)
 
     def render(self, last_action, undo, do):
         # Render undone actions, ignoring non-text actions.
@@ -494,6 +623,16 @@ class _Action:
 
     """
 
+    __slots__ = (
+        # Instruction variables.
+        'text', 'prev_replace', 'combo', 'command',
+        # State variables.
+        'word', 'prev_attach', 'next_attach', 'next_case', 'glue',
+        'upper_carry', 'orthography',
+        # Persistent state variables.
+        'space_char', 'case', 'trailing_space',
+    )
+
     def __init__(self,
                  # Previous.
                  prev_attach=False, prev_replace='',
@@ -567,44 +706,83 @@ class _Action:
 
     def copy_state(self):
         """Clone this action but only clone the state variables."""
-        return _Action(
-            # Previous.
-            prev_attach=self.next_attach,
-            # Current.
-            case=self.case, glue=self.glue, orthography=self.orthography,
-            space_char=self.space_char, upper_carry=self.upper_carry,
-            word=self.word, trailing_space=self.trailing_space,
-            # Next.
-            next_attach=self.next_attach, next_case=self.next_case,
-        )
+        action = _new_action(_Action)
+        # Previous.
+        action.prev_attach = self.next_attach
+        action.prev_replace = ''
+        # Current.
+        action.glue = self.glue
+        action.word = self.word
+        action.orthography = self.orthography
+        action.space_char = self.space_char
+        action.upper_carry = self.upper_carry
+        action.case = self.case
+        action.text = None
+        action.trailing_space = self.trailing_space
+        action.combo = None
+        action.command = None
+        # Next.
+        action.next_attach = self.next_attach
+        action.next_case = self.next_case
+        return action
 
     def new_state(self):
-        return _Action(
-            # Previous.
-            prev_attach=self.next_attach,
-            # Current.
-            space_char=self.space_char, case=self.case,
-            trailing_space=self.trailing_space,
-            # Next.
-        )
+        action = _new_action(_Action)
+        # Previous.
+        action.prev_attach = self.next_attach
+        action.prev_replace = ''
+        # Current.
+        action.glue = False
+        action.word = None
+        action.orthography = True
+        action.space_char = self.space_char
+        action.upper_carry = False
+        action.case = self.case
+        action.text = None
+        action.trailing_space = self.trailing_space
+        action.combo = None
+        action.command = None
+        # Next.
+        action.next_attach = False
+        action.next_case = None
+        return action
 
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        if self is other:
+            return True
+        if not isinstance(other, _Action):
+            return NotImplemented
+        return (self.text == other.text and
+                self.prev_replace == other.prev_replace and
+                self.combo == other.combo and
+                self.command == other.command and
+                self.word == other.word and
+                self.prev_attach == other.prev_attach and
+                self.next_attach == other.next_attach and
+                self.next_case == other.next_case and
+                self.glue == other.glue and
+                self.upper_carry == other.upper_carry and
+                self.orthography == other.orthography and
+                self.space_char == other.space_char and
+                self.case == other.case and
+                self.trailing_space == other.trailing_space)
 
     def __ne__(self, other):
         return not self == other
 
     def __str__(self):
         kwargs = [
-            '%s=%r' % (k, v)
-            for k, v in self.__dict__.items()
-            if v != self.DEFAULT.__dict__[k]
+            '%s=%r' % (k, getattr(self, k))
+            for k in self.__slots__
+            if getattr(self, k) != getattr(self.DEFAULT, k)
         ]
         return 'Action(%s)' % ', '.join(sorted(kwargs))
 
     def __repr__(self):
         return str(self)
 
+
+_new_action = object.__new__
 _Action.DEFAULT = _Action()
 
 
@@ -619,6 +797,28 @@ def _translation_to_actions(translation, ctx):
 
     Returns: A list of actions.
 
+    """
+    program = _precompiled_translations.get(translation)
+    if program is None:
+        program = _compile_translation(translation)
+    action_list = []
+    for apply_atom, arg in program:
+        action = _finalize_action(apply_atom(arg, ctx), ctx)
+        action_list.append(action)
+        ctx.translated(action)
+    if not action_list:
+        action = ctx.copy_last_action()
+        action_list = [action]
+        ctx.translated(action)
+    return action_list
+
+
+@lru_cache(maxsize=TRANSLATION_CACHE_SIZE)
+def _compile_translation(translation):
+    """Compile a translation.
+
+    Returns: A tuple of compiled atoms, see `_compile_atom`.
+
     """
     # Reduce the translation to atoms. An atom is an irreducible string that is
     # either entirely a single meta command or entirely text containing no meta
@@ -630,16 +830,67 @@ def _translation_to_actions(translation, ctx):
         atoms = filter(None, (
             x.strip(' ') for x in META_RE.findall(translation))
         )
-    action_list = []
-    for atom in atoms:
-        action = _atom_to_action(atom, ctx)
-        action_list.append(action)
-        ctx.translated(action)
-    if not action_list:
-        action = ctx.copy_last_action()
-        action_list = [action]
-        ctx.translated(action)
-    return action_list
+    return tuple(map(_compile_atom, atoms))
+
+
+def precompile_translations(dictionaries):
+    """Compile all the translations from <dictionaries> ahead of time.
+
+    The compiled translations are kept, until the next call, in a table
+    checked before the compiled translations cache. Translations already
+    compiled by the previous call are reused.
+
+    Returns: A list of `(dictionary, strokes, translation, error)` for
+    the newly compiled translations that are malformed.
+
+    """
+    global _precompiled_translations
+    previous = _precompiled_translations
+    precompiled = {}
+    malformed = []
+    for d in dictionaries:
+        for strokes, translation in d.items():
+            if translation in precompiled:
+                continue
+            program = previous.get(translation)
+            if program is None:
+                program = _compile_translation.__wrapped__(translation)
+                error = _check_translation(translation, program)
+                if error is not None:
+                    malformed.append((d, strokes, translation, error))
+            precompiled[translation] = program
+    _precompiled_translations = precompiled
+    return malformed
+
+
+def _check_translation(translation, program):
+    """Check a compiled translation.
+
+    Returns: A description of the first problem found, or None.
+
+    """
+    if not translation.isdigit() and \
+       ''.join(META_RE.findall(translation)) != translation:
+        return 'unmatched %r or %r' % (META_START, META_END)
+    for apply_atom, arg in program:
+        if apply_atom is _apply_meta_empty:
+            if arg.strip():
+                return 'unknown meta: %r' % arg
+        elif apply_atom is _apply_meta_custom:
+            name = arg[0]
+            try:
+                registry.get_plugin('meta', name)
+            except KeyError:
+                return 'unknown meta plugin: %r' % name
+        elif apply_atom is _apply_meta_mode:
+            command = arg[len(META_MODE):]
+            if command not in MODE_COMMANDS and \
+               not command.startswith(MODE_SET_SPACE):
+                return 'invalid mode: %r' % command
+        elif apply_atom is _apply_meta_currency:
+            if not arg.endswith(')'):
+                return 'invalid retro format: %r' % arg
+    return None
 
 
 def _raw_to_actions(stroke, ctx):
@@ -682,52 +933,66 @@ def _atom_to_action(atom, ctx):
 
     Returns: An action for the atom.
 
+    """
+    apply_atom, arg = _compile_atom(atom)
+    return _finalize_action(apply_atom(arg, ctx), ctx)
+
+
+def _compile_atom(atom):
+    """Compile an atom.
+
+    The meta type of the atom is resolved, and its arguments parsed,
+    so only the context-dependent part is left to do when formatting.
+
+    Returns: A `(apply_atom, arg)` tuple, with `apply_atom(arg, ctx)`
+    returning the (not finalized) action for the atom.
+
     """
     meta = _get_meta(atom)
-    if meta is not None:
-        meta = _unescape_atom(meta)
-        if meta in META_COMMAS:
-            action = _apply_meta_comma(meta, ctx)
-        elif meta in META_STOPS:
-            action = _apply_meta_stop(meta, ctx)
-        elif meta == META_CAPITALIZE:
-            action = _apply_meta_case(CASE_CAP_FIRST_WORD, ctx)
-        elif meta == META_LOWER:
-            action = _apply_meta_case(CASE_LOWER_FIRST_CHAR, ctx)
-        elif meta == META_UPPER:
-            action = _apply_meta_case(CASE_UPPER_FIRST_WORD, ctx)
-        elif meta == META_RETRO_CAPITALIZE:
-            action = _apply_meta_retro_case(CASE_CAP_FIRST_WORD, ctx)
-        elif meta == META_RETRO_LOWER:
-            action = _apply_meta_retro_case(CASE_LOWER_FIRST_CHAR, ctx)
-        elif meta == META_RETRO_UPPER:
-            action = _apply_meta_retro_case(CASE_UPPER_FIRST_WORD, ctx)
-        elif (meta.startswith(META_CARRY_CAPITALIZATION) or
-              meta.startswith(META_ATTACH_FLAG + META_CARRY_CAPITALIZATION)):
-            action = _apply_meta_carry_capitalize(meta, ctx)
-        elif meta.startswith(META_RETRO_FORMAT):
-            action = _apply_meta_currency(meta, ctx)
-        elif meta.startswith(META_COMMAND):
-            action = _apply_meta_command(meta, ctx)
-        elif meta.startswith(META_MODE):
-            action = _apply_meta_mode(meta, ctx)
-        elif meta.startswith(META_GLUE_FLAG):
-            action = _apply_meta_glue(meta, ctx)
-        elif (meta.startswith(META_ATTACH_FLAG) or
-              meta.endswith(META_ATTACH_FLAG)):
-            action = _apply_meta_attach(meta, ctx)
-        elif meta.startswith(META_KEY_COMBINATION):
-            action = _apply_meta_combo(meta, ctx)
-        elif meta.startswith(META_CUSTOM):
-            meta_args = meta[1:].split(':', 1)
-            meta_fn = registry.get_plugin('meta', meta_args[0]).obj
-            action = meta_fn(ctx, meta_args[1] if len(meta_args) == 2 else '')
-        else:
-            action = ctx.new_action()
-    else:
-        action = ctx.new_action()
-        action.text = _unescape_atom(atom)
-    # Finalize action's text.
+    if meta is None:
+        return _apply_text, _unescape_atom(atom)
+    meta = _unescape_atom(meta)
+    if meta in META_COMMAS:
+        return _apply_meta_comma, meta
+    if meta in META_STOPS:
+        return _apply_meta_stop, meta
+    if meta == META_CAPITALIZE:
+        return _apply_meta_case, CASE_CAP_FIRST_WORD
+    if meta == META_LOWER:
+        return _apply_meta_case, CASE_LOWER_FIRST_CHAR
+    if meta == META_UPPER:
+        return _apply_meta_case, CASE_UPPER_FIRST_WORD
+    if meta == META_RETRO_CAPITALIZE:
+        return _apply_meta_retro_case, CASE_CAP_FIRST_WORD
+    if meta == META_RETRO_LOWER:
+        return _apply_meta_retro_case, CASE_LOWER_FIRST_CHAR
+    if meta == META_RETRO_UPPER:
+        return _apply_meta_retro_case, CASE_UPPER_FIRST_WORD
+    if (meta.startswith(META_CARRY_CAPITALIZATION) or
+        meta.startswith(META_ATTACH_FLAG + META_CARRY_CAPITALIZATION)):
+        return _apply_meta_carry_capitalize, meta
+    if meta.startswith(META_RETRO_FORMAT):
+        return _apply_meta_currency, meta
+    if meta.startswith(META_COMMAND):
+        return _apply_meta_command, meta
+    if meta.startswith(META_MODE):
+        return _apply_meta_mode, meta
+    if meta.startswith(META_GLUE_FLAG):
+        return _apply_meta_glue, meta
+    if (meta.startswith(META_ATTACH_FLAG) or
+        meta.endswith(META_ATTACH_FLAG)):
+        return _apply_meta_attach, meta
+    if meta.startswith(META_KEY_COMBINATION):
+        return _apply_meta_combo, meta
+    if meta.startswith(META_CUSTOM):
+        meta_args = meta[1:].split(':', 1)
+        return _apply_meta_custom, (meta_args[0],
+                                    meta_args[1] if len(meta_args) == 2 else '')
+    return _apply_meta_empty, meta
+
+
+def _finalize_action(action, ctx):
+    """Finalize action's text."""
     text = action.text
     if text is not None:
         # Update word.
@@ -751,6 +1016,22 @@ def _atom_to_action(atom, ctx):
     return action
 
 
+def _apply_text(text, ctx):
+    action = ctx.new_action()
+    action.text = text
+    return action
+
+
+def _apply_meta_empty(meta, ctx):
+    return ctx.new_action()
+
+
+def _apply_meta_custom(meta_args, ctx):
+    name, args = meta_args
+    meta_fn = registry.get_plugin('meta', name).obj
+    return meta_fn(ctx, args)
+
+
 def _apply_meta_attach(meta, ctx):
     action = ctx.new_action()
     begin = meta.startswith(META_ATTACH_FLAG)
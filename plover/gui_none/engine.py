@@ -1,6 +1,7 @@
 
 from threading import Thread, current_thread
 
+from plover.async_engine import AsyncStenoEngine
 from plover.engine import StenoEngine
 
 from plover.gui_none.add_translation import AddTranslation
@@ -25,3 +26,20 @@ class Engine(StenoEngine, Thread):
     def join(self):
         Thread.join(self)
         return self.code
+
+
+class AsyncEngine(AsyncStenoEngine, Thread):
+
+    def __init__(self, config, keyboard_emulation):
+        AsyncStenoEngine.__init__(self, config, keyboard_emulation)
+        Thread.__init__(self)
+        self.name += '-engine'
+        self._add_translation = AddTranslation(self)
+
+    def start(self):
+        Thread.start(self)
+        AsyncStenoEngine.start(self)
+
+    def join(self):
+        Thread.join(self)
+        return self.code
@@ -0,0 +1,8 @@
+# Headless GUI, using the asyncio engine.
+
+from plover.gui_none.engine import AsyncEngine
+from plover.gui_none.main import main as _main, show_error
+
+
+def main(config):
+    return _main(config, AsyncEngine)
@@ -307,6 +307,14 @@ class ConfigWindow(QDialog, Ui_ConfigWindow, WindowState):
                              _('Save strokes to the logfile.')),
                 ConfigOption(_('Log translations:'), 'enable_translation_logging', BooleanOption,
                              _('Save translations to the logfile.')),
+                ConfigOption(_('Journal file:'), 'journal_file_name',
+                             partial(FileOption,
+                                     _('Select a journal file'),
+                                     _('Journal files') + ' (*.jsonl)'),
+                             _('File to use for the journal of strokes/translations/output.')),
+                ConfigOption(_('Enable journal:'), 'enable_journal', BooleanOption,
+                             _('Save strokes, translations, and output to the journal\n'
+                               '(in JSON lines format, for analysis).')),
             )),
             (_('Machine'), (
                 ConfigOption(_('Machine:'), 'machine_type', partial(ChoiceOption, choices=machines),
@@ -340,6 +348,11 @@ class ConfigWindow(QDialog, Ui_ConfigWindow, WindowState):
                                '\n'
                                'Note: the effective value will take into account the\n'
                                'dictionaries entry with the maximum number of strokes.')),
+                ConfigOption(_('Batch output:'), 'batch_output', BooleanOption,
+                             _('Merge the output of strokes received in a burst.\n'
+                               '\n'
+                               'This can help with machines sending strokes in\n'
+                               'batches, or slow keyboard emulation.')),
             )),
             (_('Plugins'), (
                 ConfigOption(_('Extension:'), 'enabled_extensions',
@@ -348,6 +361,9 @@ class ConfigWindow(QDialog, Ui_ConfigWindow, WindowState):
                                  for plugin in registry.list_plugins('extension')
                              }, labels=(_('Name'), _('Enabled'))),
                              _('Configure enabled plugin extensions.')),
+                ConfigOption(_('Asynchronous hooks:'), 'async_hooks', BooleanOption,
+                             _('Notify plugins and displays (e.g. paper tape, suggestions)\n'
+                               'from a separate thread, so slow listeners do not delay output.')),
             )),
             (_('System'), (
                 ConfigOption(_('System:'), 'system_name',
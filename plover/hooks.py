@@ -0,0 +1,118 @@
+"""Asynchronous delivery of engine hooks.
+
+When enabled (see the `async_hooks` option), hooks that don't affect
+output (or the processing of the next strokes) are delivered from a
+separate dispatcher thread, so slow callbacks (paper tape, suggestions,
+extensions, ...) don't add to the latency of stroke processing.
+"""
+
+from collections import deque
+import itertools
+import threading
+
+
+# Hooks always delivered synchronously (from the engine thread): the ones
+# affecting output, and the ones that must run in order with the strokes
+# stream (e.g. `add_translation` changing the translator state).
+SYNC_HOOKS = {
+    'send_string',
+    'send_backspaces',
+    'send_key_combination',
+    'add_translation',
+    'focus',
+    'configure',
+    'quit',
+}
+
+# Time budget (in seconds) for a hook callback,
+# a warning is logged the first time it's exceeded.
+HOOK_TIME_BUDGET = 0.01
+
+# Hooks for which only the last pending event needs to be delivered
+# (at the position of that last event, so hooks are never reordered).
+COALESCED_HOOKS = {
+    'output_changed',
+    'dictionaries_loaded',
+}
+
+
+class HookDispatcher:
+    """Deliver hooks from a dispatcher thread, in order."""
+
+    def __init__(self, call_hook):
+        self._call_hook = call_hook
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._stopping = False
+        # Last event (sequence number and arguments) for coalesced hooks.
+        self._coalesced = {}
+        self._sequence = itertools.count()
+        self._thread = threading.Thread(target=self._run, name='hooks')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def dispatch(self, hook, args, kwargs):
+        with self._condition:
+            if hook in COALESCED_HOOKS:
+                sequence = next(self._sequence)
+                self._coalesced[hook] = (sequence, args, kwargs)
+                # Note: the previous pending event (if any) becomes stale.
+                args, kwargs = sequence, None
+            self._pending.append((hook, args, kwargs))
+            self._condition.notify()
+
+    def _next(self):
+        # Return the next hook to deliver, or None if there's none
+        # pending. Note: must be called with the condition lock held.
+        while self._pending:
+            hook, args, kwargs = self._pending.popleft()
+            if hook not in COALESCED_HOOKS:
+                return hook, args, kwargs
+            sequence = args
+            last = self._coalesced.get(hook)
+            if last is None or last[0] != sequence:
+                # Stale: superseded by a later event.
+                continue
+            del self._coalesced[hook]
+            sequence, args, kwargs = last
+            return hook, args, kwargs
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    item = self._next()
+                    if item is not None or self._stopping:
+                        break
+                    self._condition.wait()
+            if item is None:
+                break
+            self._call_hook(*item)
+
+    def stop(self):
+        '''Stop the dispatcher, once pending hooks have been delivered.'''
+        # Note: don't wait for the dispatcher thread, as this is called
+        # with the engine lock held, and a callback may need it.
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+
+    def cancel(self):
+        '''Stop the dispatcher, and return the hooks not delivered yet.
+
+        The pending hooks are returned in order, as `(hook, args, kwargs)`
+        tuples, for the caller to deliver. Note: like with `stop`, the
+        dispatcher thread is not waited for, so a hook it's already
+        delivering may still be running.
+        '''
+        with self._condition:
+            pending = []
+            while True:
+                item = self._next()
+                if item is None:
+                    break
+                pending.append(item)
+            self._stopping = True
+            self._condition.notify()
+        return pending
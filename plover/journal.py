@@ -0,0 +1,189 @@
+"""Structured journal of strokes, translations, and output.
+
+Unlike the strokes log, the journal is meant for analysis: each entry is
+a JSON object on its own line, with a timestamp (seconds since the epoch)
+and a type:
+
+    {"time": 1514808000.042, "type": "stroke", "keys": ["K-", "A-", "-T"], "steno": "KAT"}
+    {"time": 1514808000.042, "type": "translation", "undo": false, "strokes": ["KAT"], "translation": "cat"}
+    {"time": 1514808000.042, "type": "output", "string": " cat"}
+
+Output entries have one of the `string`, `backspaces`, or
+`key_combination` fields. Undone translations have `undo` set.
+
+Entries are encoded and written by a background thread, with buffered
+I/O, and the journal is rotated by size (like the main log). Use `read`
+to iterate on the entries of a journal (including rotated backups).
+"""
+
+from queue import Queue
+import json
+import os
+import threading
+import time
+
+from plover import log
+
+
+JOURNAL_MAX_BYTES = 10000000
+JOURNAL_COUNT = 9
+JOURNAL_BUFFER_SIZE = 64 * 1024
+
+
+def _stroke_entry(timestamp, stroke):
+    return {
+        'time': timestamp,
+        'type': 'stroke',
+        'keys': list(stroke.steno_keys),
+        'steno': stroke.rtfcre,
+    }
+
+
+def _translation_entry(timestamp, undo, translation):
+    return {
+        'time': timestamp,
+        'type': 'translation',
+        'undo': undo,
+        'strokes': list(translation.rtfcre),
+        'translation': translation.english,
+    }
+
+
+def _output_entry(timestamp, kind, value):
+    return {
+        'time': timestamp,
+        'type': 'output',
+        kind: value,
+    }
+
+
+class Journal:
+    """Write a journal, see module documentation."""
+
+    def __init__(self, filename, max_bytes=JOURNAL_MAX_BYTES,
+                 backup_count=JOURNAL_COUNT):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._fp = None
+        self._failed = False
+        self._queue = Queue()
+        self._thread = threading.Thread(target=self._run, name='journal')
+        self._thread.daemon = True
+        self._thread.start()
+
+    # Called from the engine thread: entries are built right away (as
+    # strokes and translations can later be changed by the engine), only
+    # the encoding and writing is done by the writer thread.
+
+    def log_stroke(self, stroke):
+        self._queue.put(_stroke_entry(time.time(), stroke))
+
+    def log_translations(self, undo, do):
+        timestamp = time.time()
+        for t in undo:
+            self._queue.put(_translation_entry(timestamp, True, t))
+        for t in do:
+            self._queue.put(_translation_entry(timestamp, False, t))
+
+    def log_output(self, kind, value):
+        self._queue.put(_output_entry(time.time(), kind, value))
+
+    def _open(self):
+        dirname = os.path.dirname(self.filename)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self._fp = open(self.filename, 'a', encoding='utf-8',
+                        buffering=JOURNAL_BUFFER_SIZE)
+
+    def _close(self):
+        fp, self._fp = self._fp, None
+        if fp is not None:
+            fp.close()
+
+    def _rotate(self):
+        self._close()
+        for n in range(self.backup_count - 1, 0, -1):
+            src = '%s.%u' % (self.filename, n)
+            if os.path.exists(src):
+                os.replace(src, '%s.%u' % (self.filename, n + 1))
+        if self.backup_count > 0:
+            os.replace(self.filename, self.filename + '.1')
+        else:
+            os.remove(self.filename)
+        self._open()
+
+    def _write(self, entries):
+        if self._fp is None:
+            self._open()
+        for entry in entries:
+            self._fp.write(json.dumps(entry, ensure_ascii=False))
+            self._fp.write('\n')
+        self._fp.flush()
+        if self.max_bytes > 0 and self._fp.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _run(self):
+        queue = self._queue
+        stop = False
+        while not stop:
+            # Write all pending entries, then flush.
+            entries = [queue.get()]
+            while not queue.empty():
+                entries.append(queue.get_nowait())
+            if entries[-1] is None:
+                entries.pop()
+                stop = True
+            try:
+                self._write(entries)
+            except Exception:
+                # Log the first error, and try again on the next entries.
+                if not self._failed:
+                    log.error('writing journal %s failed', self.filename, exc_info=True)
+                self._failed = True
+                try:
+                    self._close()
+                except Exception:
+                    pass
+            else:
+                self._failed = False
+        try:
+            self._close()
+        except Exception:
+            log.error('closing journal %s failed', self.filename, exc_info=True)
+
+    def close(self):
+        '''Write pending entries, and close the journal.'''
+        self._queue.put(None)
+        self._thread.join()
+
+
+def journal_files(filename):
+    '''Return the existing files of journal <filename>, oldest first.'''
+    files = []
+    n = 1
+    while os.path.exists('%s.%u' % (filename, n)):
+        files.insert(0, '%s.%u' % (filename, n))
+        n += 1
+    if os.path.exists(filename):
+        files.append(filename)
+    return files
+
+
+def read(filename, rotated=True, types=None):
+    '''Iterate on the entries of journal <filename>, oldest first.
+
+    Entries from rotated backups are included if <rotated> is true,
+    and only entries of the given <types> are returned (if specified).
+    Invalid lines (e.g. truncated after a crash) are skipped.
+    '''
+    files = journal_files(filename) if rotated else [filename]
+    for path in files:
+        with open(path, encoding='utf-8') as fp:
+            for line in fp:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if types is None or entry.get('type') in types:
+                    yield entry
@@ -0,0 +1,121 @@
+"""Low overhead latency instrumentation.
+
+Timings are recorded per probe (e.g. `translate`, `format`, `send_string`)
+into rolling histograms keeping the last samples, and percentiles are
+only computed when the statistics are queried.
+
+Probes used by Plover:
+
+stroke -- From a machine notifying a stroke to the engine being done
+          with it (translation, formatting, output and `stroked` hooks).
+
+queue -- Time spent by a stroke waiting in the engine queue.
+
+translate -- Translator.translate (includes formatting and output).
+
+format -- Formatter.format (includes output).
+
+output -- OutputHelper.flush, or the flush of pending output when output
+          is batched (includes the keyboard emulation calls).
+
+send_string, send_backspaces, send_key_combination -- Keyboard emulation.
+
+"""
+
+from collections import deque, namedtuple
+from time import perf_counter
+
+from plover import log
+
+
+# Number of samples kept per probe.
+SAMPLES = 1000
+
+LatencyStats = namedtuple('LatencyStats', 'count mean p50 p95 p99 max')
+
+
+class Histogram:
+    """Rolling histogram of the last SAMPLES values (durations are in seconds)."""
+
+    __slots__ = ('samples', 'count', 'total', 'max')
+
+    def __init__(self, size=SAMPLES):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, duration):
+        self.samples.append(duration)
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    def stats(self):
+        # Note: copying a deque is atomic, so it's safe
+        # even if another thread is recording.
+        samples = sorted(self.samples.copy())
+        if not samples:
+            return LatencyStats(0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        def percentile(p):
+            return samples[min(int(len(samples) * p / 100), len(samples) - 1)]
+        return LatencyStats(self.count, self.total / self.count,
+                            percentile(50), percentile(95), percentile(99),
+                            self.max)
+
+
+_histograms = {}
+_enabled = True
+
+
+def enable(enabled):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    return _enabled
+
+
+def record(probe, duration):
+    """Record a <duration> (in seconds) for <probe>."""
+    if not _enabled:
+        return
+    histogram = _histograms.get(probe)
+    if histogram is None:
+        histogram = _histograms[probe] = Histogram()
+    histogram.record(duration)
+
+
+def record_since(probe, start):
+    """Record the time elapsed since <start> (from perf_counter) for <probe>."""
+    record(probe, perf_counter() - start)
+
+
+def get_stats():
+    """Return a dictionary of `LatencyStats` (in seconds), by probe name."""
+    return {
+        probe: histogram.stats()
+        for probe, histogram in list(_histograms.items())
+    }
+
+
+def reset():
+    _histograms.clear()
+
+
+def format_stats(stats):
+    lines = ['%-20s %8s %8s %8s %8s %8s %8s' % (
+        'latency (ms)', 'count', 'mean', 'p50', 'p95', 'p99', 'max')]
+    for probe, s in sorted(stats.items()):
+        lines.append('%-20s %8u %8.3f %8.3f %8.3f %8.3f %8.3f' % (
+            probe, s.count, s.mean * 1e3, s.p50 * 1e3,
+            s.p95 * 1e3, s.p99 * 1e3, s.max * 1e3))
+    return '\n'.join(lines)
+
+
+def log_stats():
+    stats = get_stats()
+    if stats:
+        log.info('%s', format_stats(stats))
@@ -5,9 +5,14 @@
 
 import os
 import sys
+import copy
+import atexit
 import logging
+import logging.handlers
+import threading
 import traceback
 
+from queue import Queue
 from logging.handlers import RotatingFileHandler
 from logging import DEBUG, INFO, WARNING, ERROR
 
@@ -59,23 +64,125 @@ class PrintHandler(logging.StreamHandler):
         self.setFormatter(logging.Formatter(format))
 
 
+class QueueHandler(logging.handlers.QueueHandler):
+    """Queue records, along with the handlers to use for them."""
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        # Note: a tuple, so it can be safely shared with the listener.
+        self.handlers = ()
+
+    def prepare(self, record):
+        # Merge the message arguments now (they may be modified later),
+        # but keep the exception information, so each handler can format
+        # it as it sees fit (see `NoExceptionTracebackFormatter`).
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        self.queue.put_nowait((self.handlers, record))
+
+
+class QueueListener(logging.handlers.QueueListener):
+    """Dispatch records queued by `QueueHandler` to their handlers."""
+
+    def handle(self, item):
+        handlers, record = item
+        if handlers is None:
+            # Removed handler to close, once its pending
+            # records have been handled (see `Logger._remove_handler`).
+            record.close()
+            return
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
 class Logger:
 
     def __init__(self):
+        self._logger = logging.getLogger('plover')
+        self._logger.setLevel(INFO)
+        self._stroke_logger = logging.getLogger('plover-strokes')
+        self._stroke_logger.setLevel(INFO)
+        # Records are handled from a separate thread, so logging
+        # does not block the caller (e.g. the engine thread) on
+        # slow handlers (disk, D-Bus notifications, ...).
+        self._queue = Queue()
+        self._queue_handlers = {}
+        for logger in (self._logger, self._stroke_logger):
+            queue_handler = QueueHandler(self._queue)
+            logger.addHandler(queue_handler)
+            self._queue_handlers[logger] = queue_handler
+        self._listener = QueueListener(self._queue)
+        self._listener.start()
+        atexit.register(self.shutdown)
         self._print_handler = PrintHandler()
         self._print_handler.setLevel(WARNING)
         self._file_handler = None
         self._platform_handler = None
-        self._logger = logging.getLogger('plover')
-        self._logger.addHandler(self._print_handler)
-        self._logger.setLevel(INFO)
+        self.addHandler(self._print_handler)
         self._stroke_filename = None
-        self._stroke_logger = logging.getLogger('plover-strokes')
-        self._stroke_logger.setLevel(INFO)
         self._stroke_handler = None
         self._log_strokes = False
         self._log_translations = False
 
+    def _add_handler(self, logger, handler):
+        if self._listener is None:
+            logger.addHandler(handler)
+            return
+        queue_handler = self._queue_handlers[logger]
+        if handler not in queue_handler.handlers:
+            queue_handler.handlers += (handler,)
+
+    def _remove_handler(self, logger, handler, close=False):
+        if self._listener is None:
+            logger.removeHandler(handler)
+            if close:
+                handler.close()
+            return
+        queue_handler = self._queue_handlers[logger]
+        queue_handler.handlers = tuple(h for h in queue_handler.handlers
+                                       if h is not handler)
+        if close:
+            # Note: don't wait for the listener (this could be called
+            # from the listener thread itself), let it close the handler
+            # once it's done with the records still using it.
+            self._queue.put_nowait((None, handler))
+
+    def addHandler(self, handler):
+        self._add_handler(self._logger, handler)
+
+    def removeHandler(self, handler):
+        self._remove_handler(self._logger, handler)
+
+    def flush(self):
+        '''Wait for pending records to be handled.'''
+        listener = self._listener
+        if listener is None:
+            return
+        # Waiting from the listener thread would deadlock.
+        if threading.current_thread() is listener._thread:
+            return
+        self._queue.join()
+
+    def shutdown(self):
+        '''Handle pending records, and switch to synchronous logging.'''
+        listener = self._listener
+        if listener is None:
+            return
+        listener.stop()
+        self._listener = None
+        for logger, queue_handler in self._queue_handlers.items():
+            for handler in queue_handler.handlers:
+                logger.addHandler(handler)
+            logger.removeHandler(queue_handler)
+        # Records queued while switching.
+        while not self._queue.empty():
+            listener.handle(self._queue.get_nowait())
+
     def has_platform_handler(self):
         return self._platform_handler is not None
 
@@ -115,7 +222,7 @@ class Logger:
         assert self._file_handler is None
         self._file_handler = FileHandler()
         self._file_handler.setLevel(self.level)
-        self._logger.addHandler(self._file_handler)
+        self.addHandler(self._file_handler)
 
     def _setup_stroke_logging(self):
         is_logging = self._stroke_handler is not None
@@ -131,13 +238,12 @@ class Logger:
             stop_logging = is_logging
             start_logging = False
         if stop_logging:
-            self._stroke_logger.removeHandler(self._stroke_handler)
-            self._stroke_handler.close()
+            self._remove_handler(self._stroke_logger, self._stroke_handler, close=True)
             self._stroke_handler = None
         if start_logging:
             self._stroke_handler = FileHandler(filename=self._stroke_filename,
                                                format=STROKE_LOG_FORMAT)
-            self._stroke_logger.addHandler(self._stroke_handler)
+            self._add_handler(self._stroke_logger, self._stroke_handler)
 
     def set_stroke_filename(self, filename=None):
         if filename is not None:
@@ -195,6 +301,8 @@ add_handler = __logger.addHandler
 remove_handler = __logger.removeHandler
 has_platform_handler = __logger.has_platform_handler
 setup_platform_handler = __logger.setup_platform_handler
+flush = __logger.flush
+shutdown = __logger.shutdown
 # Strokes/translation logging.
 set_stroke_filename = __logger.set_stroke_filename
 stroke = __logger.log_stroke
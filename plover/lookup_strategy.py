@@ -0,0 +1,98 @@
+"""Lookup strategies for the translator.
+
+A lookup strategy maps a new stroke, in the context of the last
+translations, to a new translation. It is a function taking the
+translator and the new stroke, and returning a Translation (whose
+`replaced` attribute lists the previous translations it replaces),
+or a list of translations (only the first one can replace previous
+translations).
+
+Dictionary lookups must be done through the translator `_lookup`
+method, so they are accounted for in the strategy's stats.
+
+"""
+
+from plover import system
+from plover.translation import Translation
+
+
+# Cost of an untranslated stroke when segmenting,
+# compared to 1 for each dictionary entry.
+UNTRANSLATED_COST = 10
+
+
+def greedy(translator, stroke):
+    """Greedy longest match (the default strategy).
+
+    Try the longest window of strokes first, then with folded suffixes,
+    then with folded prefixes.
+    """
+    return translator._find_translation(stroke,
+                                        suffixes=system.SUFFIX_KEYS,
+                                        prefixes=system.PREFIX_KEYS)
+
+
+def best_segmentation(translator, stroke):
+    """Best segmentation of the strokes window.
+
+    Find the segmentation of the window (previous translations plus the
+    new stroke) using the fewest dictionary entries, and penalizing
+    untranslated strokes. Unlike the greedy strategy, previous strokes
+    can be split differently, e.g. with "A/B" and "B/C" defined, A, B, C
+    results in "A" + "B/C" instead of "A/B" + untranslated "C".
+
+    When the best segmentation has more than one entry, each entry is
+    returned as a separate translation (so metas and affixes are formatted
+    as usual), the first one replacing the previous translations. Folded
+    affixes are not supported.
+    """
+    translations = translator._get_window()
+    rtfcre = [s for t in translations for s in t.rtfcre]
+    rtfcre.append(stroke.rtfcre)
+    count = len(rtfcre)
+    # best[n]: (cost, segments) for the best segmentation of rtfcre[n:],
+    # with segments a tuple of (start, end, key, mapping) tuples.
+    best = [None] * count + [(0, ())]
+    for start in range(count - 1, -1, -1):
+        key = None
+        for end in range(start + 1, count + 1):
+            key = rtfcre[start] if key is None else key + '/' + rtfcre[end - 1]
+            mapping = translator._lookup(key)
+            if mapping is not None:
+                cost = 1
+            elif end == start + 1:
+                cost = UNTRANSLATED_COST
+            else:
+                continue
+            next_cost, next_segments = best[end]
+            cost += next_cost
+            if best[start] is None or cost < best[start][0]:
+                best[start] = (cost, ((start, end, key, mapping),) + next_segments)
+    # Find which of the previous translations to replace: try each
+    # translation boundary, last first, so when two segmentations
+    # are equally good, the one replacing less is used.
+    prefix_costs = [0]
+    for t in translations:
+        prefix_costs.append(prefix_costs[-1] +
+                            (UNTRANSLATED_COST if t.english is None else 1))
+    boundary = count - 1
+    choice = None
+    for index in range(len(translations), -1, -1):
+        cost = prefix_costs[index] + best[boundary][0]
+        if choice is None or cost < choice[0]:
+            choice = (cost, index, best[boundary][1])
+        if index:
+            boundary -= len(translations[index - 1])
+    cost, index, segments = choice
+    replaced = translations[index:]
+    if len(segments) == 1:
+        start, end, key, mapping = segments[0]
+        if not replaced:
+            return Translation([stroke], mapping)
+        return Translation._from_replaced(replaced, stroke, mapping, key)
+    strokes = [s for t in translations for s in t.strokes]
+    strokes.append(stroke)
+    result = [Translation(strokes[start:end], mapping)
+              for start, end, key, mapping in segments]
+    result[0].replaced = replaced
+    return result
@@ -0,0 +1,130 @@
+"""Replay strokes from a file, for testing throughput and reproducing issues.
+
+Two formats are supported:
+
+- a stroke log, as written by Plover when strokes logging is enabled
+  (translations entries are ignored):
+
+    2018-01-01 12:00:00,042 Stroke(KAT : ['K-', 'A-', '-T'])
+
+- a raw capture: one stroke per line, as a list of steno keys, optionally
+  preceded by a timestamp (in seconds):
+
+    0.042 K- A- -T
+
+Since strokes are already made of steno keys, no keymap is applied.
+
+Strokes are replayed at their original timing, scaled by the `speed`
+option (2 for twice as fast), or as fast as possible when `speed` is 0.
+"""
+
+from datetime import datetime
+from time import perf_counter
+import ast
+import re
+
+from plover import log, system
+from plover.machine.base import ThreadedStenotypeBase
+
+
+STROKE_LOG_RX = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),(\d{3}) '
+                           r'\*?Stroke\(.* : (\[.*\])\)$')
+TIMESTAMP_RX = re.compile(r'^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3} ')
+
+
+def parse_stroke_log_line(line):
+    '''Parse a stroke log line: return (timestamp, steno_keys) or None.'''
+    m = STROKE_LOG_RX.match(line)
+    if m is None:
+        return None
+    timestamp = datetime.strptime(m.group(1), '%Y-%m-%d %H:%M:%S')
+    timestamp = timestamp.timestamp() + int(m.group(2)) / 1000
+    return timestamp, ast.literal_eval(m.group(3))
+
+
+def parse_raw_capture_line(line):
+    '''Parse a raw capture line: return (timestamp, steno_keys) or None.'''
+    fields = line.split()
+    if not fields:
+        return None
+    try:
+        timestamp = float(fields[0])
+    except ValueError:
+        timestamp = None
+    else:
+        fields = fields[1:]
+    return timestamp, fields
+
+
+def load_strokes(filename):
+    '''Load strokes from <filename>: return a list of (timestamp, steno_keys).
+
+    Timestamps may be None (no timing information).
+    '''
+    strokes = []
+    parse_line = None
+    with open(filename, encoding='utf-8') as fp:
+        for line in fp:
+            line = line.strip()
+            if not line:
+                continue
+            if parse_line is None:
+                if TIMESTAMP_RX.match(line) is not None:
+                    parse_line = parse_stroke_log_line
+                else:
+                    parse_line = parse_raw_capture_line
+            stroke = parse_line(line)
+            if stroke is None or not stroke[1]:
+                continue
+            strokes.append(stroke)
+    return strokes
+
+
+class Replay(ThreadedStenotypeBase):
+    """Replay strokes from a stroke log or raw capture."""
+
+    def __init__(self, params):
+        super().__init__()
+        self._filename = params['file']
+        self._speed = params['speed']
+        # Achieved replay speed, once done.
+        self.strokes_per_second = None
+
+    @classmethod
+    def get_keys(cls):
+        return system.KEYS
+
+    def run(self):
+        try:
+            strokes = load_strokes(self._filename)
+        except (OSError, ValueError, SyntaxError):
+            log.error('loading strokes from %s failed', self._filename, exc_info=True)
+            self._error()
+            return
+        self._ready()
+        log.info('replaying %u strokes from %s', len(strokes), self._filename)
+        start_time = perf_counter()
+        first_timestamp = None
+        count = 0
+        for timestamp, steno_keys in strokes:
+            if self.finished.is_set():
+                break
+            if self._speed > 0 and timestamp is not None:
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                delay = start_time + (timestamp - first_timestamp) / self._speed - perf_counter()
+                if delay > 0 and self.finished.wait(delay):
+                    break
+            self._notify(steno_keys)
+            count += 1
+        elapsed = perf_counter() - start_time
+        self.strokes_per_second = count / elapsed if elapsed else 0.0
+        log.info('replayed %u strokes in %.3fs: %.1f strokes per second',
+                 count, elapsed, self.strokes_per_second)
+
+    @classmethod
+    def get_option_info(cls):
+        return {
+            'file': ('', str),
+            'speed': (1.0, float),
+        }
@@ -20,7 +20,7 @@ if sys.platform.startswith('darwin'):
 from plover.config import CONFIG_DIR, CONFIG_FILE, Config
 from plover.oslayer import processlock
 from plover.registry import registry
-from plover import log
+from plover import log, profiling
 from plover import __name__ as __software_name__
 from plover import __version__
 
@@ -53,7 +53,15 @@ def main():
     parser.add_argument('-l', '--log-level', choices=['debug', 'info', 'warning', 'error'],
                         default=None, help='set log level')
     parser.add_argument('-g', '--gui', default=None, help='set gui')
+    parser.add_argument('-p', '--profile', nargs='?', const='', default=None,
+                        metavar='OPTIONS', help='profile strokes processing '
+                        '(e.g. `mode=sample,strokes=200`), see `plover.profiling`')
     args = parser.parse_args(args=sys.argv[1:])
+    if args.profile is not None:
+        try:
+            profiling.startup_options = profiling.parse_options(args.profile)
+        except ValueError as e:
+            parser.error(str(e))
     if args.log_level is not None:
         log.set_level(args.log_level.upper())
     log.setup_platform_handler()
@@ -67,6 +75,7 @@ def main():
         gui_priority = {
             'qt': 1,
             'none': -1,
+            'none_asyncio': -2,
         }
         gui_list = sorted(registry.list_plugins('gui'), reverse=True,
                           key=lambda gui: gui_priority.get(gui.name, 0))
@@ -113,6 +122,7 @@ def main():
                         print('%s:' % dist)
                     print('- %s' % e.name)
                 code = 0
+            log.shutdown()
             os._exit(code)
 
         # Ensure only one instance of Plover is running at a time.
@@ -149,6 +159,8 @@ def main():
             code = 0
         else:
             os.execv(args[0], args)
+    # Note: `os._exit` does not run atexit handlers.
+    log.shutdown()
     os._exit(code)
 
 if __name__ == '__main__':
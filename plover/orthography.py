@@ -3,12 +3,199 @@
 
 """Functions that implement some English orthographic rules."""
 
-from plover import system
+from functools import lru_cache
+import hashlib
+import json
+import os
+import re
 
+from plover import log, system
+from plover.oslayer.config import CONFIG_DIR
+
+
+# Maximum number of suffix additions to keep in cache.
+ADD_SUFFIX_CACHE_SIZE = 4096
+
+# Maximum number of suffixes to keep the matching rules of in cache.
+SUFFIX_RULES_CACHE_SIZE = 256
+
+# Default number of words (most common first) to precompute the forms of.
+SUFFIX_TABLE_WORDS = 20000
+
+
+class SuffixTable:
+    """Precomputed suffix forms for the most common words of a wordlist."""
+
+    __slots__ = ('suffixes', 'forms')
+
+    def __init__(self, suffixes, forms):
+        # Index of each suffix in forms.
+        self.suffixes = {suffix: n for n, suffix in enumerate(suffixes)}
+        # Forms for each word, empty if a simple join.
+        self.forms = forms
+
+    def __len__(self):
+        return len(self.forms)
+
+    def get(self, word, suffix):
+        """Return the form of <word> with <suffix>, or None if unknown."""
+        index = self.suffixes.get(suffix)
+        if index is None:
+            return None
+        forms = self.forms.get(word)
+        if forms is None:
+            return None
+        return forms[index] or word + suffix
+
+
+def suffix_table_path(wordlist):
+    return os.path.join(CONFIG_DIR, wordlist + '.suffixes')
+
+def _suffix_table_signature(wordlist_path, rules, aliases):
+    stat = os.stat(wordlist_path)
+    rules = repr(([tuple(r) for r in rules], sorted(aliases.items())))
+    return {
+        'wordlist_size': stat.st_size,
+        'wordlist_mtime': stat.st_mtime_ns,
+        'rules': hashlib.sha1(rules.encode('utf-8')).hexdigest(),
+    }
+
+def load_suffix_table(path, wordlist_path, rules, aliases):
+    """Load a suffix table, if it exists and is up to date.
+
+    Arguments:
+
+    path -- The table file.
+
+    wordlist_path -- The wordlist the table was built from.
+
+    rules, aliases -- The orthography rules (patterns and replacements)
+    and aliases the table was built with.
+
+    """
+    if not os.path.exists(path) or not os.path.exists(wordlist_path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as fp:
+            header = json.loads(fp.readline())
+            if header['signature'] != _suffix_table_signature(wordlist_path,
+                                                              rules, aliases):
+                log.info('ignoring outdated suffix table: %s', path)
+                return None
+            suffixes = header['suffixes']
+            if not isinstance(suffixes, list) or \
+               not all(isinstance(suffix, str) for suffix in suffixes):
+                raise ValueError('invalid suffixes')
+            forms = {}
+            for line in fp:
+                stem, *stem_forms = line.rstrip('\n').split('\t')
+                if len(stem_forms) != len(suffixes):
+                    raise ValueError('invalid forms for: %s' % stem)
+                forms[stem] = tuple(stem_forms)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        # Fallback to the rules.
+        log.warning('ignoring invalid suffix table: %s (%s)', path, e)
+        return None
+    return SuffixTable(suffixes, forms)
+
+def build_suffix_table(words=SUFFIX_TABLE_WORDS, suffixes=None):
+    """Build a suffix table for the current system.
+
+    Precompute the forms of the <words> most common words of
+    the wordlist with each suffix (by default, the system's
+    ORTHOGRAPHY_SUFFIXES).
+    """
+    if suffixes is None:
+        suffixes = system.ORTHOGRAPHY_SUFFIXES
+    wordlist = system.ORTHOGRAPHY_WORDS
+    forms = {}
+    for stem in sorted(wordlist, key=wordlist.get)[:words]:
+        stem_forms = []
+        for suffix in suffixes:
+            form = _add_suffix(stem, suffix)
+            stem_forms.append('' if form == stem + suffix else form)
+        forms[stem] = tuple(stem_forms)
+    return SuffixTable(suffixes, forms)
+
+def save_suffix_table(table, path, wordlist_path, rules, aliases):
+    header = {
+        'signature': _suffix_table_signature(wordlist_path, rules, aliases),
+        'suffixes': sorted(table.suffixes, key=table.suffixes.get),
+    }
+    with open(path, 'w', encoding='utf-8') as fp:
+        fp.write(json.dumps(header) + '\n')
+        for stem, stem_forms in table.forms.items():
+            fp.write('\t'.join((stem,) + stem_forms) + '\n')
+
+
+def _rule_suffix_pattern(pattern):
+    """Return the suffix part of a rule <pattern>, or None.
+
+    The suffix part is what follows the ` \^ ` separator, which must
+    appear exactly once at the top level of the pattern (not in a group
+    or a set). Patterns with a top-level alternation are ambiguous (the
+    separator does not split all the branches), so None is returned.
+    """
+    separators = []
+    depth = 0
+    in_set = False
+    index = 0
+    while index < len(pattern):
+        c = pattern[index]
+        if c == '\\':
+            if not in_set and depth == 0 and \
+               pattern.startswith(r' \^ ', index - 1):
+                separators.append(index - 1)
+            index += 2
+            continue
+        if in_set:
+            if c == ']':
+                in_set = False
+        elif c == '[':
+            in_set = True
+            # A closing bracket first in a set is a literal.
+            if pattern.startswith('^]', index + 1):
+                index += 2
+            elif pattern.startswith(']', index + 1):
+                index += 1
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            return None
+        index += 1
+    if len(separators) != 1:
+        return None
+    return pattern[separators[0] + 4:]
+
+@lru_cache(maxsize=SUFFIX_RULES_CACHE_SIZE)
+def _suffix_rules(suffix, system_name):
+    """Return the orthography rules that can apply to <suffix>.
+
+    Rules are matched against `word ^ suffix`: the part of each rule
+    pattern after the ` ^ ` separator is checked against the suffix, so
+    the full pattern does not have to be tried for each word. Rules that
+    can't be split that way are always kept.
+    """
+    rules = []
+    for rule in system.ORTHOGRAPHY_RULES:
+        pattern = rule[0]
+        suffix_pattern = _rule_suffix_pattern(pattern.pattern)
+        if suffix_pattern is not None:
+            try:
+                suffix_rx = re.compile(suffix_pattern, pattern.flags)
+            except re.error:
+                pass
+            else:
+                if suffix_rx.match(suffix) is None:
+                    continue
+        rules.append(rule)
+    return rules
 
 def make_candidates_from_rules(word, suffix, check=lambda x: True):
     candidates = []
-    for r in system.ORTHOGRAPHY_RULES:
+    for r in _suffix_rules(suffix, system.NAME):
         m = r[0].match(word + " ^ " + suffix)
         if m:   
             expanded = m.expand(r[1])
@@ -47,6 +234,24 @@ def _add_suffix(word, suffix):
     # If all else fails then just do a simple join.
     return simple
 
+@lru_cache(maxsize=ADD_SUFFIX_CACHE_SIZE)
+def _cached_add_suffix(word, suffix, system_name):
+    table = system.ORTHOGRAPHY_SUFFIX_TABLE
+    if table is not None:
+        form = table.get(word, suffix)
+        if form is not None:
+            return form
+    return _add_suffix(word, suffix)
+
+def clear_caches():
+    """Clear the suffix rules and additions caches.
+
+    Called on system setup, since the system's rules, wordlist,
+    or suffix table may have been reloaded.
+    """
+    _suffix_rules.cache_clear()
+    _cached_add_suffix.cache_clear()
+
 def add_suffix(word, suffix):
     """Add a suffix to a word by applying the rules above
     
@@ -57,5 +262,30 @@ def add_suffix(word, suffix):
     
     """
     suffix, sep, rest = suffix.partition(' ')
-    expanded = _add_suffix(word, suffix)
+    expanded = _cached_add_suffix(word, suffix, system.NAME)
     return expanded + sep + rest
+
+def main():
+    import argparse
+    from plover.config import DEFAULT_SYSTEM_NAME
+    from plover.registry import registry
+    parser = argparse.ArgumentParser(description='Build the suffix table '
+                                     'for a system orthography wordlist.')
+    parser.add_argument('-s', '--system', default=DEFAULT_SYSTEM_NAME,
+                        help='system name (default: %(default)s)')
+    parser.add_argument('-w', '--words', type=int, default=SUFFIX_TABLE_WORDS,
+                        help='number of words (default: %(default)s)')
+    args = parser.parse_args()
+    registry.update()
+    system.setup(args.system)
+    mod = registry.get_plugin('system', args.system).obj
+    wordlist_path = system._wordlist_path(mod.ORTHOGRAPHY_WORDLIST)
+    table = build_suffix_table(args.words)
+    path = suffix_table_path(mod.ORTHOGRAPHY_WORDLIST)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    save_suffix_table(table, path, wordlist_path,
+                      mod.ORTHOGRAPHY_RULES, mod.ORTHOGRAPHY_RULES_ALIASES)
+    print('saved %u words to %s' % (len(table), path))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Profiling of strokes processing.
+
+Two modes are supported:
+
+cprofile -- Deterministic profiling (with `cProfile`), saved in `pstats`
+            format (see `python -m pstats`).
+
+sample -- Statistical profiling: the engine thread stack is regularly
+          sampled while processing a stroke, and saved in "folded" format
+          (one line per unique stack, followed by its samples count), as
+          used by flamegraph tools (e.g. `flamegraph.pl` or speedscope).
+
+Only strokes processing is profiled, for a number of strokes (100 by
+default) and/or a number of seconds; profiles are saved in the
+`profiles` subdirectory of the configuration directory.
+
+Profiling can be toggled with the `PLOVER:PROFILE` command, with optional
+comma separated options, e.g. `{PLOVER:PROFILE:mode=sample,seconds=60}`,
+or started on startup with `plover --profile [OPTIONS]`.
+"""
+
+from collections import Counter
+from time import perf_counter
+import cProfile
+import os
+import sys
+import threading
+import time
+
+from plover import log
+from plover.oslayer.config import CONFIG_DIR
+
+
+PROFILES_DIR = os.path.join(CONFIG_DIR, 'profiles')
+
+MODES = ('cprofile', 'sample')
+
+# Default number of profiled strokes, when no limit is specified.
+DEFAULT_STROKES = 100
+
+# Sampling interval (in seconds) used by the `sample` mode.
+SAMPLING_INTERVAL = 0.001
+
+# Profiling options to use on startup (see `plover.main`).
+startup_options = None
+
+
+def parse_options(text):
+    '''Parse profiling options, e.g. `mode=sample,strokes=200,seconds=10`.'''
+    options = {}
+    for option in text.split(','):
+        option = option.strip()
+        if not option:
+            continue
+        name, sep, value = option.partition('=')
+        name, value = name.strip(), value.strip()
+        if not sep:
+            raise ValueError('invalid profiling option: %s' % option)
+        if name == 'mode':
+            if value not in MODES:
+                raise ValueError('invalid profiling mode: %s' % value)
+            options[name] = value
+        elif name == 'strokes':
+            options[name] = int(value)
+        elif name == 'seconds':
+            options[name] = float(value)
+        else:
+            raise ValueError('invalid profiling option: %s' % name)
+    return options
+
+
+class Profiler:
+    """Profile strokes processing, see module documentation."""
+
+    def __init__(self, mode='cprofile', strokes=None, seconds=None,
+                 directory=None):
+        if mode not in MODES:
+            raise ValueError('invalid profiling mode: %s' % mode)
+        if strokes is None and seconds is None:
+            strokes = DEFAULT_STROKES
+        self.mode = mode
+        self.strokes = strokes
+        self.seconds = seconds
+        self.directory = PROFILES_DIR if directory is None else directory
+        self.stroke_count = 0
+        self._start_time = perf_counter()
+        if mode == 'cprofile':
+            self._profile = cProfile.Profile()
+        else:
+            self._samples = Counter()
+            # Thread/code of the stroke being processed.
+            self._sampled = None
+            self._stopped = threading.Event()
+            self._sampler = threading.Thread(target=self._sample, name='profiler')
+            self._sampler.daemon = True
+            self._sampler.start()
+
+    @property
+    def done(self):
+        '''True once the strokes or time limit has been reached.'''
+        if self.strokes is not None and self.stroke_count >= self.strokes:
+            return True
+        if self.seconds is not None and \
+           perf_counter() - self._start_time >= self.seconds:
+            return True
+        return False
+
+    def profile_stroke(self, func, *args):
+        '''Call <func>(*<args>) while profiling it.'''
+        self.stroke_count += 1
+        if self.mode == 'cprofile':
+            return self._profile.runcall(func, *args)
+        code = getattr(func, '__func__', func).__code__
+        self._sampled = (threading.get_ident(), code)
+        try:
+            return func(*args)
+        finally:
+            self._sampled = None
+
+    def _sample(self):
+        current_frames = sys._current_frames
+        while not self._stopped.wait(SAMPLING_INTERVAL):
+            sampled = self._sampled
+            if sampled is None:
+                continue
+            thread_id, root_code = sampled
+            frame = current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('%s (%s:%u)' % (code.co_name,
+                                             os.path.basename(code.co_filename),
+                                             code.co_firstlineno))
+                if code is root_code:
+                    break
+                frame = frame.f_back
+            else:
+                # Not processing a stroke anymore.
+                continue
+            self._samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        '''Stop profiling, and save the profile: return its path.'''
+        if self.mode == 'cprofile':
+            extension = '.pstats'
+        else:
+            extension = '.folded'
+            self._stopped.set()
+            self._sampler.join()
+        os.makedirs(self.directory, exist_ok=True)
+        basename = os.path.join(self.directory,
+                                time.strftime('plover-%Y%m%d-%H%M%S'))
+        path = basename + extension
+        n = 1
+        while os.path.exists(path):
+            path = '%s-%u%s' % (basename, n, extension)
+            n += 1
+        if self.mode == 'cprofile':
+            self._profile.dump_stats(path)
+        else:
+            with open(path, 'w', encoding='utf-8') as fp:
+                for stack, count in sorted(self._samples.items()):
+                    fp.write('%s %u\n' % (stack, count))
+        log.info('%s profile of %u strokes saved to %s',
+                 self.mode, self.stroke_count, path)
+        return path
+
+
+def profile_command(engine, cmdline):
+    '''Toggle profiling of strokes processing.'''
+    if engine.is_profiling:
+        engine.stop_profiling()
+    else:
+        engine.start_profiling(**parse_options(cmdline))
@@ -1,19 +1,191 @@
+"""Plugins registry.
 
-from collections import namedtuple
+Plugins are discovered from their distributions entry points, but only
+loaded (imported) on first use (except for the plugins used by the
+engine while processing strokes, see `Registry.EAGER_PLUGIN_TYPES`).
+Since scanning all the installed distributions is costly, the discovered
+entry points are cached (in the configuration directory), until the
+installed distributions change.
+"""
 
-import pkg_resources
+from collections import namedtuple
+import importlib
+import marshal
+import os
+import re
+import sys
 
-from plover.oslayer.config import HAS_GUI_QT, PLUGINS_PLATFORM
+from plover.oslayer.config import CONFIG_DIR, HAS_GUI_QT, PLUGINS_PLATFORM
 from plover import log
 
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:
+    # Python < 3.8.
+    try:
+        import importlib_metadata
+    except ImportError:
+        importlib_metadata = None
+
+
+# Version of the entry points cache format.
+ENTRY_POINTS_CACHE_VERSION = 1
+
+ENTRY_POINT_RX = re.compile(r'^(?P<module>[\w.]+)\s*'
+                            r'(?::\s*(?P<attrs>[\w.]+))?\s*'
+                            r'(?:\[(?P<extras>[^\]]*)\])?\s*$')
+
+
+class Distribution(namedtuple('Distribution', 'project_name version location')):
+
+    def __str__(self):
+        return '%s %s' % (self.project_name, self.version)
+
+
+class EntryPoint(namedtuple('EntryPoint', 'name value dist')):
+
+    @property
+    def _match(self):
+        m = ENTRY_POINT_RX.match(self.value)
+        if m is None:
+            raise ValueError('invalid entry point: %s = %s' % (self.name, self.value))
+        return m
+
+    @property
+    def module_name(self):
+        return self._match.group('module')
+
+    @property
+    def attrs(self):
+        attrs = self._match.group('attrs')
+        return () if attrs is None else tuple(attrs.split('.'))
+
+    @property
+    def extras(self):
+        extras = self._match.group('extras')
+        if extras is None:
+            return ()
+        return tuple(e.strip() for e in extras.split(',') if e.strip())
+
+    def load(self):
+        obj = importlib.import_module(self.module_name)
+        for attr in self.attrs:
+            obj = getattr(obj, attr)
+        return obj
+
+
+def _entry_points_cache_path():
+    return os.path.join(CONFIG_DIR, 'entry_points.cache')
+
+def _distributions_key():
+    '''Return a key identifying the installed distributions (and their entry points).'''
+    key = [ENTRY_POINTS_CACHE_VERSION, sys.version, bool(importlib_metadata)]
+    for path in sys.path:
+        try:
+            names = sorted(os.listdir(path or '.'))
+        except OSError:
+            continue
+        for name in names:
+            if name.endswith('.egg'):
+                entry_points = os.path.join(path, name, 'EGG-INFO', 'entry_points.txt')
+            elif name.endswith(('.dist-info', '.egg-info')):
+                entry_points = os.path.join(path, name, 'entry_points.txt')
+            else:
+                continue
+            try:
+                stat = os.stat(entry_points)
+            except OSError:
+                stat = None
+            else:
+                stat = (stat.st_size, stat.st_mtime_ns)
+            key.append((path, name, stat))
+    return tuple(key)
+
+def _scan_entry_points():
+    '''Return Plover's entry points: [(group, name, value, dist), ...].'''
+    entry_points = []
+    if importlib_metadata is None:
+        import pkg_resources
+        for dist in pkg_resources.working_set:
+            distribution = (dist.project_name, dist.version, dist.location)
+            for group, group_entry_points in sorted(dist.get_entry_map().items()):
+                if not group.startswith('plover.'):
+                    continue
+                for ep in group_entry_points.values():
+                    value = ep.module_name
+                    if ep.attrs:
+                        value += ':' + '.'.join(ep.attrs)
+                    if ep.extras:
+                        value += ' [%s]' % ','.join(ep.extras)
+                    entry_points.append((group, ep.name, value, distribution))
+        return entry_points
+    seen = set()
+    for dist in importlib_metadata.distributions():
+        # Avoid parsing the metadata of distributions without plugins.
+        text = dist.read_text('entry_points.txt')
+        if not text or '[plover.' not in text:
+            continue
+        name = dist.metadata['Name']
+        # Like with `sys.path`, the first distribution shadows the others.
+        if name.lower() in seen:
+            continue
+        seen.add(name.lower())
+        distribution = (name, dist.version, os.path.abspath(str(dist.locate_file(''))))
+        for ep in dist.entry_points:
+            if ep.group.startswith('plover.'):
+                entry_points.append((ep.group, ep.name, ep.value, distribution))
+    return entry_points
+
+def _entry_points_index():
+    '''Return Plover's entry points, by group: {group: [EntryPoint, ...]}.'''
+    key = _distributions_key()
+    cache_path = _entry_points_cache_path()
+    entry_points = None
+    try:
+        with open(cache_path, 'rb') as fp:
+            cache_key, cached_entry_points = marshal.loads(fp.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    else:
+        if cache_key == key:
+            entry_points = cached_entry_points
+    if entry_points is None:
+        entry_points = _scan_entry_points()
+        if os.path.isdir(os.path.dirname(cache_path)):
+            try:
+                with open(cache_path, 'wb') as fp:
+                    marshal.dump((key, entry_points), fp)
+            except OSError as e:
+                log.warning('could not save entry points cache: %s', e)
+    index = {}
+    for group, name, value, distribution in entry_points:
+        entry_point = EntryPoint(name, value, Distribution(*distribution))
+        index.setdefault(group, []).append(entry_point)
+    return index
+
 
 class Plugin:
 
-    def __init__(self, plugin_type, name, obj):
+    def __init__(self, plugin_type, name, obj=None, entrypoint=None):
+        assert (obj is None) != (entrypoint is None)
         self.plugin_type = plugin_type
         self.name = name
-        self.obj = obj
-        self.__doc__ = obj.__doc__ or ''
+        self.entrypoint = entrypoint
+        self._obj = obj
+
+    @property
+    def is_loaded(self):
+        return self._obj is not None
+
+    @property
+    def obj(self):
+        if self._obj is None:
+            self._obj = self.entrypoint.load()
+        return self._obj
+
+    @property
+    def __doc__(self):
+        return self.obj.__doc__ or ''
 
     def __str__(self):
         return '%s:%s' % (self.plugin_type, self.name)
@@ -31,12 +203,21 @@ class Registry:
         'gui',
         'gui.qt.machine_option',
         'gui.qt.tool',
+        'lookup_strategy',
         'machine',
         'macro',
         'meta',
         'system',
     )
 
+    # Plugins used by the engine while processing strokes:
+    # loaded on update, so errors are reported on startup.
+    EAGER_PLUGIN_TYPES = (
+        'command',
+        'macro',
+        'meta',
+    )
+
     def __init__(self, suppress_errors=True):
         self._plugins = {}
         self._distributions = {}
@@ -52,47 +233,69 @@ class Registry:
     def register_plugin_from_entrypoint(self, plugin_type, entrypoint):
         log.info('%s: %s (from %s in %s)', plugin_type, entrypoint.name,
                  entrypoint.dist, entrypoint.dist.location)
+        # Note: the plugin is only loaded on first use.
+        plugin = Plugin(plugin_type, entrypoint.name, entrypoint=entrypoint)
+        self._plugins[plugin_type][entrypoint.name.lower()] = plugin
+        # Keep track of distributions providing plugins.
+        dist_id = str(entrypoint.dist)
+        dist = self._distributions.get(dist_id)
+        if dist is None:
+            dist = PluginDistribution(entrypoint.dist, set())
+            self._distributions[dist_id] = dist
+        dist.plugins.add(plugin)
+        return plugin
+
+    def _load_plugin(self, plugin):
+        '''Load <plugin>, return False (and unregister it) on error.'''
+        if plugin.is_loaded:
+            return True
         try:
-            obj = entrypoint.load()
+            plugin.obj
         except:
-            log.error('error loading %s plugin: %s (from %s)', plugin_type,
+            entrypoint = plugin.entrypoint
+            log.error('error loading %s plugin: %s (from %s)', plugin.plugin_type,
                       entrypoint.name, entrypoint.module_name, exc_info=True)
+            plugins = self._plugins[plugin.plugin_type]
+            if plugins.get(plugin.name.lower()) is plugin:
+                del plugins[plugin.name.lower()]
+            dist = self._distributions.get(str(entrypoint.dist))
+            if dist is not None:
+                dist.plugins.discard(plugin)
             if not self._suppress_errors:
                 raise
-        else:
-            plugin = self.register_plugin(plugin_type, entrypoint.name, obj)
-            # Keep track of distributions providing plugins.
-            dist_id = str(entrypoint.dist)
-            dist = self._distributions.get(dist_id)
-            if dist is None:
-                dist = PluginDistribution(entrypoint.dist, set())
-                self._distributions[dist_id] = dist
-            dist.plugins.add(plugin)
+            return False
+        return True
 
     def get_plugin(self, plugin_type, plugin_name):
-        return self._plugins[plugin_type][plugin_name.lower()]
+        plugin = self._plugins[plugin_type][plugin_name.lower()]
+        if not self._load_plugin(plugin):
+            raise KeyError(plugin_name)
+        return plugin
 
     def list_plugins(self, plugin_type):
-        return sorted(self._plugins[plugin_type].values(),
+        return sorted((plugin for plugin in list(self._plugins[plugin_type].values())
+                       if self._load_plugin(plugin)),
                       key=lambda p: p.name)
 
     def list_distributions(self):
         return [dist for dist_id, dist in sorted(self._distributions.items())]
 
     def update(self):
+        index = _entry_points_index()
         for plugin_type in self.PLUGIN_TYPES:
             if plugin_type.startswith('gui.qt.') and not HAS_GUI_QT:
                 continue
             entrypoint_type = 'plover.%s' % plugin_type
-            for entrypoint in pkg_resources.iter_entry_points(entrypoint_type):
+            for entrypoint in index.get(entrypoint_type, ()):
                 if 'gui_qt' in entrypoint.extras and not HAS_GUI_QT:
                     continue
                 self.register_plugin_from_entrypoint(plugin_type, entrypoint)
             if PLUGINS_PLATFORM is not None:
                 entrypoint_type = 'plover.%s.%s' % (PLUGINS_PLATFORM, plugin_type)
-                for entrypoint in pkg_resources.iter_entry_points(entrypoint_type):
+                for entrypoint in index.get(entrypoint_type, ()):
                     self.register_plugin_from_entrypoint(plugin_type, entrypoint)
+        for plugin_type in self.EAGER_PLUGIN_TYPES:
+            self.list_plugins(plugin_type)
 
 
 registry = Registry()
-
@@ -5,13 +5,27 @@
     A steno dictionary maps sequences of steno strokes to translations. """
 
 import collections
+import functools
 import os
 import shutil
+import threading
 
 from plover.dictionary.base import ReverseStenoDict
 from plover.resource import ASSET_SCHEME, resource_filename, resource_timestamp
 
 
+# Serialize dictionaries changes with the lookups done from
+# other threads (see `StenoDictionaryCollectionSnapshot`).
+_dictionaries_lock = threading.RLock()
+
+def _with_dictionaries_lock(func):
+    @functools.wraps(func)
+    def _with_lock(*args, **kwargs):
+        with _dictionaries_lock:
+            return func(*args, **kwargs)
+    return _with_lock
+
+
 class StenoDictionary(dict):
     """ A steno dictionary.
 
@@ -94,11 +108,13 @@ class StenoDictionary(dict):
     def _save(self, filename):
         raise NotImplementedError()
 
+    @_with_dictionaries_lock
     def clear(self):
         """ Empty the dictionary without altering its file-based attributes. """
         super().clear()
         self.reverse.clear()
 
+    @_with_dictionaries_lock
     def __setitem__(self, key, value):
         assert not self.readonly
         # Be careful here. If the key already exists, we have to remove its old mapping from the reverse dictionary
@@ -108,11 +124,13 @@ class StenoDictionary(dict):
         super().__setitem__(key, value)
         self.reverse.append_key(value, key)
 
+    @_with_dictionaries_lock
     def __delitem__(self, key):
         assert not self.readonly
         value = super().pop(key)
         self.reverse.remove_key(value, key)
 
+    @_with_dictionaries_lock
     def update(self, *args, **kwargs):
         """ Update the dictionary using a single iterable sequence of (key, value) tuples or a single mapping
             located in args. kwargs is irrelevant since only strings can be keywords, but is included for
@@ -132,7 +150,7 @@ class StenoDictionary(dict):
         Return a list of keys that can exactly produce the given value.
         If there aren't any keys that produce this value, just return an empty list.
         """
-        return self.reverse[value] if value in self.reverse else []
+        return list(self.reverse[value]) if value in self.reverse else []
 
     def casereverse_lookup(self, value):
         """ Return a list of translations case-insensitive equal to the given value. For backwards compatibility. """
@@ -148,10 +166,20 @@ class StenoDictionaryCollection:
     def __init__(self, dicts=[]):
         self.dicts = []
         self.filters = []
+        self.version = 0
+        self.snapshot = None
         self.set_dicts(dicts)
 
+    def _publish(self):
+        """ Publish a new snapshot of the collection. Must be called after each change. """
+        self.version += 1
+        # Note: assigning the attribute is atomic,
+        # so readers always get a consistent snapshot.
+        self.snapshot = StenoDictionaryCollectionSnapshot(self.dicts, self.filters, self.version)
+
     def set_dicts(self, dicts):
         self.dicts = dicts[:]
+        self._publish()
 
     def lookup(self, key):
         """ Perform a lookup on each enabled dictionary in priority order.
@@ -259,6 +287,7 @@ class StenoDictionaryCollection:
         else:
             d = self[path]
         d[key] = value
+        self._publish()
 
     def save(self, path_list=None):
         '''Save the dictionaries in <path_list>.
@@ -288,6 +317,40 @@ class StenoDictionaryCollection:
 
     def add_filter(self, f):
         self.filters.append(f)
+        self._publish()
 
     def remove_filter(self, f):
         self.filters.remove(f)
+        self._publish()
+
+class StenoDictionaryCollectionSnapshot(StenoDictionaryCollection):
+    """ Immutable snapshot of a StenoDictionaryCollection.
+
+    Freeze the list of dictionaries and filters of the collection at a given version,
+    so lookups and searches can be done from other threads without taking the engine
+    lock. Note that the dictionaries themselves are shared (and can still be changed):
+    lookups are serialized with changes to the dictionaries by a separate lock, only
+    held during the lookup or change.
+    """
+
+    def __init__(self, dicts, filters, version):
+        self.dicts = tuple(dicts)
+        self.filters = tuple(filters)
+        self.version = version
+
+    @property
+    def snapshot(self):
+        return self
+
+    lookup = _with_dictionaries_lock(StenoDictionaryCollection.lookup)
+    raw_lookup = _with_dictionaries_lock(StenoDictionaryCollection.raw_lookup)
+    reverse_lookup = _with_dictionaries_lock(StenoDictionaryCollection.reverse_lookup)
+    casereverse_lookup = _with_dictionaries_lock(StenoDictionaryCollection.casereverse_lookup)
+    find_similar = _with_dictionaries_lock(StenoDictionaryCollection.find_similar)
+    find_partial = _with_dictionaries_lock(StenoDictionaryCollection.find_partial)
+    find_regex = _with_dictionaries_lock(StenoDictionaryCollection.find_regex)
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('%s is immutable' % self.__class__.__name__)
+
+    set_dicts = set = add_filter = remove_filter = _immutable
@@ -1,26 +1,117 @@
+from collections.abc import Mapping
 import collections
 from io import open
+import marshal
 import os
 import re
+import sys
+import types
 
+from plover import log
 from plover.oslayer.config import CONFIG_DIR, ASSETS_DIR
 from plover.registry import registry
 
 
-def _load_wordlist(filename):
-    if filename is None:
-        return {}
+# Version of the wordlist cache format.
+WORDLIST_CACHE_VERSION = 1
+
+
+def _wordlist_path(filename):
     path = None
     for dir in (CONFIG_DIR, ASSETS_DIR):
         path = os.path.realpath(os.path.join(dir, filename))
         if os.path.exists(path):
             break
-    words = {}
+    return path
+
+def _wordlist_cache_path(filename):
+    return os.path.join(CONFIG_DIR, filename + '.cache')
+
+def _read_wordlist(path):
     with open(path, encoding='utf-8') as f:
         pairs = [word.strip().rsplit(' ', 1) for word in f]
         pairs.sort(reverse=True, key=lambda x: int(x[1]))
-        words = {p[0]: int(p[1]) for p in pairs}
-    return words
+        return {p[0]: int(p[1]) for p in pairs}
+
+class Wordlist(Mapping):
+    """Orthography wordlist: map each word to its rank.
+
+    The wordlist is only loaded on first use, from a cache of the parsed
+    wordlist if it is up to date (same wordlist path, size and mtime).
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._words = None
+
+    @property
+    def words(self):
+        if self._words is None:
+            self._words = self._load()
+        return self._words
+
+    def _load(self):
+        path = _wordlist_path(self.filename)
+        stat = os.stat(path)
+        key = (WORDLIST_CACHE_VERSION, path, stat.st_size, stat.st_mtime_ns)
+        cache_path = _wordlist_cache_path(self.filename)
+        try:
+            with open(cache_path, 'rb') as fp:
+                cache_key, words = marshal.loads(fp.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        else:
+            if cache_key == key and isinstance(words, dict):
+                return words
+        # Missing, outdated, or corrupted cache: rebuild it.
+        words = _read_wordlist(path)
+        if os.path.isdir(os.path.dirname(cache_path)):
+            try:
+                with open(cache_path, 'wb') as fp:
+                    marshal.dump((key, words), fp)
+            except OSError as e:
+                log.warning('could not save wordlist cache: %s', e)
+        return words
+
+    def __getitem__(self, word):
+        return self.words[word]
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def get(self, word, default=None):
+        return self.words.get(word, default)
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __len__(self):
+        return len(self.words)
+
+def _load_wordlist(filename):
+    if filename is None:
+        return {}
+    return Wordlist(filename)
+
+def _check_wordlist(filename):
+    """Check the wordlist exists and is readable.
+
+    Since the wordlist is only loaded on first use, this ensures a
+    missing wordlist is reported on setup, not on the first lookup.
+    """
+    if filename is not None:
+        open(_wordlist_path(filename), 'rb').close()
+
+def _load_suffix_table(mod):
+    # Note: imported here to avoid a circular import.
+    from plover.orthography import load_suffix_table, suffix_table_path
+    filename = mod.ORTHOGRAPHY_WORDLIST
+    if filename is None:
+        return None
+    return load_suffix_table(suffix_table_path(filename),
+                             _wordlist_path(filename),
+                             mod.ORTHOGRAPHY_RULES,
+                             mod.ORTHOGRAPHY_RULES_ALIASES)
 
 def _key_order(keys, numbers):
     key_order = collections.defaultdict(lambda: -1)
@@ -46,17 +137,59 @@ _EXPORTS = {
     'ORTHOGRAPHY_RULES'        : lambda mod: [(re.compile(pattern, re.I), replacement)
                                               for pattern, replacement in mod.ORTHOGRAPHY_RULES],
     'ORTHOGRAPHY_RULES_ALIASES': lambda mod: dict(mod.ORTHOGRAPHY_RULES_ALIASES),
+    'ORTHOGRAPHY_SUFFIXES'     : lambda mod: tuple(getattr(mod, 'ORTHOGRAPHY_SUFFIXES', ())),
+    'ORTHOGRAPHY_SUFFIX_TABLE' : _load_suffix_table,
     'KEYMAPS'                  : lambda mod: mod.KEYMAPS,
     'DICTIONARIES_ROOT'        : lambda mod: mod.DICTIONARIES_ROOT,
     'DEFAULT_DICTIONARIES'     : lambda mod: mod.DEFAULT_DICTIONARIES,
 }
 
+_MISSING = object()
+
+class _SystemData:
+    """Exports of a system, computed on first access."""
+
+    def __init__(self, mod):
+        self.mod = mod
+        self.symbols = {}
+
+    def get(self, symbol):
+        value = self.symbols.get(symbol, _MISSING)
+        if value is _MISSING:
+            value = self.symbols[symbol] = _EXPORTS[symbol](self.mod)
+        return value
+
+# Data of each system already setup, by name.
+_systems = {}
+_current = None
+
 def setup(system_name):
-    system_symbols = {}
+    global _current
+    # Note: imported here to avoid a circular import.
+    from plover import orthography
     mod = registry.get_plugin('system', system_name).obj
-    for symbol, init in _EXPORTS.items():
-        system_symbols[symbol] = init(mod)
-    system_symbols['NAME'] = system_name
-    globals().update(system_symbols)
+    _check_wordlist(mod.ORTHOGRAPHY_WORDLIST)
+    data = _systems.get(system_name)
+    if data is None or data.mod is not mod:
+        data = _systems[system_name] = _SystemData(mod)
+    _current = data
+    # Exports are lazily set by `_SystemModule.__getattr__`.
+    module_globals = globals()
+    for symbol in _EXPORTS:
+        module_globals.pop(symbol, None)
+    module_globals['NAME'] = system_name
+    orthography.clear_caches()
+
+class _SystemModule(types.ModuleType):
+
+    # Note: only called when the attribute is not already set.
+    def __getattr__(self, name):
+        if name in _EXPORTS and _current is not None:
+            value = _current.get(name)
+            setattr(self, name, value)
+            return value
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+sys.modules[__name__].__class__ = _SystemModule
 
 NAME = None
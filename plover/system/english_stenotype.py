@@ -77,6 +77,13 @@ ORTHOGRAPHY_RULES_ALIASES = {
 
 ORTHOGRAPHY_WORDLIST = 'american_english_words.txt'
 
+# Suffixes to precompute the forms of (for the most common words
+# of the wordlist), see `plover.orthography.build_suffix_table`.
+ORTHOGRAPHY_SUFFIXES = (
+    's', 'es', 'ed', 'ing', 'er', 'est', 'ly', 'y', 'able', 'ful',
+    'ment', 'ness', 'ist', 'ism', 'ity', 'ize', 'less',
+)
+
 KEYMAPS = {
     'Gemini PR': {
         '#'         : ('#1', '#2', '#3', '#4', '#5', '#6', '#7', '#8', '#9', '#A', '#B', '#C'),
@@ -235,6 +242,8 @@ KEYMAPS = {
         '-Z'   : '-Z',
         'no-op': ('X1-', 'X2-', 'X3'),
     },
+    # Strokes replay: steno keys are used as is.
+    'Replay': {key: key for key in KEYS},
 }
 
 DICTIONARIES_ROOT = 'asset:plover:assets'
@@ -16,13 +16,18 @@ emits one or more Translation objects based on a greedy conversion algorithm.
 
 """
 
-from collections import namedtuple
+from collections import deque, namedtuple
+from collections.abc import MutableSequence, Sequence
+from itertools import islice
 import re
+import time
+import weakref
 
 from plover.steno import Stroke
+from plover.config import DEFAULT_LOOKUP_STRATEGY
 from plover.steno_dictionary import StenoDictionaryCollection
 from plover.registry import registry
-from plover import system
+from plover import latency, system
 
 # The maximum acceptable number of strokes (i.e. the key) for a dictionary entry. 10 is more than reasonable.
 KEY_STROKE_LIMIT = 10
@@ -63,6 +68,9 @@ _LEGACY_MACROS_ALIASES = {
 
 Macro = namedtuple('Macro', 'name stroke cmdline')
 
+# Strokes of a translation replacing previous translations, see `Translation`.
+_ReplacedStrokes = namedtuple('_ReplacedStrokes', 'replaced stroke length')
+
 def _mapping_to_macro(mapping, stroke):
     '''Return a macro/stroke if mapping is one, or None otherwise.'''
     macro, cmdline = None, ''
@@ -80,20 +88,22 @@ def _mapping_to_macro(mapping, stroke):
     return Macro(macro, stroke, cmdline) if macro else None
 
 
-class Translation(list):
+class Translation:
     """A data model for the mapping between a sequence of Strokes and a string.
 
     This class represents the mapping between a sequence of Stroke objects and
     a text string, typically a word or phrase. This class is used as the output
-    from translation and the input to formatting. Internally it is subclassed
-    from list for quick len() access. It contains the following attributes:
+    from translation and the input to formatting. It contains the following
+    attributes:
 
     strokes -- A list of Stroke objects from which the translation is
-    derived. In this implementation, it refers to the object itself, which
-    means equality is implicitly defined as being equal sequences of strokes.
+    derived. Equality is defined as being equal sequences of strokes. When
+    the translation replaces previous translations, the list is only built
+    on first access: until then, the strokes of the replaced translations
+    are shared.
 
     rtfcre -- A tuple of RTFCRE strings representing the stroke list. This is
-    used as the key in the translation mapping.
+    used as the key in the translation mapping. Lazily built.
 
     english -- The value of the dictionary mapping given the rtfcre
     key, or None if no mapping exists.
@@ -106,6 +116,12 @@ class Translation(list):
 
     """
 
+    __slots__ = (
+        '_strokes', '_rtfcre', '_key',
+        'english', 'replaced', 'formatting',
+        'is_retrospective_command',
+    )
+
     def __init__(self, outline, translation):
         """Create a translation by looking up strokes in a dictionary.
 
@@ -116,14 +132,99 @@ class Translation(list):
         translation -- A translation for the outline or None.
 
         """
-        super().__init__(outline)
-        self.strokes = self
-        self.rtfcre = tuple(s.rtfcre for s in outline)
+        self._strokes = list(outline)
+        self._rtfcre = None
+        self._key = None
         self.english = translation
         self.replaced = []
         self.formatting = []
         self.is_retrospective_command = False
 
+    @classmethod
+    def _from_replaced(cls, replaced, stroke, translation, key=None):
+        """Create a translation for <stroke> replacing <replaced>.
+
+        The strokes of the replaced translations are not copied. If
+        known, <key> is the corresponding dictionary key.
+        """
+        t = cls.__new__(cls)
+        t._strokes = _ReplacedStrokes(replaced, stroke,
+                                      sum(len(r) for r in replaced) + 1)
+        t._rtfcre = None
+        t._key = key
+        t.english = translation
+        t.replaced = replaced
+        t.formatting = []
+        t.is_retrospective_command = False
+        return t
+
+    # Note: `_strokes` is either the list of strokes, or the (not yet
+    # built) replaced strokes. It is only read and assigned once by each
+    # accessor, so a translation can safely be used from another thread
+    # (e.g. by the journal writer).
+
+    @property
+    def strokes(self):
+        strokes = self._strokes
+        if isinstance(strokes, _ReplacedStrokes):
+            replaced, stroke, length = strokes
+            strokes = [s for r in replaced for s in r.strokes]
+            strokes.append(stroke)
+            self._strokes = strokes
+        return strokes
+
+    @strokes.setter
+    def strokes(self, strokes):
+        self._strokes = strokes
+
+    @property
+    def rtfcre(self):
+        rtfcre = self._rtfcre
+        if rtfcre is None:
+            strokes = self._strokes
+            if isinstance(strokes, _ReplacedStrokes):
+                replaced, stroke, length = strokes
+                rtfcre = tuple(s for r in replaced for s in r.rtfcre)
+                rtfcre += (stroke.rtfcre,)
+            else:
+                rtfcre = tuple(s.rtfcre for s in strokes)
+            self._rtfcre = rtfcre
+        return rtfcre
+
+    @rtfcre.setter
+    def rtfcre(self, rtfcre):
+        self._rtfcre = rtfcre
+        self._key = None
+
+    def __len__(self):
+        strokes = self._strokes
+        if isinstance(strokes, _ReplacedStrokes):
+            return strokes.length
+        return len(strokes)
+
+    def __iter__(self):
+        return iter(self.strokes)
+
+    def __getitem__(self, index):
+        return self.strokes[index]
+
+    def __eq__(self, other):
+        if other is self:
+            return True
+        if isinstance(other, Translation):
+            other = other.strokes
+        elif not isinstance(other, list):
+            return NotImplemented
+        return self.strokes == other
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
+
     def __str__(self):
         if self.english is None:
             translation = 'None'
@@ -151,6 +252,33 @@ class Translation(list):
         return False
 
 
+class LookupStats:
+    """Instrumentation counters for a lookup strategy.
+
+    strokes -- Number of strokes looked up.
+
+    lookups -- Number of dictionary lookups done for those strokes.
+
+    time -- Total time spent (in seconds).
+
+    """
+
+    __slots__ = ('strokes', 'lookups', 'time')
+
+    def __init__(self):
+        self.strokes = 0
+        self.lookups = 0
+        self.time = 0.0
+
+    def __str__(self):
+        strokes = max(self.strokes, 1)
+        return '%u strokes, %.1f lookups/stroke, %.1fus/stroke' % (
+            self.strokes, self.lookups / strokes, self.time / strokes * 1e6)
+
+    def __repr__(self):
+        return str(self)
+
+
 class Translator:
     """Converts a stenotype key stream to a translation stream.
 
@@ -177,6 +305,11 @@ class Translator:
     Translator will first issue a correction for the initial 'cat' Translation
     and then issue a new Translation for 'catalogue'.
 
+    The greedy conversion is only the default lookup strategy: alternative
+    strategies can be provided by `lookup_strategy` plugins, see
+    set_lookup_strategy. The cost of each strategy is tracked (see
+    get_lookup_stats).
+
     A Translator takes input via the translate method and provides translation
     output to every function that has registered via the add_callback method.
 
@@ -190,11 +323,18 @@ class Translator:
         self._state = _State()
         self._to_undo = []
         self._to_do = 0
+        # Default to the builtin greedy strategy.
+        self._lookup_strategy_name = DEFAULT_LOOKUP_STRATEGY
+        self._lookup_strategy = None
+        self._lookup_stats = {DEFAULT_LOOKUP_STRATEGY: LookupStats()}
+        self._current_lookup_stats = self._lookup_stats[DEFAULT_LOOKUP_STRATEGY]
 
     def translate(self, stroke):
         """Process a single stroke."""
+        start = time.perf_counter()
         self.translate_stroke(stroke)
         self.flush()
+        latency.record_since('translate', start)
 
     def set_dictionary(self, d):
         """Set the dictionary."""
@@ -203,6 +343,31 @@ class Translator:
     def get_dictionary(self):
         return self._dictionary
 
+    def set_lookup_strategy(self, name):
+        """Set the lookup strategy, by `lookup_strategy` plugin name.
+
+        A lookup strategy is a function taking the translator and
+        a new stroke, and returning the corresponding translation.
+        """
+        if name == self._lookup_strategy_name:
+            return
+        self._lookup_strategy = registry.get_plugin('lookup_strategy', name).obj
+        self._lookup_strategy_name = name
+        stats = self._lookup_stats.get(name)
+        if stats is None:
+            stats = self._lookup_stats[name] = LookupStats()
+        self._current_lookup_stats = stats
+
+    def get_lookup_strategy(self):
+        return self._lookup_strategy_name
+
+    def get_lookup_stats(self):
+        """Get the cost of each lookup strategy used so far.
+
+        Return a dictionary mapping each strategy name to its `LookupStats`.
+        """
+        return dict(self._lookup_stats)
+
     def add_listener(self, callback):
         """Add a listener for translation outputs.
 
@@ -251,6 +416,9 @@ class Translator:
         self._to_do = 0
         if undo or do:
             self._output(undo, do, prev)
+        # Release the view on the history before resizing
+        # it, so its translations don't need to be copied.
+        del prev
         self._resize_translations()
 
     def _output(self, undo, do, prev):
@@ -292,8 +460,19 @@ class Translator:
         if macro is not None:
             self.translate_macro(macro)
             return
-        t = self._find_translation(stroke, suffixes=system.SUFFIX_KEYS, prefixes=system.PREFIX_KEYS)
-        self.translate_translation(t)
+        stats = self._current_lookup_stats
+        start = time.perf_counter()
+        if self._lookup_strategy is None:
+            t = self._find_translation(stroke, suffixes=system.SUFFIX_KEYS, prefixes=system.PREFIX_KEYS)
+        else:
+            t = self._lookup_strategy(self, stroke)
+        stats.time += time.perf_counter() - start
+        stats.strokes += 1
+        if isinstance(t, Translation):
+            self.translate_translation(t)
+        else:
+            for t in t:
+                self.translate_translation(t)
 
     def translate_macro(self, macro):
         macro_fn = registry.get_plugin('macro', macro.name).obj
@@ -319,23 +498,44 @@ class Translator:
         self._state.translations.extend(translations)
         self._to_do += len(translations)
 
-    def _find_translation(self, stroke, normal=True, suffixes=(), prefixes=()):
-        # Figure out how much of the translation buffer can be involved in this stroke and
-        # build the stroke list for translation.
+    def _get_window(self):
+        """Return the last translations that can be involved with a new stroke."""
         num_strokes = 1
-        translation_count = 0
+        translations = []
         for t in reversed(self._state.translations):
             num_strokes += len(t)
             if num_strokes > self._stroke_limit:
                 break
-            translation_count += 1
-        translation_index = len(self._state.translations) - translation_count
-        translations = self._state.translations[translation_index:]
-        # Dictionary keys are in RTFCRE form, so get a list of all these values ahead of time.
-        rtfcre_list = [s for t in translations for s in t.rtfcre]
-        rtfcre_list.append(stroke.rtfcre)
-        lookup = self._dictionary.lookup
-        stroke_join = "/".join
+            translations.append(t)
+        translations.reverse()
+        return translations
+
+    def _lookup(self, key):
+        """Dictionary lookup, accounted in the current lookup strategy stats."""
+        self._current_lookup_stats.lookups += 1
+        return self._dictionary.lookup(key)
+
+    def _find_translation(self, stroke, normal=True, suffixes=(), prefixes=()):
+        # Figure out how much of the translation buffer can be involved in this stroke and
+        # build the stroke list for translation.
+        translations = self._get_window()
+        translation_count = len(translations)
+        # Dictionary keys are in RTFCRE form. Build the key of each possible
+        # window (from the right, so each translation is only joined once:
+        # its own key is also cached across strokes), both without (heads)
+        # and with (keys) the new stroke.
+        heads = [None] * (translation_count + 1)
+        keys = [stroke.rtfcre] * (translation_count + 1)
+        head = None
+        for i in range(translation_count - 1, -1, -1):
+            t = translations[i]
+            key = t._key
+            if key is None:
+                key = t._key = '/'.join(t.rtfcre)
+            head = key if head is None else key + '/' + head
+            heads[i] = head
+            keys[i] = head + '/' + stroke.rtfcre
+        lookup = self._lookup
         # Look for translations in this order: with no modifications; with folded suffixes; with folded prefixes.
         for mode in filter(None, (normal, suffixes, prefixes)):
             if mode is suffixes:
@@ -346,12 +546,13 @@ class Translator:
                     continue
             # The new stroke can either create a new translation or replace existing translations
             # by matching a longer entry in the dictionary. Start with the longest possibility,
-            # removing strokes from the left until we find a match or run out of strokes.
-            test_seq = rtfcre_list[:]
+            # removing translations from the left until we find a match or run out of strokes.
             for i in range(translation_count+1):
                 if mode is normal:
-                    mapping = lookup(stroke_join(test_seq))
+                    mapping = lookup(keys[i])
                 elif mode is suffixes:
+                    head = heads[i]
+                    test_seq = [stroke.rtfcre] if head is None else [head, stroke.rtfcre]
                     mapping = self._lookup_affixes(test_seq, last_stroke_mods)
                 else:
                     # Finding folded prefixes requires modifications to the first stroke, but
@@ -359,16 +560,15 @@ class Translator:
                     test_stroke = translations[i].strokes[0] if i < translation_count else stroke
                     first_stroke_mods = self._test_and_remove_each(test_stroke, prefixes)
                     if first_stroke_mods:
+                        first = test_stroke.rtfcre
+                        rest = keys[i][len(first)+1:]
+                        test_seq = [first, rest] if rest else [first]
                         mapping = self._lookup_affixes(test_seq, first_stroke_mods, prefix=True)
                     else:
                         mapping = None
                 if mapping is not None:
-                    replaced = translations[i:]
-                    t = Translation([s for t in replaced for s in t.strokes]+[stroke], mapping)
-                    t.replaced = replaced
-                    return t
-                if i < translation_count:
-                    del test_seq[:len(translations[i])]
+                    return Translation._from_replaced(translations[i:], stroke,
+                                                      mapping, keys[i])
         # If there are no possible translations in the dictionary, just return the new stroke with no mapping.
         # The formatter will choose how to handle it (i.e. print the raw steno characters).
         return Translation([stroke], None)
@@ -396,7 +596,7 @@ class Translator:
         # Test variations of the last stroke for suffixes, or the first for prefixes.
         test_index = 0 if prefix else -1
         test_seq = rtfcre_seq[:]
-        lookup = self._dictionary.lookup
+        lookup = self._lookup
         for key, removed in test_pairs:
             # Removing the key from the test stroke must produce a valid dictionary entry.
             test_seq[test_index] = removed
@@ -431,6 +631,205 @@ class Translator:
         return test_pairs
 
 
+class _TranslationHistory(MutableSequence):
+    """The list of translations stored in a translator state.
+
+    Backed by a deque, so old translations can be dropped in constant
+    time, and keeping track of the total number of strokes so trimming
+    the history does not need to walk it. The list API is supported
+    for compatibility with existing code (slices return new lists).
+
+    """
+
+    def __init__(self, translations=()):
+        self._translations = deque()
+        self.stroke_count = 0
+        # Weak references to the views (see `view`) still in use.
+        self._views = []
+        self.extend(translations)
+
+    def __len__(self):
+        return len(self._translations)
+
+    def __iter__(self):
+        return iter(self._translations)
+
+    def __reversed__(self):
+        # Like for a list, removing the last translations
+        # while iterating (e.g. when undoing) is supported.
+        translations = self._translations
+        index = len(translations) - 1
+        while 0 <= index < len(translations):
+            yield translations[index]
+            index -= 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return _slice(self._translations, len(self._translations), index)
+        return self._translations[index]
+
+    def __setitem__(self, index, value):
+        self._detach_views()
+        if isinstance(index, slice):
+            translations = list(self._translations)
+            translations[index] = value
+            self._reset(translations)
+            return
+        self.stroke_count -= len(self._translations[index])
+        self._translations[index] = value
+        self.stroke_count += len(value)
+
+    def __delitem__(self, index):
+        self._detach_views()
+        if isinstance(index, slice):
+            translations = list(self._translations)
+            del translations[index]
+            self._reset(translations)
+            return
+        self.stroke_count -= len(self._translations[index])
+        del self._translations[index]
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            t1 == t2 for t1, t2 in zip(self, other)
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __str__(self):
+        return str(list(self._translations))
+
+    def __repr__(self):
+        return str(self)
+
+    def _reset(self, translations):
+        self.clear()
+        self.extend(translations)
+
+    def _detach_views(self):
+        # The history is about to change: views that are
+        # still referenced get a copy of their translations.
+        if not self._views:
+            return
+        for ref in self._views:
+            view = ref()
+            if view is not None:
+                view._detach()
+        self._views.clear()
+
+    def view(self, count):
+        """Return a read-only view without the last `count` translations.
+
+        Creating the view does not copy the history: the translations
+        are only copied if the view is still referenced when the history
+        is next changed.
+        """
+        view = _TranslationHistoryView(self._translations, count)
+        self._views.append(weakref.ref(view))
+        return view
+
+    def insert(self, index, translation):
+        self._detach_views()
+        self._translations.insert(index, translation)
+        self.stroke_count += len(translation)
+
+    def append(self, translation):
+        self._detach_views()
+        self._translations.append(translation)
+        self.stroke_count += len(translation)
+
+    def extend(self, translations):
+        for t in translations:
+            self.append(t)
+
+    def pop(self, index=-1):
+        if index != -1:
+            translation = self._translations[index]
+            del self[index]
+            return translation
+        self._detach_views()
+        translation = self._translations.pop()
+        self.stroke_count -= len(translation)
+        return translation
+
+    def popleft(self):
+        self._detach_views()
+        translation = self._translations.popleft()
+        self.stroke_count -= len(translation)
+        return translation
+
+    def clear(self):
+        self._detach_views()
+        self._translations.clear()
+        self.stroke_count = 0
+
+
+def _slice(translations, length, index):
+    """Return `translations[index]`, for the first `length` translations.
+
+    Indexing a deque is O(n) away from its ends, so the translations
+    are iterated from the nearest end instead.
+    """
+    indices = range(*index.indices(length))
+    if not indices:
+        return []
+    first, last = min(indices), max(indices)
+    size = len(translations)
+    if first <= size - 1 - last:
+        items = list(islice(translations, first, last + 1))
+    else:
+        items = list(islice(reversed(translations), size - 1 - last, size - first))
+        items.reverse()
+    if indices.step != 1:
+        items = items[::indices.step]
+    return items
+
+
+class _TranslationHistoryView(Sequence):
+    """Read-only view on a translator history, see `_TranslationHistory.view`."""
+
+    __slots__ = ('_translations', '_count', '__weakref__')
+
+    def __init__(self, translations, count):
+        self._translations = translations
+        self._count = count
+
+    def _detach(self):
+        self._translations = list(islice(self._translations, len(self)))
+        self._count = 0
+
+    def __len__(self):
+        return max(len(self._translations) - self._count, 0)
+
+    def __iter__(self):
+        return islice(self._translations, len(self))
+
+    def __reversed__(self):
+        return islice(reversed(self._translations), self._count, None)
+
+    def __getitem__(self, index):
+        length = len(self)
+        if isinstance(index, slice):
+            return _slice(self._translations, length, index)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('translation index out of range')
+        return self._translations[index]
+
+    __eq__ = _TranslationHistory.__eq__
+    __ne__ = _TranslationHistory.__ne__
+
+    def __str__(self):
+        return str(list(self))
+
+    def __repr__(self):
+        return str(self)
+
+
 class _State:
     """An object representing the current state of the translator state machine.
 
@@ -445,10 +844,18 @@ class _State:
         self.translations = []
         self.tail = None
 
+    @property
+    def translations(self):
+        return self._translations
+
+    @translations.setter
+    def translations(self, translations):
+        self._translations = _TranslationHistory(translations)
+
     def prev(self, count=None):
         """Get the most recent translations."""
         if count is not None:
-            prev = self.translations[:-count]
+            prev = self.translations.view(count)
         else:
             prev = self.translations
         if prev:
@@ -459,14 +866,9 @@ class _State:
 
     def restrict_size(self, n):
         """Reduce the history of translations to n."""
-        stroke_count = 0
-        translation_count = 0
-        for t in reversed(self.translations):
-            stroke_count += len(t)
-            translation_count += 1
-            if stroke_count >= n:
-                break
-        translation_index = len(self.translations) - translation_count
-        if translation_index:
-            self.tail = self.translations[translation_index - 1]
-        del self.translations[:translation_index]
+        translations = self.translations
+        # Always keep the last translation, and drop the oldest
+        # ones for as long as enough strokes would remain.
+        while len(translations) > 1 and \
+              translations.stroke_count - len(translations[0]) >= n:
+            self.tail = translations.popleft()
@@ -28,13 +28,17 @@ for dist in pkg_resources.require('plover'):
 # Load plugins.
 registry = Registry(suppress_errors=False)
 registry.update()
+for plugin_type in registry.PLUGIN_TYPES:
+    registry.list_plugins(plugin_type)
 
 # Find plugins requirements.
 plugins = OrderedDict()
 plugins_deps = set()
 for plugin_dist in registry.list_distributions():
     if plugin_dist.dist.project_name != 'plover':
-        plugins[plugin_dist.dist.as_requirement()] = set()
+        requirement = pkg_resources.Requirement.parse('%s==%s' % (
+            plugin_dist.dist.project_name, plugin_dist.dist.version))
+        plugins[requirement] = set()
 for requirement, deps in plugins.items():
     for dist in pkg_resources.require(str(requirement)):
         if dist.as_requirement() not in plover_deps:
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+"""Generate synthetic steno dictionaries, for benchmarks and tests.
+
+The generated dictionaries are deterministic (for a given seed and
+system), use valid strokes for the system, with a realistic outline
+length distribution, and translations including metas, affixes, and
+duplicates (the same translation for several outlines).
+
+    python -m plover_build_utils.generate_dictionary -n 100000 main.json
+    python -m plover_build_utils.generate_dictionary -n 100000 main.rtf
+
+"""
+
+import argparse
+import bisect
+import codecs
+import itertools
+import json
+import os
+import random
+
+from plover import system
+from plover.steno import Stroke
+
+
+# Outline length (number of strokes) distribution.
+OUTLINE_LENGTHS = (
+    (1, 45),
+    (2, 35),
+    (3, 13),
+    (4, 5),
+    (5, 2),
+)
+
+# Ratio of entries reusing an already generated translation.
+DUPLICATES_RATIO = 0.15
+
+AFFIXES = '''
+{^ing} {^ed} {^s} {^er} {^ly} {^ment} {^ness} {^ful} {^ity} {^ation}
+{re^} {un^} {pre^} {dis^} {in^} {^-^} {^}
+'''.split()
+
+METAS = '''
+{.} {,} {?} {!} {:} {;} {-|} {>} {<} {*-|} {^.^} {^'s} {&a} {&b} {&c}
+{#Return} {#Tab} {#BackSpace} {PLOVER:TOGGLE} {PLOVER:ADD_TRANSLATION}
+'''.split()
+
+SYLLABLES = '''
+a an ar as at ba be bi bo ca ce ci co con de di do dy e el em en er es
+fa fe fi fo ga ge gi go ha he hi ho i in is it ka la le li lo lu ma me
+mi mo na ne ni no o on or pa pe pi po pro ra re ri ro sa se si so sta
+ta te ter ti to tion u un ur va ve vi wa we wi ya ze
+'''.split()
+
+
+def _weighted_choice(rnd, choices, cum_weights):
+    return choices[bisect.bisect(cum_weights, rnd.random() * cum_weights[-1])]
+
+
+class DictionaryGenerator:
+    '''Generate steno dictionary entries for the current system.'''
+
+    def __init__(self, seed=0):
+        self._rnd = random.Random(seed)
+        keys = [k for k in system.KEYS if k != system.NUMBER_KEY]
+        self._left_keys = [k for k in keys if k.endswith('-')
+                           and k not in system.IMPLICIT_HYPHEN_KEYS]
+        self._middle_keys = [k for k in keys if k in system.IMPLICIT_HYPHEN_KEYS]
+        self._right_keys = [k for k in keys if k.startswith('-')
+                            and k not in system.IMPLICIT_HYPHEN_KEYS]
+        lengths, weights = zip(*OUTLINE_LENGTHS)
+        self._outline_lengths = lengths
+        self._outline_lengths_cum_weights = list(itertools.accumulate(weights))
+        self._words = set()
+
+    def make_stroke(self):
+        '''Return a random (valid) stroke, in RTF/CRE format.'''
+        getrandbits = self._rnd.getrandbits
+        keys = []
+        # Sparse random bit masks: on average, a quarter
+        # of the keys of each bank (an eighth on the right).
+        for bank, masks in (
+            (self._left_keys, 2),
+            (self._middle_keys, 2),
+            (self._right_keys, 3),
+        ):
+            bits = getrandbits(len(bank))
+            for _ in range(masks - 1):
+                bits &= getrandbits(len(bank))
+            keys.extend(key for n, key in enumerate(bank) if bits & (1 << n))
+        if not keys:
+            keys.append(self._rnd.choice(self._left_keys or self._right_keys))
+        return Stroke(keys).rtfcre
+
+    def make_word(self):
+        rnd = self._rnd
+        while True:
+            word = ''.join(rnd.choice(SYLLABLES)
+                           for _ in range(rnd.choice((1, 2, 2, 3, 3, 4))))
+            # Avoid too many accidental duplicates.
+            if word not in self._words or rnd.random() < 0.05:
+                self._words.add(word)
+                return word
+
+    def make_translation(self):
+        rnd = self._rnd
+        n = rnd.random()
+        if n < 0.03:
+            return rnd.choice(AFFIXES)
+        if n < 0.05:
+            return rnd.choice(METAS)
+        if n < 0.08:
+            # Word with an affix.
+            affix = rnd.choice(AFFIXES[:-2])
+            word = self.make_word()
+            return affix[:-1] + word + '}' if affix.endswith('^}') \
+                else word + affix
+        if n < 0.10:
+            # Capitalized word.
+            return self.make_word().capitalize()
+        if n < 0.20:
+            # Phrase.
+            return ' '.join(self.make_word() for _ in range(rnd.randint(2, 4)))
+        return self.make_word()
+
+    def generate(self, entries):
+        '''Return a list of <entries> (outline, translation) pairs.'''
+        rnd = self._rnd
+        # Strokes are reused between outlines, like in real dictionaries.
+        strokes = set()
+        for _ in range(max(entries, 100)):
+            strokes.add(self.make_stroke())
+        strokes = sorted(strokes)
+        rnd.shuffle(strokes)
+        # Unused strokes, for single stroke outlines.
+        unused_strokes = list(strokes)
+        outlines = set()
+        translations = []
+        dictionary = []
+        while len(dictionary) < entries:
+            length = _weighted_choice(rnd, self._outline_lengths,
+                                      self._outline_lengths_cum_weights)
+            if length == 1 and unused_strokes:
+                outline = unused_strokes.pop()
+            else:
+                outline = '/'.join(rnd.choice(strokes)
+                                   for _ in range(max(length, 2)))
+            if outline in outlines:
+                continue
+            outlines.add(outline)
+            if translations and rnd.random() < DUPLICATES_RATIO:
+                translation = rnd.choice(translations)
+            else:
+                translation = self.make_translation()
+                translations.append(translation)
+            dictionary.append((outline, translation))
+        return dictionary
+
+
+def generate_dictionary(entries, seed=0):
+    '''Return a list of <entries> (outline, translation) pairs.'''
+    return DictionaryGenerator(seed).generate(entries)
+
+
+def save_json(dictionary, filename):
+    with open(filename, 'wb') as fp:
+        writer = codecs.getwriter('utf-8')(fp)
+        json.dump(dict(dictionary), writer, ensure_ascii=False,
+                  sort_keys=True, indent=0, separators=(',', ': '))
+
+
+def save_rtf(dictionary, filename):
+    from plover.dictionary.rtfcre_dict import HEADER, format_translation
+    with open(filename, 'wb') as fp:
+        writer = codecs.getwriter('cp1252')(fp)
+        writer.write(HEADER)
+        for outline, translation in dictionary:
+            writer.write('{\\*\\cxs %s}%s\r\n' % (outline, format_translation(translation)))
+        writer.write('}\r\n')
+
+
+FORMATS = {
+    'json': save_json,
+    'rtf': save_rtf,
+}
+
+
+def main():
+    from plover.config import DEFAULT_SYSTEM_NAME
+    from plover.registry import registry
+    parser = argparse.ArgumentParser(description='Generate a synthetic steno dictionary.')
+    parser.add_argument('-n', '--entries', type=int, default=100000,
+                        help='number of entries (default: %(default)s)')
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='random seed (default: %(default)s)')
+    parser.add_argument('--system', default=DEFAULT_SYSTEM_NAME,
+                        help='steno system (default: %(default)s)')
+    parser.add_argument('-f', '--format', choices=sorted(FORMATS),
+                        help='output format (default: from the output file extension)')
+    parser.add_argument('output', help='output file')
+    args = parser.parse_args()
+    fmt = args.format
+    if fmt is None:
+        fmt = os.path.splitext(args.output)[1][1:].lower()
+        if fmt not in FORMATS:
+            parser.error('unsupported output format: %s' % fmt)
+    registry.update()
+    system.setup(args.system)
+    FORMATS[fmt](generate_dictionary(args.entries, args.seed), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,23 @@
+import atexit
 import inspect
+import shutil
+import tempfile
 
 import pytest
 
-from plover import system
+from plover import orthography, system
 from plover.config import DEFAULT_SYSTEM_NAME
 from plover.registry import registry
+import plover.registry
 
 
+# Don't use the user configuration directory
+# (for caches and wordlists), use a temporary one.
+CONFIG_DIR = tempfile.mkdtemp(prefix='plover-test-')
+atexit.register(shutil.rmtree, CONFIG_DIR, ignore_errors=True)
+for module in (orthography, plover.registry, system):
+    module.CONFIG_DIR = CONFIG_DIR
+
 # Setup registry.
 registry.update()
 # Setup default system.
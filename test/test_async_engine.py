@@ -0,0 +1,134 @@
+import asyncio
+import os
+import tempfile
+import threading
+
+import pytest
+
+from plover import system
+from plover.async_engine import AsyncStenoEngine
+from plover.config import Config
+from plover.registry import Registry
+from plover.steno_dictionary import StenoDictionary
+
+from .test_engine import FakeKeyboardEmulation, FakeMachine
+
+
+class ThreadedEngine(AsyncStenoEngine):
+
+    thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run)
+        self.thread.start()
+        AsyncStenoEngine.start(self)
+
+    def join(self):
+        self.thread.join()
+        return self.code
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    FakeMachine.instance = None
+    registry = Registry()
+    registry.update()
+    registry.register_plugin('machine', 'Fake', FakeMachine)
+    monkeypatch.setattr('plover.config.registry', registry)
+    monkeypatch.setattr('plover.engine.registry', registry)
+    cfg = Config()
+    cfg_file = tempfile.NamedTemporaryFile(prefix='plover',
+                                           suffix='config',
+                                           delete=False)
+    engine = None
+    try:
+        cfg.target_file = cfg_file.name
+        cfg['dictionaries'] = []
+        cfg['machine_type'] = 'Fake'
+        cfg['system_keymap'] = [(k, k) for k in system.KEYS]
+        cfg.save(cfg_file)
+        cfg_file.close()
+        engine = ThreadedEngine(cfg, FakeKeyboardEmulation())
+        assert engine.load_config()
+        yield engine
+    finally:
+        os.unlink(cfg_file.name)
+        # Don't leave the engine thread running on failures.
+        if engine is not None and engine.thread is not None \
+           and engine.thread.is_alive():
+            engine.quit()
+            engine.join()
+
+
+def run_coroutine(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_async_engine(engine):
+    stroked = []
+    stroked_event = threading.Event()
+    async def on_stroked(stroke):
+        assert engine._in_engine_thread()
+        # Lookups from the engine loop.
+        stroked.append((stroke.rtfcre, await engine.lookup_async(('S',))))
+        stroked_event.set()
+    def on_quit():
+        assert engine._in_engine_thread()
+    engine.hook_connect('stroked', on_stroked)
+    engine.hook_connect('quit', on_quit)
+    d = StenoDictionary()
+    d['S'] = 'test'
+    started = threading.Event()
+    engine.hook_connect('config_changed', lambda config: started.set())
+    engine.start()
+    assert started.wait(5)
+    with engine:
+        engine._dictionaries.set_dicts([d])
+    # Strokes are processed on the engine loop.
+    FakeMachine.instance._notify(['S-'])
+    assert stroked_event.wait(5)
+    assert stroked == [('S', 'test')]
+    # Lookups from another thread/loop.
+    assert run_coroutine(engine.lookup_async(('S',))) == 'test'
+    assert run_coroutine(engine.reverse_lookup_async('test')) == {'S'}
+    # Synchronous API.
+    assert engine.lookup(('S',)) == 'test'
+    # Coroutines can be scheduled from any thread.
+    async def add(a, b):
+        assert engine._in_engine_thread()
+        return a + b
+    assert engine.create_task(add(1, 2)).result(5) == 3
+    engine.quit(2)
+    assert engine.join() == 2
+    assert engine.loop.is_closed()
+    # Calls after quitting are ignored.
+    engine.toggle_output()
+    # But lookups still work.
+    assert run_coroutine(engine.lookup_async(('S',))) == 'test'
+
+
+def test_async_engine_pending_tasks(engine, monkeypatch):
+    monkeypatch.setattr('plover.async_engine.QUIT_TIMEOUT', 0.1)
+    started = threading.Event()
+    engine.hook_connect('config_changed', lambda config: started.set())
+    engine.start()
+    assert started.wait(5)
+    cancelled = threading.Event()
+    running = threading.Event()
+    async def forever():
+        running.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+    future = engine.create_task(forever())
+    assert running.wait(5)
+    engine.quit()
+    assert engine.join() == 0
+    assert cancelled.is_set()
+    assert future.cancelled()
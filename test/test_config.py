@@ -109,16 +109,22 @@ DEFAULTS = {
     'space_placement': 'Before Output',
     'start_attached': False,
     'start_capitalized': False,
+    'batch_output': False,
     'undo_levels': config.DEFAULT_UNDO_LEVELS,
+    'lookup_strategy': config.DEFAULT_LOOKUP_STRATEGY,
+    'precompile_translations': False,
     'log_file_name': expand_path('strokes.log'),
     'enable_stroke_logging': False,
     'enable_translation_logging': False,
+    'journal_file_name': expand_path('journal.jsonl'),
+    'enable_journal': False,
     'start_minimized': False,
     'show_stroke_display': False,
     'show_suggestions_display': False,
     'translation_frame_opacity': 100,
     'classic_dictionaries_display_order': False,
     'enabled_extensions': set(),
+    'async_hooks': False,
     'auto_start': False,
     'machine_type': 'Keyboard',
     'machine_specific_options': { 'arpeggiate': False },
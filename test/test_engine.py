@@ -1,16 +1,17 @@
 from functools import partial
 import os
 import tempfile
+import threading
 
 import pytest
 
-from plover import system
+from plover import hooks, journal, latency, profiling, system
 from plover.config import Config, DictionaryConfig
 from plover.engine import ErroredDictionary, StenoEngine
 from plover.machine.base import StenotypeBase
 from plover.machine.keymap import Keymap
 from plover.registry import Registry
-from plover.steno_dictionary import StenoDictionaryCollection
+from plover.steno_dictionary import StenoDictionary, StenoDictionaryCollection
 
 from .utils import make_dict
 
@@ -229,3 +230,199 @@ def test_loading_dictionaries(engine):
             (valid_dict_1, False, False),
             (invalid_dict_2, True, True),
         ]])
+
+def test_latency_stats(engine):
+    latency.reset()
+    assert engine.load_config()
+    engine.start()
+    engine.output = True
+    FakeMachine.instance._notify(['S-'])
+    stats = engine.get_latency_stats()
+    for probe in ('queue', 'stroke', 'translate', 'format',
+                  'output', 'send_string'):
+        assert stats[probe].count == 1
+    assert stats['stroke'].max >= stats['translate'].max
+    engine.quit()
+
+def test_queue_batch(engine, monkeypatch):
+    monkeypatch.setattr(engine, '_in_engine_thread', lambda: False)
+    calls = []
+    def call(n):
+        calls.append(n)
+    def fail():
+        raise ValueError()
+    flushes = []
+    monkeypatch.setattr(engine._formatter, 'flush_output',
+                        lambda: flushes.append(len(calls)))
+    # All pending items are processed in one batch, and an error
+    # does not prevent the rest of the batch from being processed.
+    for n in range(3):
+        engine._same_thread_hook(call, n)
+    engine._same_thread_hook(fail)
+    engine._same_thread_hook(call, 3)
+    engine.quit()
+    engine.run()
+    assert calls == [0, 1, 2, 3]
+    stats = engine.get_queue_stats()
+    assert stats['depth'].count == 1
+    assert stats['depth'].max == 6
+    assert stats['wait'].count == 6
+    # Output is flushed once: by `_quit`.
+    assert flushes == [4]
+
+
+def test_queue_batch_output(engine, monkeypatch):
+    assert engine.load_config()
+    assert not engine.config['batch_output']
+    engine.start()
+    engine.output = True
+    monkeypatch.setattr(engine, '_in_engine_thread', lambda: False)
+    FakeMachine.instance._notify(['S-'])
+    FakeMachine.instance._notify(['-T'])
+    del engine.events[:]
+    engine._process_batch(engine._get_batch(block=False))
+    # The output of the whole batch is sent at once.
+    assert [args for hook, args, kwargs in engine.events
+            if hook == 'send_string'] == [(' S -T',)]
+    # And the `batch_output` option is still honored.
+    assert engine._formatter._batched_output is None
+
+
+def test_lookup_without_lock(engine):
+    d = StenoDictionary()
+    d['S'] = 'test'
+    engine._set_dictionaries([d])
+    # Lookups don't need the engine lock.
+    locked = threading.Event()
+    release = threading.Event()
+    def hold_lock():
+        with engine:
+            locked.set()
+            release.wait(5)
+    thread = threading.Thread(target=hold_lock)
+    thread.start()
+    try:
+        assert locked.wait(5)
+        assert engine.lookup(('S',)) == 'test'
+        assert engine.raw_lookup(('S',)) == 'test'
+        assert engine.reverse_lookup('test') == {'S'}
+        assert engine.casereverse_lookup('TEST') == ['test']
+        assert [s.text for s in engine.get_suggestions('test')] == ['test']
+    finally:
+        release.set()
+        thread.join()
+    # And see edits.
+    engine.add_dictionary_filter(lambda key, value: key == 'S')
+    assert engine.lookup(('S',)) is None
+
+
+def test_async_hooks(engine, monkeypatch, caplog):
+    assert engine.load_config()
+    engine.start()
+    engine.output = True
+    engine_thread = threading.current_thread()
+    delivered = []
+    stroked = threading.Event()
+    def on_hook(hook, *args):
+        delivered.append((hook, threading.current_thread()))
+        if hook == 'stroked':
+            stroked.set()
+    for hook in ('stroked', 'translated', 'send_string', 'quit'):
+        engine.hook_connect(hook, partial(on_hook, hook))
+    engine.config = {'async_hooks': True}
+    dispatcher = engine._hook_dispatcher
+    assert dispatcher is not None
+    def delivered_from():
+        return [
+            (hook, 'engine' if thread is engine_thread else
+             'dispatcher' if thread is dispatcher._thread else thread)
+            for hook, thread in delivered
+        ]
+    monkeypatch.setattr(hooks, 'HOOK_TIME_BUDGET', 0)
+    FakeMachine.instance._notify(['S-'])
+    assert stroked.wait(5)
+    # Output affecting hooks (and the ones that must be
+    # in order with strokes) are still delivered synchronously.
+    assert sorted(delivered_from()) == [
+        ('send_string', 'engine'),
+        ('stroked', 'dispatcher'),
+        ('translated', 'dispatcher'),
+    ]
+    del delivered[:]
+    # Hold the dispatcher, so the next hooks are still pending on quit.
+    with dispatcher._condition:
+        FakeMachine.instance._notify(['-T'])
+        engine.quit()
+    assert engine._hook_dispatcher is None
+    dispatcher._thread.join(5)
+    assert not dispatcher._thread.is_alive()
+    # Pending hooks are delivered (from the engine thread) before `quit`.
+    assert delivered_from() == [
+        ('send_string', 'engine'),
+        ('translated', 'engine'),
+        ('stroked', 'engine'),
+        ('quit', 'engine'),
+    ]
+    # Timings.
+    stats = engine.get_hook_stats()
+    callbacks = {hook: callback for (hook, callback) in stats}
+    assert stats[('stroked', callbacks['stroked'])].count == 2
+    # Only one budget warning per callback.
+    budget_warnings = [r for r in caplog.records
+                       if r.getMessage().startswith("hook 'stroked'")]
+    assert len(budget_warnings) == 2
+    # Disconnected callbacks are not kept around.
+    engine.hook_disconnect('stroked', callbacks['stroked'])
+    assert ('stroked', callbacks['stroked']) not in engine.get_hook_stats()
+
+
+def test_profiling(engine, monkeypatch, tmpdir):
+    monkeypatch.setattr(profiling, 'PROFILES_DIR', str(tmpdir))
+    assert engine.load_config()
+    engine.start()
+    engine.output = True
+    assert not engine.is_profiling
+    # Toggled with the `PLOVER:PROFILE` command.
+    profiling.profile_command(engine, 'strokes=2')
+    assert engine.is_profiling
+    FakeMachine.instance._notify(['S-'])
+    assert engine.is_profiling
+    FakeMachine.instance._notify(['-T'])
+    assert not engine.is_profiling
+    assert len(tmpdir.listdir()) == 1
+    profiling.profile_command(engine, '')
+    assert engine.is_profiling
+    profiling.profile_command(engine, '')
+    assert not engine.is_profiling
+    assert len(tmpdir.listdir()) == 2
+    # Profiling is stopped on quit.
+    engine.start_profiling(mode='sample')
+    engine.quit()
+    assert not engine.is_profiling
+    assert len(tmpdir.listdir()) == 3
+
+
+def test_journal(engine, tmpdir):
+    filename = str(tmpdir / 'journal.jsonl')
+    assert engine.load_config()
+    engine.start()
+    engine.output = True
+    engine.config = {'enable_journal': True, 'journal_file_name': filename}
+    d = StenoDictionary()
+    d['S'] = 'test'
+    engine._set_dictionaries([d])
+    FakeMachine.instance._notify(['S-'])
+    FakeMachine.instance._notify(['*'])
+    engine.quit()
+    entries = [
+        {k: v for k, v in entry.items() if k != 'time'}
+        for entry in journal.read(filename)
+    ]
+    assert entries == [
+        {'type': 'stroke', 'keys': ['S-'], 'steno': 'S'},
+        {'type': 'translation', 'undo': False, 'strokes': ['S'], 'translation': 'test'},
+        {'type': 'output', 'string': ' test'},
+        {'type': 'stroke', 'keys': ['*'], 'steno': '*'},
+        {'type': 'translation', 'undo': True, 'strokes': ['S'], 'translation': 'test'},
+        {'type': 'output', 'backspaces': 5},
+    ]
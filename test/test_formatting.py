@@ -7,7 +7,8 @@ import inspect
 
 import pytest
 
-from plover import formatting
+from plover import formatting, latency
+from plover.steno_dictionary import StenoDictionary
 from plover_build_utils.testing import CaptureOutput
 
 from . import parametrize
@@ -204,10 +205,60 @@ def test_formatter(undo, do, prev, expected_formats, expected_outputs):
     assert output.instructions == expected_outputs
 
 
+def test_batch_output():
+    output = CaptureOutput()
+    formatter = formatting.Formatter()
+    formatter.set_output(output)
+    formatter.set_batch_output(True)
+    t1 = translation(rtfcre=('S',), english='hello')
+    t2 = translation(rtfcre=('KPA',), english='{*-|}')
+    t3 = translation(rtfcre=('R-R',), english='{#Return}')
+    t4 = translation(rtfcre=('WORLD',), english='world')
+    formatter.format([], [t1], None)
+    formatter.format([], [t2], [t1])
+    assert output.instructions == []
+    # Pending output is sent before a key combination.
+    formatter.format([], [t3], [t1, t2])
+    assert output.instructions == [('s', ' Hello'), ('c', 'Return')]
+    # Typed and undone.
+    formatter.format([], [t4], [t1, t2, t3])
+    formatter.format([t4], [], [t1, t2, t3])
+    formatter.flush_output()
+    assert output.instructions == [('s', ' Hello'), ('c', 'Return')]
+    formatter.format([], [t4], [t1, t2, t3])
+    formatter.set_batch_output(False)
+    assert output.instructions == [('s', ' Hello'), ('c', 'Return'), ('s', ' world')]
+    formatter.format([t4], [], [t1, t2, t3])
+    assert output.instructions[-1] == ('b', 6)
+
+
+def test_batch_output_latency():
+    output = CaptureOutput()
+    formatter = formatting.Formatter()
+    formatter.set_output(output)
+    formatter.set_batch_output(True)
+    latency.reset()
+    formatter.format([], [translation(rtfcre=('S',), english='hello')], None)
+    # Only the actual output is timed.
+    assert 'output' not in latency.get_stats()
+    formatter.flush_output()
+    assert latency.get_stats()['output'].count == 1
+    latency.reset()
+
+
 def test_action():
     assert action(word='test') != action(word='test', next_attach=True)
     assert action(text='test') == action(text='test')
     assert action(text='test', word='test').copy_state() == action(word='test')
+    a = action(text_and_word='foo', next_attach=True, case=formatting.CASE_UPPER)
+    assert not hasattr(a, '__dict__')
+    assert str(a) == "Action(case='upper', next_attach=True, text='foo', word='foo')"
+    assert a == action(text_and_word='foo', next_attach=True, case=formatting.CASE_UPPER)
+    assert a != action(text_and_word='foo', next_attach=True)
+    assert a != 'foo'
+    assert a.copy_state() == action(word='foo', prev_attach=True, next_attach=True,
+                                    case=formatting.CASE_UPPER)
+    assert a.new_state() == action(prev_attach=True, case=formatting.CASE_UPPER)
 
 
 TRANSLATION_TO_ACTIONS_TESTS = (
@@ -501,6 +552,60 @@ def test_translation_to_actions(translation, last_action, expected):
     assert formatting._translation_to_actions(translation, ctx) == expected
 
 
+def test_compile_translation():
+    formatting._compile_translation.cache_clear()
+    compiled = formatting._compile_translation('{^}ing{.}')
+    assert compiled == (
+        (formatting._apply_meta_attach, '^'),
+        (formatting._apply_text, 'ing'),
+        (formatting._apply_meta_stop, '.'),
+    )
+    assert formatting._compile_translation('{^}ing{.}') is compiled
+    assert formatting._compile_translation.cache_info().hits == 1
+    assert formatting._compile_translation('42') == (
+        (formatting._apply_meta_glue, '&42'),
+    )
+    assert formatting._compile_translation('{:foo:bar:baz}') == (
+        (formatting._apply_meta_custom, ('foo', 'bar:baz')),
+    )
+
+
+def test_precompile_translations():
+    d = StenoDictionary()
+    d[('S',)] = 'is'
+    d[('S', '-G')] = 'test{^ing}'
+    d[('T',)] = '{^ing'
+    d[('P',)] = '{foo}'
+    d[('K',)] = '{:not_a_meta_plugin}'
+    d[('W',)] = '{MODE:NOT_A_MODE}'
+    d[('R',)] = '{*($c}'
+    d[('H',)] = '{MODE:SET_SPACE:_}{}'
+    try:
+        malformed = formatting.precompile_translations([d])
+        assert [(strokes, error.split(':')[0])
+                for dictionary, strokes, translation, error in malformed] == [
+            (('T',), "unmatched '{' or '}'"),
+            (('P',), 'unknown meta'),
+            (('K',), 'unknown meta plugin'),
+            (('W',), 'invalid mode'),
+            (('R',), 'invalid retro format'),
+        ]
+        assert formatting._precompiled_translations['test{^ing}'] == (
+            (formatting._apply_text, 'test'),
+            (formatting._apply_meta_attach, '^ing'),
+        )
+        # Already compiled translations are not checked again.
+        assert formatting.precompile_translations([d]) == []
+        ctx = formatting._Context((), action())
+        assert formatting._translation_to_actions('test{^ing}', ctx) == [
+            action(text_and_word='test', trailing_space=' '),
+            action(text='ing', word='testing', prev_attach=True, trailing_space=' '),
+        ]
+    finally:
+        formatting.precompile_translations(())
+    assert formatting._precompiled_translations == {}
+
+
 RAW_TO_ACTIONS_TESTS = (
 
     lambda:
@@ -1201,3 +1306,21 @@ class TestRetroFormatter:
         for t in translation_list:
             self.format(t)
         assert self.retro_formatter.last_text(count) == text
+
+    def test_fragments_cache(self):
+        for text in ('Luca', 'mela', 'is', 'a', 'pear'):
+            self.format(text)
+        fragments = self.retro_formatter.iter_last_fragments()
+        assert next(fragments) == 'pear'
+        # Fragments are shared by all queries.
+        assert self.retro_formatter.last_fragments(2) == ['a ', 'pear']
+        assert next(fragments) == 'a '
+        assert next(fragments) == 'is '
+        assert self.retro_formatter.last_text(9) == 'is a pear'
+        assert list(fragments) == ['mela ', 'Luca ']
+        # But a context is updated on new actions.
+        ctx = formatting._Context(self.translations,
+                                  self.translations[-1].formatting[-1])
+        assert ctx.last_words(1) == ['pear']
+        ctx.translated(action(text_and_word='pie', trailing_space=' '))
+        assert ctx.last_words(2) == ['pear ', 'pie']
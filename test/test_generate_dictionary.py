@@ -0,0 +1,57 @@
+"""Tests for plover_build_utils/generate_dictionary.py."""
+
+from collections import Counter
+
+import pytest
+
+from plover.dictionary.json_dict import JsonDictionary
+from plover.dictionary.rtfcre_dict import RtfDictionary
+from plover.steno import normalize_steno
+
+from plover_build_utils.generate_dictionary import (
+    AFFIXES,
+    METAS,
+    generate_dictionary,
+    save_json,
+    save_rtf,
+)
+
+
+def test_deterministic():
+    assert generate_dictionary(1000, seed=42) == generate_dictionary(1000, seed=42)
+    assert generate_dictionary(1000, seed=42) != generate_dictionary(1000, seed=43)
+
+
+def test_contents():
+    dictionary = generate_dictionary(10000)
+    assert len(dictionary) == 10000
+    outlines = [outline for outline, translation in dictionary]
+    translations = [translation for outline, translation in dictionary]
+    # No duplicate outlines.
+    assert len(set(outlines)) == len(outlines)
+    # Valid strokes.
+    for outline in outlines:
+        assert '/'.join(normalize_steno(outline)) == outline
+    # Multi-strokes outlines, but mostly short ones.
+    lengths = Counter(len(outline.split('/')) for outline in outlines)
+    assert lengths[1] > lengths[2] > lengths[3] > lengths[4] > 0
+    # Duplicated translations, metas, and affixes.
+    assert len(set(translations)) < len(translations) * 0.9
+    assert set(translations) & set(METAS)
+    assert set(translations) & set(AFFIXES)
+
+
+@pytest.mark.parametrize('dictionary_class, save, extension', (
+    (JsonDictionary, save_json, '.json'),
+    (RtfDictionary, save_rtf, '.rtf'),
+))
+def test_load(tmpdir, dictionary_class, save, extension):
+    dictionary = generate_dictionary(2000)
+    filename = str(tmpdir / ('dictionary' + extension))
+    save(dictionary, filename)
+    d = dictionary_class.load(filename)
+    assert len(d) == len(dictionary)
+    for outline, translation in dictionary:
+        assert outline in d
+        if dictionary_class is JsonDictionary:
+            assert d[outline] == translation
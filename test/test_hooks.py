@@ -0,0 +1,58 @@
+import threading
+
+from plover.hooks import HookDispatcher
+
+
+def test_dispatcher():
+    calls = []
+    done = threading.Event()
+    release = threading.Event()
+    def call_hook(hook, args, kwargs):
+        if hook == 'stroked' and args == (0,):
+            release.wait(5)
+        calls.append((hook, args, kwargs))
+        if hook == 'quit':
+            done.set()
+    dispatcher = HookDispatcher(call_hook)
+    # Block the dispatcher thread.
+    dispatcher.dispatch('stroked', (0,), {})
+    for n in range(1, 4):
+        dispatcher.dispatch('output_changed', (n % 2 == 0,), {})
+        dispatcher.dispatch('stroked', (n,), {})
+    dispatcher.dispatch('translated', ('old', 'new'), {'x': 1})
+    dispatcher.dispatch('quit', (), {})
+    dispatcher.stop()
+    release.set()
+    assert done.wait(5)
+    assert calls == [
+        ('stroked', (0,), {}),
+        ('stroked', (1,), {}),
+        ('stroked', (2,), {}),
+        # Coalesced: only the last one is delivered (in order).
+        ('output_changed', (False,), {}),
+        ('stroked', (3,), {}),
+        ('translated', ('old', 'new'), {'x': 1}),
+        ('quit', (), {}),
+    ]
+    dispatcher._thread.join(5)
+    assert not dispatcher._thread.is_alive()
+
+
+def test_dispatcher_cancel():
+    calls = []
+    dispatcher = HookDispatcher(lambda *item: calls.append(item))
+    # Hold the dispatcher, so all hooks are still pending.
+    with dispatcher._condition:
+        dispatcher.dispatch('output_changed', (True,), {})
+        dispatcher.dispatch('stroked', (1,), {})
+        dispatcher.dispatch('output_changed', (False,), {})
+        dispatcher.dispatch('translated', ('old', 'new'), {})
+        pending = dispatcher.cancel()
+    assert pending == [
+        ('stroked', (1,), {}),
+        ('output_changed', (False,), {}),
+        ('translated', ('old', 'new'), {}),
+    ]
+    dispatcher._thread.join(5)
+    assert not dispatcher._thread.is_alive()
+    assert calls == []
@@ -0,0 +1,87 @@
+"""Unit tests for journal.py."""
+
+import time
+
+from plover import journal
+from plover.steno import Stroke
+from plover.translation import Translation
+
+
+def test_journal(tmpdir):
+    filename = str(tmpdir / 'journal.jsonl')
+    j = journal.Journal(filename)
+    stroke = Stroke(['K-', 'A-', '-T'])
+    j.log_stroke(stroke)
+    j.log_translations([Translation([Stroke(['K-'])], 'can')],
+                       [Translation([Stroke(['K-']), stroke], 'cat')])
+    j.log_output('backspaces', 3)
+    j.log_output('string', 'cat')
+    j.log_output('key_combination', 'Return')
+    j.close()
+    entries = list(journal.read(filename))
+    times = [entry.pop('time') for entry in entries]
+    assert times == sorted(times)
+    assert entries == [
+        {'type': 'stroke', 'keys': ['K-', 'A-', '-T'], 'steno': 'KAT'},
+        {'type': 'translation', 'undo': True, 'strokes': ['K'], 'translation': 'can'},
+        {'type': 'translation', 'undo': False, 'strokes': ['K', 'KAT'], 'translation': 'cat'},
+        {'type': 'output', 'backspaces': 3},
+        {'type': 'output', 'string': 'cat'},
+        {'type': 'output', 'key_combination': 'Return'},
+    ]
+    # Filtering by type.
+    assert [e['type'] for e in journal.read(filename, types={'stroke'})] == ['stroke']
+
+
+def test_entries_snapshot(tmpdir):
+    filename = str(tmpdir / 'journal.jsonl')
+    j = journal.Journal(filename)
+    t = Translation([Stroke(['K-'])], 'can')
+    j.log_translations([], [t])
+    # Changes done after logging don't affect the journal.
+    t.english = 'cat'
+    j.close()
+    assert [e['translation'] for e in journal.read(filename)] == ['can']
+
+
+def test_write_errors(tmpdir, caplog):
+    filename = str(tmpdir / 'journal.jsonl')
+    j = journal.Journal(filename)
+    write = j._write
+    errors = []
+    def failing_write(entries):
+        if not errors:
+            errors.append(entries)
+            raise OSError('disk full')
+        write(entries)
+    j._write = failing_write
+    j.log_output('string', 'lost')
+    # Wait for the first write to fail.
+    while not errors:
+        time.sleep(0.01)
+    j.log_output('string', 'written')
+    j.close()
+    assert 'writing journal %s failed' % filename in caplog.text
+    # The journal writer is still running.
+    assert [e['string'] for e in journal.read(filename)] == ['written']
+
+
+def test_rotation(tmpdir):
+    filename = str(tmpdir / 'journal.jsonl')
+    for n in range(3):
+        j = journal.Journal(filename, max_bytes=1, backup_count=2)
+        j.log_output('string', str(n))
+        j.close()
+    assert journal.journal_files(filename) == [
+        filename + '.2', filename + '.1', filename,
+    ]
+    assert [e['string'] for e in journal.read(filename)] == ['1', '2']
+    assert list(journal.read(filename, rotated=False)) == []
+
+
+def test_invalid_lines(tmpdir):
+    filename = tmpdir / 'journal.jsonl'
+    filename.write_text('{"time": 1, "type": "output", "string": "a"}\n'
+                        'invalid\n'
+                        '{"time": 2, "type": "output", "str', encoding='utf-8')
+    assert [e['string'] for e in journal.read(str(filename))] == ['a']
@@ -0,0 +1,65 @@
+"""Tests for latency.py."""
+
+import pytest
+
+from plover import latency
+
+
+@pytest.fixture
+def clean_latency():
+    latency.reset()
+    latency.enable(True)
+    yield
+    latency.reset()
+    latency.enable(True)
+
+
+def test_histogram_percentiles():
+    histogram = latency.Histogram()
+    assert histogram.stats() == (0, 0.0, 0.0, 0.0, 0.0, 0.0)
+    for n in range(1, 101):
+        histogram.record(n / 1000)
+    stats = histogram.stats()
+    assert stats.count == 100
+    assert stats.mean == pytest.approx(0.0505)
+    assert stats.p50 == pytest.approx(0.051)
+    assert stats.p95 == pytest.approx(0.096)
+    assert stats.p99 == pytest.approx(0.100)
+    assert stats.max == pytest.approx(0.100)
+
+
+def test_histogram_rolling():
+    histogram = latency.Histogram(size=10)
+    histogram.record(1.0)
+    for _ in range(10):
+        histogram.record(0.001)
+    stats = histogram.stats()
+    # Count, mean and max are for all samples,
+    # percentiles only for the last ones.
+    assert stats.count == 11
+    assert stats.max == 1.0
+    assert stats.p99 == 0.001
+
+
+def test_record(clean_latency):
+    latency.record('translate', 0.002)
+    latency.record('translate', 0.004)
+    latency.record('output', 0.001)
+    stats = latency.get_stats()
+    assert sorted(stats) == ['output', 'translate']
+    assert stats['translate'].count == 2
+    assert stats['translate'].max == 0.004
+    latency.enable(False)
+    latency.record('translate', 0.002)
+    assert latency.get_stats()['translate'].count == 2
+    latency.reset()
+    assert latency.get_stats() == {}
+
+
+def test_format_stats(clean_latency):
+    latency.record('stroke', 0.0015)
+    lines = latency.format_stats(latency.get_stats()).split('\n')
+    assert lines[0].split() == ['latency', '(ms)', 'count',
+                                'mean', 'p50', 'p95', 'p99', 'max']
+    assert lines[1].split() == ['stroke', '1', '1.500', '1.500',
+                                '1.500', '1.500', '1.500']
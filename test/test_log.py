@@ -2,8 +2,10 @@
 # See LICENSE.txt for details.
 
 import os
+import threading
 from logging import Handler
 from collections import defaultdict
+from time import perf_counter
 
 import pytest
 
@@ -48,6 +50,7 @@ def test_set_filename():
     log.stroke(Stroke(('-T',)))
     log.set_stroke_filename(None)
     log.stroke(Stroke(('P-',)))
+    log.flush()
     assert FakeHandler.outputs == {
         sf1: ["Stroke(S : ['S-'])"],
         sf2: ["Stroke(-T : ['-T'])"],
@@ -59,6 +62,7 @@ def test_stroke():
     log.enable_stroke_logging(True)
     log.stroke(Stroke(('S-', '-T', 'T-')))
     log.stroke(Stroke(('#', 'S-', '-T')))
+    log.flush()
     assert FakeHandler.outputs == {
         sf: ["Stroke(ST-T : ['S-', 'T-', '-T'])",
              "Stroke(1-9 : ['1-', '-9'])"],
@@ -70,6 +74,7 @@ def test_log_translation():
     log.set_stroke_filename(sf)
     log.enable_translation_logging(True)
     log.translation(['a', 'b'], ['c', 'd'], None)
+    log.flush()
     assert FakeHandler.outputs == {sf: ['*a', '*b', 'c', 'd']}
 
 def test_enable_stroke_logging():
@@ -80,6 +85,7 @@ def test_enable_stroke_logging():
     log.stroke(Stroke(('T-',)))
     log.enable_stroke_logging(False)
     log.stroke(Stroke(('K-',)))
+    log.flush()
     assert FakeHandler.outputs == {sf: ["Stroke(T : ['T-'])"]}
 
 def test_enable_translation_logging():
@@ -90,4 +96,62 @@ def test_enable_translation_logging():
     log.translation(['c'], ['d'], None)
     log.enable_translation_logging(False)
     log.translation(['e'], ['f'], None)
+    log.flush()
     assert FakeHandler.outputs == {sf: ['*c', 'd']}
+
+def test_asynchronous_handlers():
+    records = []
+    release = threading.Event()
+    class SlowHandler(Handler):
+        def emit(self, record):
+            release.wait(5)
+            records.append((record.getMessage(), self.format(record)))
+    handler = SlowHandler()
+    log.add_handler(handler)
+    try:
+        # Logging does not block on handlers.
+        start = perf_counter()
+        try:
+            raise ValueError('oops')
+        except ValueError:
+            log.error('error: %s', 42, exc_info=True)
+        assert perf_counter() - start < 1
+        assert records == []
+        release.set()
+        log.flush()
+    finally:
+        log.remove_handler(handler)
+    # Exception information is preserved.
+    assert len(records) == 1
+    message, formatted = records[0]
+    assert message == 'error: 42'
+    assert formatted.startswith('error: 42\nTraceback')
+    assert formatted.endswith('ValueError: oops')
+
+def test_remove_handler_from_listener():
+    records = []
+    class SelfRemovingHandler(Handler):
+        def emit(self, record):
+            records.append(record.getMessage())
+            # Must not deadlock.
+            log.remove_handler(self)
+            log.flush()
+    log.add_handler(SelfRemovingHandler())
+    log.error('first')
+    log.flush()
+    log.error('second')
+    log.flush()
+    assert records == ['first']
+
+def test_removed_handler_closed_after_pending_records(monkeypatch):
+    closed = {}
+    def close(handler):
+        closed[handler.baseFilename] = list(FakeHandler.outputs[handler.baseFilename])
+    monkeypatch.setattr(FakeHandler, 'close', close)
+    sf = stroke_filename('/fn')
+    log.set_stroke_filename(sf)
+    log.enable_stroke_logging(True)
+    log.stroke(Stroke(('S-',)))
+    log.set_stroke_filename(None)
+    log.flush()
+    assert closed == {sf: ["Stroke(S : ['S-'])"]}
@@ -1,6 +1,9 @@
 # Copyright (c) 2013 Hesky Fisher
 # See LICENSE.txt for details.
 
+import os
+
+from plover import orthography, system
 from plover.orthography import add_suffix
 
 from . import parametrize
@@ -109,3 +112,98 @@ ADD_SUFFIX_TESTS = (
 @parametrize(ADD_SUFFIX_TESTS)
 def test_add_suffix(word, suffix, expected):
     assert add_suffix(word, suffix) == expected
+
+
+def test_suffix_rules():
+    rules = orthography._suffix_rules('ly', system.NAME)
+    assert 0 < len(rules) < len(system.ORTHOGRAPHY_RULES)
+    assert all(r in system.ORTHOGRAPHY_RULES for r in rules)
+    # Only rules with a matching suffix part are kept.
+    assert system.ORTHOGRAPHY_RULES[0] in rules
+    assert all(not r[0].pattern.endswith(r' \^ s$') for r in rules)
+
+@parametrize((
+    lambda: (r'^(.*[aeiou]c) \^ ly$', 'ly$'),
+    lambda: (r'^(.*(?:s|x)) \^ s$', 's$'),
+    lambda: (r'^(.*[|(]) \^ (s|es)$', '(s|es)$'),
+    lambda: (r'^(.*[]) \^ ]) \^ s$', 's$'),
+    # Ambiguous: top-level alternation.
+    lambda: (r'^(.*)x|y \^ z$', None),
+    # No separator, or more than one.
+    lambda: (r'^(.*)$', None),
+    lambda: (r'^(.*) \^ (.*) \^ s$', None),
+))
+def test_rule_suffix_pattern(pattern, expected):
+    assert orthography._rule_suffix_pattern(pattern) == expected
+
+def test_setup_clears_caches():
+    add_suffix('test', 'ing')
+    orthography._suffix_rules('ly', system.NAME)
+    system.setup(system.NAME)
+    assert orthography._cached_add_suffix.cache_info().currsize == 0
+    assert orthography._suffix_rules.cache_info().currsize == 0
+
+def test_add_suffix_cache():
+    orthography._cached_add_suffix.cache_clear()
+    assert add_suffix('test', 'ing') == 'testing'
+    # The suffix remainder is not part of the cache key.
+    assert add_suffix('test', 'ing foo') == 'testing foo'
+    info = orthography._cached_add_suffix.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+
+def test_suffix_table(monkeypatch, tmpdir):
+    wordlist_path = str(tmpdir / 'words.txt')
+    with open(wordlist_path, 'w') as fp:
+        fp.write('test 2\ncreate 1\n')
+    table_path = str(tmpdir / 'words.txt.suffixes')
+    rules = [(r[0].pattern, r[1]) for r in system.ORTHOGRAPHY_RULES]
+    aliases = system.ORTHOGRAPHY_RULES_ALIASES
+    monkeypatch.setattr(system, 'ORTHOGRAPHY_WORDS', {'create': 1, 'test': 2})
+    table = orthography.build_suffix_table(1, ('ing', 's'))
+    assert len(table) == 1
+    assert table.forms == {'create': ('creating', '')}
+    assert table.get('create', 'ing') == 'creating'
+    assert table.get('create', 's') == 'creates'
+    assert table.get('create', 'ed') is None
+    assert table.get('test', 'ing') is None
+    orthography.save_suffix_table(table, table_path, wordlist_path, rules, aliases)
+    loaded = orthography.load_suffix_table(table_path, wordlist_path, rules, aliases)
+    assert loaded.suffixes == table.suffixes
+    assert loaded.forms == table.forms
+    # Used by add_suffix.
+    loaded.forms['create'] = ('createing', '')
+    monkeypatch.setattr(system, 'ORTHOGRAPHY_SUFFIX_TABLE', loaded)
+    orthography._cached_add_suffix.cache_clear()
+    assert add_suffix('create', 'ing') == 'createing'
+    assert add_suffix('test', 'ing') == 'testing'
+    orthography._cached_add_suffix.cache_clear()
+    # Outdated tables are ignored.
+    assert orthography.load_suffix_table(table_path, wordlist_path, rules[1:], aliases) is None
+    with open(wordlist_path, 'a') as fp:
+        fp.write('fish 3\n')
+    assert orthography.load_suffix_table(table_path, wordlist_path, rules, aliases) is None
+    os.unlink(table_path)
+    assert orthography.load_suffix_table(table_path, wordlist_path, rules, aliases) is None
+
+def test_invalid_suffix_table(tmpdir, caplog):
+    wordlist_path = str(tmpdir / 'words.txt')
+    with open(wordlist_path, 'w') as fp:
+        fp.write('create 1\n')
+    table_path = str(tmpdir / 'words.txt.suffixes')
+    rules = [(r[0].pattern, r[1]) for r in system.ORTHOGRAPHY_RULES]
+    aliases = system.ORTHOGRAPHY_RULES_ALIASES
+    table = orthography.SuffixTable(('ing', 's'), {'create': ('creating', '')})
+    orthography.save_suffix_table(table, table_path, wordlist_path, rules, aliases)
+    with open(table_path, encoding='utf-8') as fp:
+        header, forms = fp.read().split('\n', 1)
+    # Truncated header, invalid header, and truncated forms.
+    for contents in (
+        header[:len(header) // 2] + '\n' + forms,
+        '[]\n' + forms,
+        header + '\ncreate\tcreating\n',
+    ):
+        with open(table_path, 'w', encoding='utf-8') as fp:
+            fp.write(contents)
+        assert orthography.load_suffix_table(table_path, wordlist_path, rules, aliases) is None
+    assert 'ignoring invalid suffix table' in caplog.text
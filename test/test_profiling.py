@@ -0,0 +1,67 @@
+"""Tests for profiling.py."""
+
+from time import perf_counter
+import pstats
+
+import pytest
+
+from plover import profiling
+
+
+@pytest.mark.parametrize('text, options', (
+    ('', {}),
+    ('mode=sample', {'mode': 'sample'}),
+    (' strokes = 42 , seconds=1.5,', {'strokes': 42, 'seconds': 1.5}),
+    ('mode=invalid', ValueError),
+    ('strokes', ValueError),
+    ('strokes=many', ValueError),
+    ('unknown=1', ValueError),
+))
+def test_parse_options(text, options):
+    if isinstance(options, dict):
+        assert profiling.parse_options(text) == options
+    else:
+        with pytest.raises(options):
+            profiling.parse_options(text)
+
+
+def busy(duration):
+    end = perf_counter() + duration
+    while perf_counter() < end:
+        pass
+    return 42
+
+
+def test_cprofile(tmpdir):
+    profiler = profiling.Profiler(strokes=2, directory=str(tmpdir))
+    assert profiler.strokes == 2
+    assert profiler.profile_stroke(busy, 0.001) == 42
+    assert not profiler.done
+    profiler.profile_stroke(busy, 0.001)
+    assert profiler.done
+    path = profiler.stop()
+    assert path.startswith(str(tmpdir)) and path.endswith('.pstats')
+    stats = pstats.Stats(path)
+    assert any(name == 'busy' for _, _, name in stats.stats)
+    # Profiles are not overwritten.
+    assert profiling.Profiler(directory=str(tmpdir)).stop() != path
+
+
+def test_sample(tmpdir):
+    profiler = profiling.Profiler('sample', seconds=60, directory=str(tmpdir))
+    assert profiler.strokes is None
+    def stroke():
+        return busy(0.05)
+    assert profiler.profile_stroke(stroke) == 42
+    assert not profiler.done
+    path = profiler.stop()
+    assert path.endswith('.folded')
+    with open(path) as fp:
+        lines = fp.read().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+        # Stacks start at the profiled function.
+        assert stack.startswith('stroke (test_profiling.py:')
+    assert any(';busy (test_profiling.py:' in line for line in lines)
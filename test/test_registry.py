@@ -0,0 +1,106 @@
+"""Unit tests for registry.py."""
+
+import sys
+
+import pytest
+
+from plover import registry as registry_module
+from plover.registry import Registry
+
+
+ENTRY_POINTS = '''
+[plover.machine]
+Lazy = fake_plover_plugin:LazyMachine
+Broken = fake_plover_broken
+
+[plover.meta]
+eager = fake_plover_meta:Metas.eager
+broken = fake_plover_broken
+'''
+
+
+@pytest.fixture
+def fake_dist(tmpdir, monkeypatch):
+    dist_info = tmpdir.mkdir('site').mkdir('fake_plover_plugin-1.0.dist-info')
+    dist_info.join('METADATA').write('Metadata-Version: 2.1\n'
+                                     'Name: fake-plover-plugin\n'
+                                     'Version: 1.0\n')
+    dist_info.join('entry_points.txt').write(ENTRY_POINTS)
+    tmpdir.join('site', 'fake_plover_plugin.py').write(
+        'class LazyMachine:\n'
+        '    """Lazy machine."""\n'
+    )
+    tmpdir.join('site', 'fake_plover_meta.py').write(
+        'class Metas:\n'
+        '    @staticmethod\n'
+        '    def eager(ctx, cmdline):\n'
+        '        pass\n'
+    )
+    tmpdir.join('site', 'fake_plover_broken.py').write('raise ImportError()\n')
+    config_dir = tmpdir.mkdir('config')
+    monkeypatch.syspath_prepend(str(tmpdir.join('site')))
+    monkeypatch.setattr(registry_module, 'CONFIG_DIR', str(config_dir))
+    yield dist_info
+    for module in ('fake_plover_plugin', 'fake_plover_meta', 'fake_plover_broken'):
+        sys.modules.pop(module, None)
+
+
+def test_lazy_loading(fake_dist, caplog):
+    registry = Registry()
+    registry.update()
+    # Plugins are registered, but not loaded.
+    assert 'fake_plover_plugin' not in sys.modules
+    # Except for the ones used while processing strokes.
+    assert 'fake_plover_meta' in sys.modules
+    assert registry.get_plugin('meta', 'eager').is_loaded
+    # Failing ones are reported (and unregistered) right away.
+    assert 'error loading meta plugin: broken' in caplog.text
+    assert 'broken' not in [p.name for p in registry.list_plugins('meta')]
+    dists = {str(d.dist): d for d in registry.list_distributions()}
+    assert len(dists['fake-plover-plugin 1.0'].plugins) == 3
+    # Until used.
+    plugin = registry.get_plugin('machine', 'lazy')
+    assert 'fake_plover_plugin' in sys.modules
+    assert plugin.name == 'Lazy'
+    assert plugin.obj.__name__ == 'LazyMachine'
+    assert plugin.__doc__ == 'Lazy machine.'
+    assert registry.get_plugin('meta', 'eager').obj.__name__ == 'eager'
+    # Plugins failing to load are unregistered.
+    with pytest.raises(KeyError):
+        registry.get_plugin('machine', 'Broken')
+    assert 'error loading machine plugin: Broken' in caplog.text
+    with pytest.raises(KeyError):
+        registry.get_plugin('machine', 'Broken')
+    assert 'Broken' not in [p.name for p in registry.list_plugins('machine')]
+    assert len(dists['fake-plover-plugin 1.0'].plugins) == 2
+
+
+def test_load_errors(fake_dist):
+    registry = Registry(suppress_errors=False)
+    with pytest.raises(ImportError):
+        registry.update()
+    with pytest.raises(ImportError):
+        registry.get_plugin('machine', 'Broken')
+
+
+def test_entry_points_cache(fake_dist, monkeypatch):
+    scans = []
+    scan_entry_points = registry_module._scan_entry_points
+    def counting_scan_entry_points():
+        scans.append(1)
+        return scan_entry_points()
+    monkeypatch.setattr(registry_module, '_scan_entry_points',
+                        counting_scan_entry_points)
+    def machines():
+        registry = Registry()
+        registry.update()
+        return {p.name for p in registry._plugins['machine'].values()}
+    assert {'Lazy', 'Broken'} <= machines()
+    assert len(scans) == 1
+    # Cached.
+    assert {'Lazy', 'Broken'} <= machines()
+    assert len(scans) == 1
+    # Until the installed distributions change.
+    fake_dist.join('entry_points.txt').write(ENTRY_POINTS.replace('Broken = fake_plover_broken\n', ''))
+    assert 'Broken' not in machines()
+    assert len(scans) == 2
@@ -0,0 +1,93 @@
+"""Unit tests for replay.py."""
+
+from time import perf_counter
+
+import pytest
+
+from plover.machine.base import STATE_ERROR, STATE_RUNNING
+from plover.machine.replay import Replay, load_strokes
+
+
+STROKE_LOG = '''
+2018-01-01 12:00:00,000 Stroke(KAT : ['K-', 'A-', '-T'])
+2018-01-01 12:00:00,000 Translation(('KAT',) : "cat")
+2018-01-01 12:00:00,100 *Stroke(* : ['*'])
+2018-01-01 12:00:00,100 *Translation(('KAT',) : "cat")
+2018-01-01 12:00:00,250 Stroke(1-9 : ['1-', '-9'])
+'''
+
+RAW_CAPTURE = '''
+0.000 K- A- -T
+0.100 *
+
+0.250 1- -9
+'''
+
+RAW_CAPTURE_NO_TIMING = '''
+K- A- -T
+*
+1- -9
+'''
+
+EXPECTED_STROKES = [
+    ['K-', 'A-', '-T'],
+    ['*'],
+    ['1-', '-9'],
+]
+
+
+@pytest.mark.parametrize('contents, timed', (
+    (STROKE_LOG, True),
+    (RAW_CAPTURE, True),
+    (RAW_CAPTURE_NO_TIMING, False),
+))
+def test_load_strokes(tmpdir, contents, timed):
+    filename = tmpdir / 'strokes.txt'
+    filename.write_text(contents, encoding='utf-8')
+    strokes = load_strokes(str(filename))
+    assert [steno_keys for timestamp, steno_keys in strokes] == EXPECTED_STROKES
+    timestamps = [timestamp for timestamp, steno_keys in strokes]
+    if timed:
+        offsets = [round(t - timestamps[0], 3) for t in timestamps]
+        assert offsets == [0.0, 0.1, 0.25]
+    else:
+        assert timestamps == [None, None, None]
+
+
+def replay(filename, speed):
+    states = []
+    strokes = []
+    params = {k: v[0] for k, v in Replay.get_option_info().items()}
+    params.update(file=filename, speed=speed)
+    machine = Replay(params)
+    machine.add_state_callback(states.append)
+    machine.add_stroke_callback(strokes.append)
+    start_time = perf_counter()
+    machine.start_capture()
+    machine.join()
+    elapsed = perf_counter() - start_time
+    machine.stop_capture()
+    return machine, states, strokes, elapsed
+
+
+@pytest.mark.parametrize('speed, min_duration', (
+    (0, 0.0),
+    (1, 0.25),
+    (5, 0.05),
+))
+def test_replay(tmpdir, speed, min_duration):
+    filename = tmpdir / 'strokes.log'
+    filename.write_text(STROKE_LOG, encoding='utf-8')
+    machine, states, strokes, elapsed = replay(str(filename), speed)
+    assert STATE_RUNNING in states
+    assert strokes == EXPECTED_STROKES
+    assert elapsed >= min_duration
+    if speed != 1:
+        assert elapsed < 0.25
+    assert machine.strokes_per_second > 0
+
+
+def test_replay_missing_file(tmpdir):
+    machine, states, strokes, elapsed = replay(str(tmpdir / 'missing.log'), 0)
+    assert STATE_ERROR in states
+    assert strokes == []
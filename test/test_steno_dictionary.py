@@ -7,9 +7,11 @@ import os
 import re
 import stat
 import tempfile
+import threading
 
 import pytest
 
+from plover import steno_dictionary
 from plover.steno_dictionary import StenoDictionary, StenoDictionaryCollection
 
 
@@ -126,6 +128,64 @@ def test_dictionary_collection_writeable():
     assert d2['S'] == 'c'
 
 
+def test_dictionary_collection_snapshot():
+    d1 = StenoDictionary()
+    d1['S'] = 'a'
+    d2 = StenoDictionary()
+    d2['T'] = 'b'
+    dc = StenoDictionaryCollection([d1])
+    snapshot = dc.snapshot
+    assert snapshot.snapshot is snapshot
+    assert snapshot.lookup('S') == 'a'
+    assert snapshot.lookup('T') is None
+    # A new snapshot is published after each change.
+    dc.set_dicts([d2, d1])
+    assert dc.snapshot.version > snapshot.version
+    assert dc.snapshot.lookup('T') == 'b'
+    # But existing snapshots are not affected.
+    assert snapshot.lookup('T') is None
+    assert snapshot.dicts == (d1,)
+    snapshot = dc.snapshot
+    dc.add_filter(lambda key, value: value == 'a')
+    assert snapshot.lookup('S') == 'a'
+    assert dc.snapshot.lookup('S') is None
+    snapshot = dc.snapshot
+    dc.set('W', 'c')
+    assert dc.snapshot.version > snapshot.version
+    assert dc.snapshot.lookup('W') == 'c'
+    assert dc.snapshot.find_similar('c') == [('c', {'W'})]
+    # Snapshots can't be modified.
+    for method, args in (
+        ('set_dicts', ([d1],)),
+        ('set', ('S', 'b')),
+        ('add_filter', (lambda key, value: False,)),
+        ('remove_filter', (dc.filters[0],)),
+    ):
+        with pytest.raises(TypeError):
+            getattr(snapshot, method)(*args)
+    assert d2['W'] == 'c'
+    assert snapshot.dicts == (d2, d1)
+
+
+def test_dictionary_collection_snapshot_lock():
+    d = StenoDictionary()
+    d['S'] = 'a'
+    snapshot = StenoDictionaryCollection([d]).snapshot
+    # Live reverse lists are not returned.
+    d.reverse_lookup('a').append('T')
+    assert d.reverse_lookup('a') == ['S']
+    # Lookups are serialized with changes to the dictionaries.
+    results = []
+    lookup = threading.Thread(target=lambda: results.append(snapshot.reverse_lookup('a')))
+    with steno_dictionary._dictionaries_lock:
+        lookup.start()
+        lookup.join(0.1)
+        assert lookup.is_alive()
+        d['T'] = 'a'
+    lookup.join()
+    assert results == [{'S', 'T'}]
+
+
 def test_casereverse_del():
     d = StenoDictionary()
     d['S-G'] = 'something'
@@ -0,0 +1,116 @@
+"""Tests for system/__init__.py."""
+
+import marshal
+import os
+
+import pytest
+
+from plover import system
+from plover.config import DEFAULT_SYSTEM_NAME
+from plover.registry import Registry
+from plover.system import english_stenotype
+
+
+def test_wordlist(monkeypatch, tmpdir):
+    monkeypatch.setattr(system, 'CONFIG_DIR', str(tmpdir))
+    wordlist_path = tmpdir / 'words.txt'
+    cache_path = tmpdir / 'words.txt.cache'
+    wordlist_path.write('test 2\ncreate 1\nfish 3\n')
+    words = system._load_wordlist('words.txt')
+    # Lazily loaded.
+    assert not cache_path.exists()
+    assert 'test' in words
+    assert words['create'] == 1
+    assert 'tests' not in words
+    assert words.get('tests') is None
+    assert list(words) == ['fish', 'test', 'create']
+    assert len(words) == 3
+    # And cached.
+    assert cache_path.exists()
+    with open(str(cache_path), 'rb') as fp:
+        key, cached_words = marshal.load(fp)
+    assert cached_words == dict(words)
+    cached_words['cached'] = 4
+    with open(str(cache_path), 'wb') as fp:
+        marshal.dump((key, cached_words), fp)
+    assert 'cached' in system._load_wordlist('words.txt')
+    # The cache is not used if the wordlist changed.
+    wordlist_path.write('test 2\n')
+    os.utime(str(wordlist_path), ns=(0, 0))
+    assert dict(system._load_wordlist('words.txt')) == {'test': 2}
+    # Or if invalid.
+    for contents in (b'invalid', marshal.dumps((1, 2, 3)), marshal.dumps(key)[:-3]):
+        cache_path.write_binary(contents)
+        assert dict(system._load_wordlist('words.txt')) == {'test': 2}
+        # And rebuilt.
+        with open(str(cache_path), 'rb') as fp:
+            assert marshal.load(fp)[1] == {'test': 2}
+
+
+def test_no_wordlist():
+    assert system._load_wordlist(None) == {}
+
+
+class FakeSystem:
+    KEYS = ('S-', '-T')
+    IMPLICIT_HYPHEN_KEYS = ()
+    SUFFIX_KEYS = ()
+    NUMBER_KEY = None
+    NUMBERS = {}
+    UNDO_STROKE_STENO = '-T'
+    ORTHOGRAPHY_RULES = []
+    ORTHOGRAPHY_RULES_ALIASES = {}
+    ORTHOGRAPHY_WORDLIST = None
+    KEYMAPS = {}
+    DEFAULT_DICTIONARIES = ()
+
+
+def test_lazy_setup(monkeypatch):
+    registry = Registry()
+    registry.register_plugin('system', 'English Stenotype', english_stenotype)
+    registry.register_plugin('system', 'Fake', FakeSystem)
+    monkeypatch.setattr(system, 'registry', registry)
+    monkeypatch.setattr(system, '_systems', {})
+    try:
+        system.setup('Fake')
+        assert system.NAME == 'Fake'
+        fake_data = system._systems['Fake']
+        # Exports are only computed on first access.
+        assert fake_data.symbols == {}
+        assert system.KEYS == ('S-', '-T')
+        assert system.ORTHOGRAPHY_WORDS == {}
+        assert set(fake_data.symbols) == {'KEYS', 'ORTHOGRAPHY_WORDS'}
+        system.setup('English Stenotype')
+        assert system.NAME == 'English Stenotype'
+        assert system.KEYS == english_stenotype.KEYS
+        english_key_order = system.KEY_ORDER
+        # Switching back reuses the already built data.
+        system.setup('Fake')
+        assert system._systems['Fake'] is fake_data
+        assert system.KEYS == ('S-', '-T')
+        assert set(fake_data.symbols) == {'KEYS', 'ORTHOGRAPHY_WORDS'}
+        system.setup('English Stenotype')
+        assert system.KEY_ORDER is english_key_order
+        # Unless the system plugin changed.
+        class OtherFakeSystem(FakeSystem):
+            KEYS = ('-Z',)
+        registry.register_plugin('system', 'Fake', OtherFakeSystem)
+        system.setup('Fake')
+        assert system._systems['Fake'] is not fake_data
+        assert system.KEYS == ('-Z',)
+    finally:
+        monkeypatch.undo()
+        system.setup(DEFAULT_SYSTEM_NAME)
+
+
+def test_missing_wordlist(monkeypatch, tmpdir):
+    class MissingWordlistSystem(FakeSystem):
+        ORTHOGRAPHY_WORDLIST = 'missing_words.txt'
+    registry = Registry()
+    registry.register_plugin('system', 'Missing', MissingWordlistSystem)
+    monkeypatch.setattr(system, 'CONFIG_DIR', str(tmpdir))
+    monkeypatch.setattr(system, 'registry', registry)
+    with pytest.raises(FileNotFoundError):
+        system.setup('Missing')
+    assert system.NAME == DEFAULT_SYSTEM_NAME
+
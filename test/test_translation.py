@@ -8,8 +8,10 @@ import copy
 import operator
 import sys
 
+import pytest
+
 from plover.steno_dictionary import StenoDictionary, StenoDictionaryCollection
-from plover.translation import Translation, Translator, _State
+from plover.translation import Translation, Translator, _State, _TranslationHistoryView
 from plover.translation import escape_translation, unescape_translation
 from plover.steno import Stroke
 
@@ -36,6 +38,35 @@ def test_translation():
     assert t.rtfcre == ('S', 'T')
     assert t.english == 'translation'
 
+def test_translation_from_replaced():
+    a = Translation([stroke('S')], None)
+    b = Translation([stroke('T'), stroke('-D')], None)
+    t = Translation._from_replaced([a, b], stroke('-Z'), 'translation')
+    assert len(t) == 4
+    assert t.rtfcre == ('S', 'T', '-D', '-Z')
+    assert t.strokes == [stroke('S'), stroke('T'), stroke('-D'), stroke('-Z')]
+    assert t == Translation(t.strokes, None)
+    assert t.replaced == [a, b]
+    assert t.english == 'translation'
+
+def test_translation_attributes():
+    a = Translation([stroke('S')], None)
+    t = Translation._from_replaced([a], stroke('-Z'), 'translation')
+    assert t.formatting == []
+    t.formatting.append('action')
+    t.replaced.append(a)
+    t.strokes = [stroke('S'), stroke('-Z')]
+    t.rtfcre = ('S', '-Z')
+    assert t.formatting == ['action']
+    assert t.replaced == [a, a]
+    assert t.rtfcre == ('S', '-Z')
+    assert Translation([stroke('S')], None).replaced == []
+
+def test_translation_slots():
+    t = Translation([stroke('S')], None)
+    with pytest.raises(AttributeError):
+        t.foobar = 42
+
 
 class TestTranslatorStateSize:
 
@@ -376,6 +407,90 @@ class TestState:
         assert s.translations == [self.b, self.c]
         assert s.tail == self.a
 
+    def test_restrict_size_stroke_count(self):
+        s = _State()
+        s.translations = [self.a, self.b, self.c]
+        assert s.translations.stroke_count == 6
+        s.restrict_size(3)
+        assert s.translations.stroke_count == 3
+        s.translations.pop()
+        assert s.translations.stroke_count == 0
+        s.translations.extend([self.c, self.a])
+        assert s.translations.stroke_count == 4
+
+    def test_prev_count(self):
+        s = _State()
+        s.translations = [self.a, self.b, self.c]
+        prev = s.prev(1)
+        assert prev == [self.a, self.b]
+        assert list(reversed(prev)) == [self.b, self.a]
+        assert prev[-1] == self.b
+        assert prev[:1] == [self.a]
+        assert s.prev(3) is None
+        # A view, but unaffected by later changes to the history.
+        s.restrict_size(1)
+        s.translations.append(self.a)
+        assert prev == [self.a, self.b]
+        assert prev[-1] == self.b
+        assert s.prev(1) == [self.c]
+
+    def test_translations_slicing(self):
+        s = _State()
+        s.translations = [self.a, self.b, self.c]
+        assert s.translations[-2:] == [self.b, self.c]
+        assert s.translations[:1] == [self.a]
+        assert s.translations[-1] == self.c
+        assert s.translations[1:] == [self.b, self.c]
+        assert s.translations[::-2] == [self.c, self.a]
+        assert s.translations[2:0:-1] == [self.c, self.b]
+        assert s.translations[5:] == []
+
+    def test_translations_mutators(self):
+        s = _State()
+        s.translations = [self.a, self.b]
+        s.translations.insert(0, self.c)
+        s.translations[1] = self.b
+        assert s.translations == [self.c, self.b, self.b]
+        assert s.translations.stroke_count == 7
+        del s.translations[0]
+        s.translations.remove(self.b)
+        assert s.translations == [self.b]
+        assert s.translations.stroke_count == 2
+        s.translations.extend([self.a, self.c])
+        del s.translations[:2]
+        assert s.translations == [self.c]
+        assert s.translations.pop(0) == self.c
+        assert s.translations.stroke_count == 0
+
+    def test_translations_reversed_pop(self):
+        s = _State()
+        s.translations = [self.a, self.b, self.c]
+        seen = []
+        for t in reversed(s.translations):
+            seen.append(t)
+            s.translations.pop()
+        assert seen == [self.c, self.b, self.a]
+        assert s.translations == []
+
+    def test_translate_does_not_copy_history(self, monkeypatch):
+        # The previous translations passed to listeners are a view:
+        # the cost of a stroke must not depend on the undo levels.
+        detached = []
+        monkeypatch.setattr(_TranslationHistoryView, '_detach',
+                            lambda view: detached.append(view))
+        d = StenoDictionary()
+        d['S'] = 'foo'
+        for undo_levels in (10, 10000):
+            t = Translator()
+            t.set_dictionary(StenoDictionaryCollection([d]))
+            t.set_min_undo_length(undo_levels)
+            seen = []
+            t.add_listener(lambda undo, do, prev: seen.append(len(prev or ())))
+            for _ in range(100):
+                t.translate(stroke('S'))
+            assert seen == [min(n, undo_levels) for n in range(100)]
+        assert detached == []
+
 
 class TestTranslateStroke:
 
@@ -579,6 +694,67 @@ class TestTranslateStroke:
         self.translate('K-LG')
         self._check_translations(lt)
 
+    def test_prefix_folding_multi_stroke(self):
+        self.define('TPH/HR', 'knoll')
+        self.define('S', '{un^}')
+        self.translate('STPH')
+        t = self.tlor._find_translation(stroke('HR'), prefixes=('S-',))
+        assert t.english == '{un^} knoll'
+        assert t.rtfcre == ('STPH', 'HR')
+        assert t.replaced == self.lt('STPH')
+
+    def test_long_window(self):
+        strokes = 'S T P H R A O E U -F'.split()
+        self.define('/'.join(strokes), 'ten')
+        self.define('T/P', 'two')
+        for s in strokes:
+            self.translate(s)
+        self._check_translations(self.lt('/'.join(strokes)))
+        assert self.s.translations[0].english == 'ten'
+        # The window is limited to 10 strokes.
+        self.translate('-R')
+        self._check_translations(self.lt('/'.join(strokes) + ' -R'))
+
+    def test_lookup_stats(self):
+        self.define('S/T', 'st')
+        self.translate('S')
+        self.translate('T')
+        stats = self.tlor.get_lookup_stats()
+        assert list(stats) == ['greedy']
+        assert stats['greedy'].strokes == 2
+        # S, then S/T.
+        assert stats['greedy'].lookups == 2
+
+    def test_lookup_strategy_greedy(self):
+        self.define('A/P', 'ap')
+        self.define('P/-B', 'pb')
+        self.tlor.set_lookup_strategy('greedy')
+        for s in ('A', 'P', '-B'):
+            self.translate(s)
+        self._check_translations(self.lt('A/P -B'))
+
+    def test_lookup_strategy_best_segmentation(self):
+        self.define('A/P', 'ap')
+        self.define('P/-B', 'pb')
+        self.define('A', 'a')
+        self.tlor.set_lookup_strategy('best_segmentation')
+        for s in ('A', 'P'):
+            self.translate(s)
+        self._check_translations(self.lt('A/P'))
+        self.translate('-B')
+        # Each segment is a separate translation.
+        self._check_translations(self.lt('A P/-B'))
+        assert [t.english for t in self.s.translations] == ['a', 'pb']
+        assert self.s.translations[0].replaced == self.lt('A/P')
+        assert self.s.translations[1].replaced == []
+        # Undoing all the segments restores the previous segmentation.
+        self.translate('*')
+        self.translate('*')
+        self._check_translations(self.lt('A/P'))
+        stats = self.tlor.get_lookup_stats()
+        assert stats['best_segmentation'].strokes == 3
+        assert stats['best_segmentation'].lookups > 3
+
     def test_retrospective_insert_space(self):
         self.define('T/E/S/T', 'a longer key')
         self.define('PER', 'perfect')